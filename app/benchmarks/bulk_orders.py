@@ -0,0 +1,86 @@
+"""Compare creating a batch of orders one by one with OrderService.create_orders_bulk.
+
+Usage:
+    python -m app.benchmarks.bulk_orders [--db-url URL] [--orders 100 1000] [--lines 3]
+
+Both paths run on a blocking Session (repository calls go through the
+threadpool) without an order cache, and each order takes one unit of
+`--lines` distinct products. Without --db-url a throwaway SQLite file is
+used; note that SQLite inserts the order rows of a batch one by one, while
+PostgreSQL batches them too.
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.core.models.order import Order
+from app.core.models.order_association import OrderProductAssociation
+from app.core.models.product import Product
+from app.core.models.user import User
+from app.core.schemas.order_schema import OrderCreateSchema
+from app.repositories.order_repository import OrderRepository
+from app.repositories.threaded_repository import ThreadedRepository
+from app.services.order_service import OrderService
+
+
+def run(db_url: str, order_counts: list[int], lines: int) -> None:
+    engine = create_engine(db_url)
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    statements = 0
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count_statement(*args):
+        nonlocal statements
+        statements += 1
+
+    with SessionLocal() as session:
+        products = [Product(name=f"bench-{i}", price=10, quantity=10**9) for i in range(lines)]
+        session.add_all(products)
+        session.commit()
+        payload = OrderCreateSchema(products=[{"product_id": p.product_id, "quantity": 1} for p in products])
+
+    user = User(username="bench", email="bench@example.com", is_admin=True)
+
+    async def one_by_one(service: OrderService, count: int) -> None:
+        for _ in range(count):
+            await service.create_order(payload, user)
+
+    print(f"{'orders':>7} {'mode':>11} {'total ms':>10} {'ms/order':>9} {'stmts':>7}")
+    for count in order_counts:
+        for mode in ("one-by-one", "bulk"):
+            statements = 0
+            with SessionLocal() as session:
+                service = OrderService(repository=ThreadedRepository(OrderRepository(session)), db=session)
+                start = time.perf_counter()
+                if mode == "bulk":
+                    asyncio.run(service.create_orders_bulk([payload] * count, user))
+                else:
+                    asyncio.run(one_by_one(service, count))
+                elapsed = (time.perf_counter() - start) * 1000
+            print(f"{count:>7} {mode:>11} {elapsed:>10.1f} {elapsed / count:>9.3f} {statements:>7}")
+
+    with SessionLocal() as session:
+        session.query(OrderProductAssociation).delete()
+        session.query(Order).delete()
+        session.commit()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db-url", default=None)
+    parser.add_argument("--orders", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--lines", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.db_url:
+        run(args.db_url, args.orders, args.lines)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            run(f"sqlite:///{tmp}/bench.db", args.orders, args.lines)
@@ -0,0 +1,48 @@
+"""Compare order cache codecs: encode/decode time and stored bytes per order.
+
+Usage:
+    python -m app.benchmarks.cache_codec [--runs N] [--lines 1 10 100] [--compress-min-size 1024]
+
+Encodes a serialized order (as OrderSchema produces it) with each available
+serializer/compression pair. Runs in-process; no Redis or database needed.
+"""
+import argparse
+import timeit
+
+from app.utils.cache_codec import COMPRESSIONS, FORMATS, CacheCodec
+
+
+def sample_order(lines: int) -> dict:
+    return {
+        "order_id": 123456,
+        "customer_name": "bench-customer",
+        "order_status": "pending",
+        "total_price": 10 * lines,
+        "products": [{"product_id": 1000 + i, "quantity": 1 + i % 5} for i in range(lines)],
+    }
+
+
+def run(line_counts: list[int], runs: int, compress_min_size: int) -> None:
+    print(f"{'lines':>6} {'codec':>16} {'bytes':>7} {'encode us':>10} {'decode us':>10}")
+    for lines in line_counts:
+        order = sample_order(lines)
+        for format in FORMATS:
+            for compression in COMPRESSIONS:
+                try:
+                    codec = CacheCodec(format, compression, compress_min_size)
+                except ValueError as e:
+                    print(f"{lines:>6} {format + '+' + compression:>16}  skipped: {e}")
+                    continue
+                value = codec.encode(order)
+                encode = timeit.timeit(lambda: codec.encode(order), number=runs) / runs * 1e6
+                decode = timeit.timeit(lambda: codec.decode(value), number=runs) / runs * 1e6
+                print(f"{lines:>6} {format + '+' + compression:>16} {len(value):>7} {encode:>10.2f} {decode:>10.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=20000)
+    parser.add_argument("--lines", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--compress-min-size", type=int, default=1024)
+    args = parser.parse_args()
+    run(args.lines, args.runs, args.compress_min_size)
@@ -0,0 +1,65 @@
+"""Measure requests/s of a running server at a fixed number of in-flight requests.
+
+Usage:
+    python -m app.benchmarks.concurrency --base-url http://localhost:8000 [--concurrency 500] [--requests 20000] [--path /orders]
+
+Start the server once with DB_ASYNC=true and once with DB_ASYNC=false to compare
+the AsyncSession path against the threadpool path. A benchmark user is
+registered (or reused) and every request carries its bearer token.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+async def authenticate(client: httpx.AsyncClient) -> dict:
+    credentials = {"username": "bench", "email": "bench@example.com", "password": "bench-password"}
+    await client.post("/auth/register", json=credentials)
+    response = await client.post("/auth/login", json=credentials)
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def run(base_url: str, path: str, concurrency: int, total: int) -> None:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        headers = await authenticate(client)
+        latencies: list[float] = []
+        errors = 0
+        remaining = total
+
+        async def worker() -> None:
+            nonlocal remaining, errors
+            while remaining > 0:
+                remaining -= 1
+                start = time.perf_counter()
+                try:
+                    response = await client.get(path, headers=headers)
+                    if response.status_code >= 400:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    p99 = latencies[max(0, int(len(latencies) * 0.99) - 1)]
+    print(f"in-flight={concurrency} requests={len(latencies)} errors={errors} elapsed={elapsed:.2f}s")
+    print(f"throughput={len(latencies) / elapsed:.0f} req/s "
+          f"p50={statistics.median(latencies) * 1000:.1f}ms p99={p99 * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--path", default="/orders?limit=20")
+    parser.add_argument("--concurrency", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+    asyncio.run(run(args.base_url, args.path, args.concurrency, args.requests))
@@ -0,0 +1,82 @@
+"""Benchmark OrderService.create_order latency against the number of line items.
+
+Usage:
+    python -m app.benchmarks.create_order_latency [--db-url URL] [--runs N] [--lines 1 10 50]
+
+Runs the service on a blocking Session (repository calls go through the
+threadpool) without an order cache. Without --db-url a throwaway SQLite file
+is used.
+"""
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.core.models.order import Order
+from app.core.models.product import Product
+from app.core.models.user import User
+from app.core.schemas.order_schema import OrderCreateSchema
+from app.repositories.order_repository import OrderRepository
+from app.repositories.threaded_repository import ThreadedRepository
+from app.services.order_service import OrderService
+
+
+def run(db_url: str, line_counts: list[int], runs: int) -> None:
+    engine = create_engine(db_url)
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    statements = 0
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count_statement(*args):
+        nonlocal statements
+        statements += 1
+
+    max_lines = max(line_counts)
+    with SessionLocal() as session:
+        products = [Product(name=f"bench-{i}", price=10, quantity=10**9) for i in range(max_lines)]
+        session.add_all(products)
+        session.commit()
+        product_ids = [p.product_id for p in products]
+
+    user = User(username="bench", email="bench@example.com", is_admin=True)
+    print(f"{'lines':>6} {'mean ms':>9} {'p95 ms':>9} {'stmts/order':>12}")
+    for lines in line_counts:
+        payload = OrderCreateSchema(products=[
+            {"product_id": product_id, "quantity": 1} for product_id in product_ids[:lines]
+        ])
+        timings = []
+        statements = 0
+        for _ in range(runs):
+            with SessionLocal() as session:
+                service = OrderService(repository=ThreadedRepository(OrderRepository(session)), db=session)
+                start = time.perf_counter()
+                asyncio.run(service.create_order(payload, user))
+                timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        p95 = timings[max(0, int(len(timings) * 0.95) - 1)]
+        print(f"{lines:>6} {statistics.mean(timings):>9.2f} {p95:>9.2f} {statements / runs:>12.1f}")
+
+    with SessionLocal() as session:
+        session.query(Order).delete()
+        session.commit()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db-url", default=None)
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--lines", type=int, nargs="+", default=[1, 5, 10, 25, 50, 100])
+    args = parser.parse_args()
+
+    if args.db_url:
+        run(args.db_url, args.lines, args.runs)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            run(f"sqlite:///{tmp}/bench.db", args.lines, args.runs)
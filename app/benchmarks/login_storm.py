@@ -0,0 +1,87 @@
+"""Measure order-endpoint latency on a running server, alone and during a login storm.
+
+Usage:
+    python -m app.benchmarks.login_storm --base-url http://localhost:8000 [--duration 10] [--order-concurrency 20] [--login-concurrency 50] [--path /orders?limit=20]
+
+Phase one drives only GET requests on --path; phase two repeats them while
+--login-concurrency clients log in back to back. With bcrypt in the process
+pool, order p99 should barely move and excess logins should come back as 503
+with Retry-After instead of queueing. Run against a single worker to see the
+effect per process.
+"""
+import argparse
+import asyncio
+import collections
+import statistics
+import time
+
+import httpx
+
+from app.benchmarks.concurrency import authenticate
+
+CREDENTIALS = {"username": "bench", "password": "bench-password"}
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    values = sorted(values)
+    return values[max(0, int(len(values) * fraction) - 1)]
+
+
+async def order_load(client: httpx.AsyncClient, headers: dict, path: str, concurrency: int, deadline: float) -> list[float]:
+    latencies: list[float] = []
+
+    async def worker() -> None:
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            response = await client.get(path, headers=headers)
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies
+
+
+async def login_storm(client: httpx.AsyncClient, concurrency: int, deadline: float) -> collections.Counter:
+    outcomes: collections.Counter = collections.Counter()
+
+    async def worker() -> None:
+        while time.perf_counter() < deadline:
+            response = await client.post("/auth/login", json=CREDENTIALS)
+            outcomes[response.status_code] += 1
+            if response.status_code == 503:
+                await asyncio.sleep(float(response.headers.get("Retry-After", 1)))
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return outcomes
+
+
+def report(label: str, latencies: list[float]) -> None:
+    print(f"{label:<18} requests={len(latencies):>6} "
+          f"p50={statistics.median(latencies) * 1000:7.1f}ms p99={percentile(latencies, 0.99) * 1000:7.1f}ms")
+
+
+async def run(base_url: str, path: str, duration: float, order_concurrency: int, login_concurrency: int) -> None:
+    limits = httpx.Limits(max_connections=order_concurrency + login_concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        headers = await authenticate(client)
+
+        report("orders alone", await order_load(client, headers, path, order_concurrency, time.perf_counter() + duration))
+
+        deadline = time.perf_counter() + duration
+        latencies, outcomes = await asyncio.gather(
+            order_load(client, headers, path, order_concurrency, deadline),
+            login_storm(client, login_concurrency, deadline)
+        )
+        report("orders + logins", latencies)
+        print("login responses:", dict(sorted(outcomes.items())))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--path", default="/orders?limit=20")
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--order-concurrency", type=int, default=20)
+    parser.add_argument("--login-concurrency", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(run(args.base_url, args.path, args.duration, args.order_concurrency, args.login_concurrency))
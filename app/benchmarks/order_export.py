@@ -0,0 +1,93 @@
+"""Measure the memory and throughput of OrderService.export_orders.
+
+Usage:
+    python -m app.benchmarks.order_export [--db-url URL] [--orders 10000 100000] [--lines 3] [--format ndjson]
+
+Seeds the orders with bulk inserts, then exports them all to nowhere on an
+async session and reports rows per second and the peak traced Python
+allocation during the export. For comparison it also reports the peak of
+loading the same orders through list_filtered (what GET /orders does for
+a single page as large as the table). Without --db-url a throwaway SQLite
+file is used. Throughput is understated: tracemalloc is on while timing.
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+import tracemalloc
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.database import Base, to_async_url
+from app.core.models.order import Order, OrderStatus
+from app.core.models.order_association import OrderProductAssociation
+from app.core.models.product import Product
+from app.core.models.user import User
+from app.repositories.order_repository import AsyncOrderRepository
+from app.services.order_service import OrderService
+
+
+def seed(db_url: str, orders: int, lines: int) -> None:
+    engine = create_engine(db_url)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(insert(Product), [{"name": f"p{i}", "price": 10, "quantity": 10**9} for i in range(lines)])
+        for start in range(0, orders, 10000):
+            ids = range(start + 1, min(start + 10000, orders) + 1)
+            conn.execute(insert(Order), [
+                {"order_id": i, "customer_name": "bench", "order_status": OrderStatus.PENDING, "total_price": 10 * lines}
+                for i in ids
+            ])
+            conn.execute(insert(OrderProductAssociation), [
+                {"order_id": i, "product_id": p, "ordered_quantity": 1} for i in ids for p in range(1, lines + 1)
+            ])
+    engine.dispose()
+
+
+async def measure(db_url: str, fmt: str, orders: int) -> None:
+    engine = create_async_engine(to_async_url(db_url))
+    SessionLocal = async_sessionmaker(bind=engine, expire_on_commit=False)
+    admin = User(username="bench", email="bench@example.com", is_admin=True)
+
+    async with SessionLocal() as session:
+        service = OrderService(repository=AsyncOrderRepository(session), db=session)
+        tracemalloc.start()
+        start = time.perf_counter()
+        size = 0
+        async for chunk in service.export_orders(admin, fmt=fmt):
+            size += len(chunk)
+        elapsed = time.perf_counter() - start
+        export_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    async with SessionLocal() as session:
+        tracemalloc.start()
+        await AsyncOrderRepository(session).list_filtered(limit=orders)
+        list_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    await engine.dispose()
+
+    print(f"{orders:>9} {orders / elapsed:>12.0f} {size / 2**20:>9.1f} "
+          f"{export_peak / 2**20:>15.2f} {list_peak / 2**20:>11.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db-url", default=None)
+    parser.add_argument("--orders", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--lines", type=int, default=3)
+    parser.add_argument("--format", choices=("ndjson", "csv"), default="ndjson")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_url = args.db_url or f"sqlite:///{tmp}/bench.db"
+        print(f"{'orders':>9} {'orders/s':>12} {'out MiB':>9} {'export peak MiB':>15} {'list MiB':>11}")
+        for orders in args.orders:
+            seed(db_url, orders, args.lines)
+            asyncio.run(measure(db_url, args.format, orders))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Measure the memory and read latency of the product catalog snapshot.
+
+Usage:
+    python -m app.benchmarks.product_catalog [--db-url URL] [--products 10000 100000] [--changed 100]
+
+Seeds the products, then reports the memory a snapshot keeps (traced
+allocations retained after the build), the time of a full rebuild and of a
+stock refresh after `--changed` quantities moved, and the per-call latency
+of ProductService.list_products / get_product served from the snapshot. For
+comparison it also times the ORM path the endpoints used before: load every
+Product and serialize the list through ProductSchema. Without --db-url a
+throwaway SQLite file is used.
+"""
+import argparse
+import asyncio
+import random
+import tempfile
+import time
+import tracemalloc
+
+from pydantic import TypeAdapter
+from sqlalchemy import bindparam, create_engine, insert, update
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.database import Base, to_async_url
+from app.core.models.order import Order
+from app.core.models.product import Product
+from app.core.schemas.product_schema import ProductSchema
+from app.repositories.product_repository import AsyncProductRepository
+from app.services.catalog_snapshot import ProductCatalog
+from app.services.catalog_version import CatalogVersion
+from app.services.product_service import ProductService
+
+PRODUCT_LIST = TypeAdapter(list[ProductSchema])
+
+
+def seed(db_url: str, products: int) -> None:
+    engine = create_engine(db_url)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(insert(Product), [
+            {"name": f"product {i}", "price": random.randint(100, 100000), "quantity": random.randint(0, 1000)}
+            for i in range(products)
+        ])
+    engine.dispose()
+
+
+def per_call(seconds: float, calls: int) -> str:
+    return f"{seconds / calls * 1e6:.1f} us"
+
+
+async def measure(db_url: str, products: int, changed: int) -> None:
+    engine = create_async_engine(to_async_url(db_url))
+    SessionLocal = async_sessionmaker(bind=engine, expire_on_commit=False)
+    version = CatalogVersion()
+    catalog = ProductCatalog(version)
+
+    async with SessionLocal() as session:
+        repository = AsyncProductRepository(session)
+        service = ProductService(repository, session, catalog=catalog)
+
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        await service.list_products()
+        retained = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+
+        # Timed again untraced: tracemalloc slows allocation-heavy code down
+        version.bump()
+        start = time.perf_counter()
+        await service.list_products()
+        rebuild = time.perf_counter() - start
+
+        calls = 10000
+        start = time.perf_counter()
+        for _ in range(calls):
+            await service.list_products()
+        list_hit = time.perf_counter() - start
+        ids = [random.randint(1, products) for _ in range(calls)]
+        start = time.perf_counter()
+        for product_id in ids:
+            await service.get_product(product_id)
+        get_hit = time.perf_counter() - start
+
+        moved = random.sample(range(1, products + 1), changed)
+        await session.execute(
+            update(Product.__table__)
+            .where(Product.__table__.c.product_id == bindparam("moved_id"))
+            .values(quantity=Product.__table__.c.quantity + 1),
+            [{"moved_id": product_id} for product_id in moved]
+        )
+        await session.commit()
+        version.bump(stock_only=True)
+        start = time.perf_counter()
+        await service.list_products()
+        refresh = time.perf_counter() - start
+
+        start = time.perf_counter()
+        rows = await repository.list_all()
+        PRODUCT_LIST.dump_json([ProductSchema.model_validate(product) for product in rows])
+        orm_list = time.perf_counter() - start
+    await engine.dispose()
+
+    print(f"{products:>9} {retained / 2**20:>12.1f} {rebuild * 1000:>11.0f} {refresh * 1000:>11.0f} "
+          f"{per_call(list_hit, calls):>10} {per_call(get_hit, calls):>10} {orm_list * 1000:>10.0f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db-url", default=None)
+    parser.add_argument("--products", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--changed", type=int, default=100)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_url = args.db_url or f"sqlite:///{tmp}/bench.db"
+        print(f"{'products':>9} {'snapshot MiB':>12} {'rebuild ms':>11} {'refresh ms':>11} "
+              f"{'list':>10} {'get':>10} {'ORM ms':>10}")
+        for products in args.products:
+            seed(db_url, products)
+            asyncio.run(measure(db_url, products, args.changed))
+
+
+if __name__ == "__main__":
+    main()
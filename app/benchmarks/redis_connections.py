@@ -0,0 +1,71 @@
+"""Compare Redis connections opened per second: client per request vs shared pool.
+
+Usage:
+    python -m app.benchmarks.redis_connections [--requests 5000] [--concurrency 100]
+
+Simulates the cache traffic of a request (one GET plus a pipelined SET) under
+concurrency, first with a new redis client per request (the old OrderService
+behaviour), then through the application's pooled client. Connections are
+counted from Redis' own INFO stats, so run it against an otherwise idle Redis
+(REDIS_HOST/REDIS_PORT).
+"""
+import argparse
+import asyncio
+import time
+
+from redis import asyncio as aioredis
+
+from app.config import settings
+from app.redis_client import create_redis_client
+
+
+async def connections_received(admin: aioredis.Redis) -> int:
+    return (await admin.info("stats"))["total_connections_received"]
+
+
+async def simulate_request(client: aioredis.Redis, i: int) -> None:
+    await client.get(f"bench:order:{i}")
+    pipe = client.pipeline(transaction=False)
+    pipe.set(f"bench:order:{i}", "{}", ex=60)
+    await pipe.execute()
+
+
+async def measure(label: str, admin: aioredis.Redis, total: int, concurrency: int, per_request: bool) -> None:
+    shared = None if per_request else create_redis_client()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int) -> None:
+        async with semaphore:
+            if per_request:
+                client = aioredis.Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT, decode_responses=True)
+                try:
+                    await simulate_request(client, i)
+                finally:
+                    await client.aclose()
+            else:
+                await simulate_request(shared, i)
+
+    before = await connections_received(admin)
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    elapsed = time.perf_counter() - start
+    opened = await connections_received(admin) - before
+    if shared is not None:
+        await shared.aclose()
+    print(f"{label:<20} requests/s={total / elapsed:>8.0f} connections opened={opened:>6} "
+          f"connections/s={opened / elapsed:>8.0f}")
+
+
+async def main(total: int, concurrency: int) -> None:
+    admin = aioredis.Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT)
+    await measure("client per request", admin, total, concurrency, per_request=True)
+    await measure("shared pool", admin, total, concurrency, per_request=False)
+    await admin.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency))
@@ -0,0 +1,119 @@
+"""Measure CPU time per response for the order endpoints, in-process.
+
+Usage:
+    python -m app.benchmarks.response_cpu [--requests N] [--lines 5]
+
+Drives the ASGI app through httpx without a network or server, against a
+throwaway SQLite file, and reports process CPU per request for each endpoint.
+Authentication is overridden with a fixed admin so the numbers isolate the
+order path. GET /orders/{id} is measured both without a cache and as an
+in-process (L1) cache hit. A second table compares rendering one order the
+old way (OrderSchema validation + JSON encoding) with encode_order().
+"""
+import argparse
+import asyncio
+import json
+import logging
+import tempfile
+import time
+
+import httpx
+from redis import asyncio as aioredis
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.main import app
+from app.database import Base
+from app.dependencies import get_current_user, get_db, get_order_cache
+from app.core.models.order import Order
+from app.core.models.product import Product
+from app.core.models.user import User
+from app.core.schemas.order_schema import OrderSchema, encode_order
+from app.repositories.order_repository import AsyncOrderRepository
+from app.services.order_cache import OrderCache
+from app.utils.lru_cache import LRUCache
+
+
+async def cpu_per_request(client: httpx.AsyncClient, requests: list) -> float:
+    start = time.process_time()
+    for method, url, body in requests:
+        response = await client.request(method, url, json=body)
+        response.raise_for_status()
+    return (time.process_time() - start) / len(requests) * 1e6
+
+
+async def run(tmp: str, total: int, lines: int) -> None:
+    sync_engine = create_engine(f"sqlite:///{tmp}/bench.db")
+    Base.metadata.create_all(bind=sync_engine)
+    with sessionmaker(bind=sync_engine)() as session:
+        products = [Product(name=f"bench-{i}", price=10, quantity=10**9) for i in range(lines)]
+        session.add_all(products)
+        session.commit()
+        product_ids = [p.product_id for p in products]
+    sync_engine.dispose()
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp}/bench.db")
+    SessionLocal = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+    # Redis is unreachable: only the in-process tier serves hits
+    unreachable = aioredis.Redis(host="localhost", port=1, socket_connect_timeout=0.01)
+    order_cache = OrderCache(unreachable, ttl=300, negative_ttl=30, local=LRUCache(maxsize=10000, ttl=300))
+    logging.getLogger("app.services.order_cache").setLevel(logging.ERROR)
+    use_cache = False
+
+    async def override_get_db():
+        async with SessionLocal() as session:
+            yield session
+
+    async def override_get_order_cache():
+        return order_cache if use_cache else None
+
+    async def override_get_current_user():
+        return User(user_id=1, username="bench", email="bench@example.com", is_admin=True)
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_order_cache] = override_get_order_cache
+    app.dependency_overrides[get_current_user] = override_get_current_user
+
+    payload = {"products": [{"product_id": product_id, "quantity": 1} for product_id in product_ids]}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        create = [("POST", "/orders", payload)] * total
+        results = {"POST /orders": await cpu_per_request(client, create)}
+        results["GET /orders?limit=100"] = await cpu_per_request(client, [("GET", "/orders?limit=100", None)] * (total // 10 or 1))
+        results["GET /orders/{id}"] = await cpu_per_request(client, [("GET", f"/orders/{i}", None) for i in range(1, total + 1)])
+        use_cache = True
+        await cpu_per_request(client, [("GET", f"/orders/{i}", None) for i in range(1, total + 1)])
+        results["GET /orders/{id} (L1 hit)"] = await cpu_per_request(client, [("GET", f"/orders/{i}", None) for i in range(1, total + 1)])
+        use_cache = False
+        results["DELETE /orders/{id}"] = await cpu_per_request(client, [("DELETE", f"/orders/{i}", None) for i in range(1, total + 1)])
+
+    print(f"{'endpoint':<28} {'cpu us/request':>15}")
+    for endpoint, cpu in results.items():
+        print(f"{endpoint:<28} {cpu:>15.0f}")
+
+    async with SessionLocal() as session:
+        order = await AsyncOrderRepository(session).get(1)
+    runs = total * 10
+    start = time.process_time()
+    for _ in range(runs):
+        json.dumps(OrderSchema.model_validate(order).model_dump(mode="json")).encode()
+    schema_cpu = (time.process_time() - start) / runs * 1e6
+    start = time.process_time()
+    for _ in range(runs):
+        encode_order(order)
+    encode_cpu = (time.process_time() - start) / runs * 1e6
+    print(f"\nrender one order ({lines} lines): OrderSchema + json {schema_cpu:.1f} us, encode_order {encode_cpu:.1f} us")
+
+    app.dependency_overrides.clear()
+    await unreachable.aclose()
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--lines", type=int, default=5)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(run(tmp, args.requests, args.lines))
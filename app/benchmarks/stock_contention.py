@@ -0,0 +1,79 @@
+"""Hammer one product with concurrent stock reservations and report throughput.
+
+Usage:
+    python -m app.benchmarks.stock_contention [--db-url URL] [--threads 16] [--stock 2000]
+
+Every thread repeatedly reserves one unit through ProductRepository.reserve_stock
+and commits, until the product runs dry. The run fails loudly if more units were
+handed out than the product had in stock.
+"""
+import argparse
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.core.models.order import Order  # noqa: F401 - registers the orders table
+from app.core.models.product import Product
+from app.repositories.product_repository import ProductRepository
+
+
+def run(db_url: str, threads_count: int, stock: int) -> None:
+    connect_args = {"check_same_thread": False, "timeout": 30} if db_url.startswith("sqlite") else {}
+    engine = create_engine(db_url, connect_args=connect_args, pool_size=threads_count)
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    with SessionLocal() as session:
+        product = ProductRepository(session).create(Product(name="contended", price=1, quantity=stock))
+        product_id = product.product_id
+
+    reserved = [0] * threads_count
+    rejected = [0] * threads_count
+
+    def checkout(slot: int) -> None:
+        with SessionLocal() as session:
+            repository = ProductRepository(session)
+            while True:
+                ok = repository.reserve_stock(product_id, 1)
+                session.commit()
+                if not ok:
+                    rejected[slot] += 1
+                    return
+                reserved[slot] += 1
+
+    threads = [threading.Thread(target=checkout, args=(i,)) for i in range(threads_count)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    with SessionLocal() as session:
+        product = ProductRepository(session).get(product_id)
+        remaining = product.quantity
+        ProductRepository(session).delete(product)
+
+    total = sum(reserved)
+    print(f"threads={threads_count} reserved={total} remaining={remaining} elapsed={elapsed:.2f}s")
+    print(f"throughput={total / elapsed:.0f} reservations/s")
+    if total + remaining != stock or remaining < 0:
+        raise SystemExit(f"oversold: stock={stock} reserved={total} remaining={remaining}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db-url", default=None)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--stock", type=int, default=2000)
+    args = parser.parse_args()
+
+    if args.db_url:
+        run(args.db_url, args.threads, args.stock)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            run(f"sqlite:///{tmp}/bench.db", args.threads, args.stock)
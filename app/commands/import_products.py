@@ -0,0 +1,97 @@
+"""Import a product catalog from a CSV or NDJSON file.
+
+Usage:
+    python -m app.commands.import_products catalog.csv [--format csv|ndjson] [--batch-size N]
+
+Streams the file through ProductService.import_products into the database
+configured by DB_URL, printing progress after every batch and the row
+errors at the end. Running workers are told about the new catalog version
+through Redis when the import ends. The format defaults to the file extension (.csv, or
+.ndjson/.jsonl); `-` reads standard input. Exits with status 1 when any row
+was rejected.
+"""
+import argparse
+import asyncio
+import os
+import sys
+from typing import AsyncIterator, BinaryIO
+
+from app.config import settings
+from app.database import AsyncSessionLocal, SessionLocal
+from app.redis_client import create_redis_client
+from app.core.schemas.product_schema import ProductImportReportSchema
+from app.repositories.product_repository import ProductRepository, AsyncProductRepository
+from app.repositories.threaded_repository import repository_for
+from app.services.catalog_version import catalog_version
+from app.services.product_service import ProductService
+
+CHUNK_SIZE = 64 * 1024
+EXTENSIONS = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson"}
+
+
+async def read_chunks(stream: BinaryIO) -> AsyncIterator[bytes]:
+    while True:
+        chunk = await asyncio.to_thread(stream.read, CHUNK_SIZE)
+        if not chunk:
+            return
+        yield chunk
+
+
+def print_progress(report: ProductImportReportSchema) -> None:
+    print(f"batch {report.batches}: {report.rows} rows read, {report.imported} imported, {report.failed} failed",
+          file=sys.stderr)
+
+
+async def announce_catalog_change() -> None:
+    # Batches commit as they go, so announce even when the import stopped early
+    redis = create_redis_client()
+    try:
+        await catalog_version.publish(redis)
+    finally:
+        await redis.aclose()
+
+
+async def run(stream: BinaryIO, fmt: str, batch_size: int) -> ProductImportReportSchema:
+    try:
+        return await import_catalog(stream, fmt, batch_size)
+    finally:
+        await announce_catalog_change()
+
+
+async def import_catalog(stream: BinaryIO, fmt: str, batch_size: int) -> ProductImportReportSchema:
+    if settings.DB_ASYNC:
+        async with AsyncSessionLocal() as session:
+            service = ProductService(AsyncProductRepository(session), session)
+            return await service.import_products(read_chunks(stream), fmt, batch_size, on_progress=print_progress)
+    with SessionLocal() as session:
+        service = ProductService(repository_for(session, ProductRepository, AsyncProductRepository), session)
+        return await service.import_products(read_chunks(stream), fmt, batch_size, on_progress=print_progress)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path", help="catalog file, or - for standard input")
+    parser.add_argument("--format", choices=("csv", "ndjson"), default=None)
+    parser.add_argument("--batch-size", type=int, default=settings.PRODUCT_IMPORT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    fmt = args.format or EXTENSIONS.get(os.path.splitext(args.path)[1].lower())
+    if fmt is None:
+        parser.error("cannot tell the format from the file name; pass --format")
+
+    if args.path == "-":
+        report = asyncio.run(run(sys.stdin.buffer, fmt, args.batch_size))
+    else:
+        with open(args.path, "rb") as stream:
+            report = asyncio.run(run(stream, fmt, args.batch_size))
+
+    for error in report.errors:
+        print(f"line {error.line}: {error.error}", file=sys.stderr)
+    if report.failed > len(report.errors):
+        print(f"... and {report.failed - len(report.errors)} more rejected rows", file=sys.stderr)
+    print(f"{report.imported} of {report.rows} rows imported in {report.batches} batches")
+    sys.exit(1 if report.failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""Recompute the order_stats table from the orders and report drift.
+
+Usage:
+    python -m app.commands.rebuild_order_stats [--check]
+
+Aggregates the orders table into the rows order_stats should hold and
+compares them with the running totals (summed over shards). Without
+--check, drifted totals are replaced by the recomputed ones (collapsed to
+shard 0) in one transaction, during which order writes wait. Exits with
+status 1 when drift was found, so `--check` can run as a periodic job.
+Run it once after applying the migration that adds the table.
+"""
+import argparse
+import asyncio
+import sys
+
+from app.config import settings
+from app.database import AsyncSessionLocal, SessionLocal
+# Every mapped class must be imported before the ORM configures relationships
+from app.core.models import user, product, order, order_stats  # noqa: F401
+from app.repositories.order_stats_repository import COUNTERS, OrderStatsRepository, AsyncOrderStatsRepository
+
+
+async def run(dry_run: bool) -> dict:
+    if settings.DB_ASYNC:
+        async with AsyncSessionLocal() as session:
+            return await AsyncOrderStatsRepository(session).rebuild(dry_run=dry_run)
+    with SessionLocal() as session:
+        return await asyncio.to_thread(OrderStatsRepository(session).rebuild, dry_run)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--check", action="store_true", help="only report drift; leave the table as it is")
+    args = parser.parse_args()
+
+    drift = asyncio.run(run(args.check))
+    for (day, product_id, status), (current, expected) in sorted(drift.items()):
+        changes = ", ".join(
+            f"{name} {have} -> {want}" for name, have, want in zip(COUNTERS, current, expected) if have != want
+        )
+        print(f"day={day} product_id={product_id} status={status.value}: {changes}")
+    if drift:
+        print(f"{len(drift)} drifted rows {'found' if args.check else 'rebuilt'}", file=sys.stderr)
+    else:
+        print("order_stats is consistent with orders", file=sys.stderr)
+    sys.exit(1 if drift else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,101 @@
+from typing import Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
     SECRET_KEY: str
     DB_URL: str = "sqlite:///./test.db"
+    # Serve requests through AsyncSession (asyncpg / aiosqlite); False keeps the
+    # blocking driver with repository calls run in the threadpool, for comparison
+    DB_ASYNC: bool = True
+    DB_POOL_SIZE: int = 20
+    DB_MAX_OVERFLOW: int = 30
     REDIS_HOST: str = "localhost"
     REDIS_PORT: int = 6379
+    REDIS_MAX_CONNECTIONS: int = 50
+    REDIS_POOL_TIMEOUT: float = 1.0
+    REDIS_SOCKET_TIMEOUT: float = 0.5
+    REDIS_SOCKET_CONNECT_TIMEOUT: float = 0.5
+    ORDER_CACHE_TTL: int = 300
+    ORDER_CACHE_NEGATIVE_TTL: int = 30
+    # Bump when the cached order layout changes so old entries are ignored
+    ORDER_CACHE_KEY_VERSION: int = 1
+    # In-process L1 in front of Redis; 0 disables it
+    ORDER_CACHE_LOCAL_MAXSIZE: int = 10000
+    ORDER_CACHE_LOCAL_TTL: int = 30
+    # Serializer for cached orders: json, orjson or msgpack. Entries are tagged,
+    # so workers with different settings read each other's values. With a JSON
+    # codec a cache hit is returned as the response body without transcoding
+    ORDER_CACHE_CODEC: str = "orjson"
+    # none, zlib or zstd; applied to values of at least ORDER_CACHE_COMPRESS_MIN_SIZE bytes
+    ORDER_CACHE_COMPRESSION: str = "zlib"
+    ORDER_CACHE_COMPRESS_MIN_SIZE: int = 1024
+    # Most orders accepted by one POST /orders/batch
+    ORDER_BATCH_MAX_SIZE: int = 5000
+    # Rows fetched per server-side cursor round trip by GET /orders/export
+    ORDER_EXPORT_BATCH_SIZE: int = 1000
+    # order_stats breakdowns maintained besides the per-status totals
+    ORDER_STATS_DAILY: bool = True
+    ORDER_STATS_PER_PRODUCT: bool = True
+    # Rows each hot order_stats total is spread over, to cut lock waits between writers
+    ORDER_STATS_SHARDS: int = 8
+    # Responses to requests sent with an Idempotency-Key are replayed for this
+    # many seconds. The lock against concurrent duplicates expires after
+    # LOCK_TTL seconds (keep it above the slowest request it guards); the
+    # duplicates are answered 409 with Retry-After
+    IDEMPOTENCY_TTL: int = 86400
+    IDEMPOTENCY_LOCK_TTL: float = 10.0
+    IDEMPOTENCY_RETRY_AFTER: int = 1
+    # Seconds clients may reuse a catalog response before revalidating it with
+    # If-None-Match; 0 makes them ask every time (answered with 304 if unchanged)
+    PRODUCT_CACHE_MAX_AGE: int = 0
+    # Order status events are written to an outbox table with each order change
+    # and moved to the OUTBOX_STREAM Redis Stream (capped near MAXLEN entries),
+    # BATCH_SIZE events per round; once the outbox is drained it is polled every
+    # FLUSH_INTERVAL seconds. Every worker runs a dispatcher but only the holder
+    # of a LEASE_TTL-second Redis lease sends, which keeps the stream in order
+    OUTBOX_DISPATCH: bool = True
+    OUTBOX_STREAM: str = "order-events"
+    OUTBOX_STREAM_MAXLEN: int = 1000000
+    OUTBOX_BATCH_SIZE: int = 500
+    OUTBOX_FLUSH_INTERVAL: float = 0.5
+    OUTBOX_LEASE_TTL: float = 10.0
+    # Rows upserted per transaction by the product import
+    PRODUCT_IMPORT_BATCH_SIZE: int = 1000
+    # Row errors listed in an import report (all are counted)
+    PRODUCT_IMPORT_MAX_ERRORS: int = 100
+    # Longest record accepted; bounds the parser's buffer
+    PRODUCT_IMPORT_MAX_LINE_BYTES: int = 1024 * 1024
+    # Per-process cache of authenticated principals; 0 disables it. Bounds how
+    # long a user change made by another worker takes to apply
+    PRINCIPAL_CACHE_MAXSIZE: int = 10000
+    PRINCIPAL_CACHE_TTL: int = 60
+    # bcrypt runs in a per-worker process pool; beyond MAX_PENDING running or
+    # queued calls, login and register answer 503 with Retry-After. 0 workers
+    # keeps hashing in the threadpool, for comparison
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_PENDING: int = 16
+    PASSWORD_HASH_RETRY_AFTER: int = 1
+    # bcrypt or argon2 (needs argon2-cffi). At startup the cost is calibrated so
+    # one hash takes at most PASSWORD_HASH_TARGET_MS here, within the optional
+    # MIN/MAX_COST bounds (bcrypt rounds, argon2 time_cost); 0 skips calibration
+    PASSWORD_HASH_SCHEME: str = "bcrypt"
+    PASSWORD_HASH_TARGET_MS: float = 250
+    PASSWORD_HASH_MIN_COST: Optional[int] = None
+    PASSWORD_HASH_MAX_COST: Optional[int] = None
+    # Verified JWT claims kept per process until the token expires; 0 disables it
+    TOKEN_CACHE_MAXSIZE: int = 10000
+    # With several workers, point this at a file (e.g. on tmpfs) so /metrics
+    # aggregates request metrics across them; unset keeps them per process
+    METRICS_SHARED_PATH: Optional[str] = None
+    METRICS_MAX_WORKERS: int = 32
+    LOG_LEVEL: str = "INFO"
+    # json (one object per line) or text
+    LOG_FORMAT: str = "json"
+    LOG_FILE: Optional[str] = "logs/app.log"
+    # Records waiting for the writer thread; beyond this they are dropped and counted
+    LOG_QUEUE_SIZE: int = 10000
+    # Fraction of per-request access lines (logger app.access) that are kept
+    LOG_ACCESS_SAMPLE_RATE: float = 1.0
 
     model_config = SettingsConfigDict(
         env_file="../.env",
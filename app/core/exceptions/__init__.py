@@ -2,12 +2,18 @@ from .custom_exceptions import (
     ProductNotFoundError,
     InsufficientStockError,
     UnauthorizedOrderAccessError,
-    OrderNotFoundError
+    OrderNotFoundError,
+    OrderStatusChangeForbiddenError,
+    InvalidOrderStatusTransitionError,
+    OrderBatchRejectedError
 )
 
 __all__ = [
     'ProductNotFoundError',
     'InsufficientStockError',
     'UnauthorizedOrderAccessError',
-    'OrderNotFoundError'
+    'OrderNotFoundError',
+    'OrderStatusChangeForbiddenError',
+    'InvalidOrderStatusTransitionError',
+    'OrderBatchRejectedError'
 ]
\ No newline at end of file
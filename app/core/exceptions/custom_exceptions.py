@@ -18,6 +18,33 @@ class OrderNotFoundError(Exception):
     def __init__(self, order_id: int):
         self.order_id = order_id
         super().__init__(f"Order with ID '{order_id}' not found")
+
+class OrderStatusChangeForbiddenError(Exception):
+    def __init__(self, order_id: int):
+        self.order_id = order_id
+        super().__init__(f"Only administrators can change the status of order {order_id}")
+
+class InvalidOrderStatusTransitionError(Exception):
+    def __init__(self, order_id: int, current: str, requested: str):
+        self.order_id = order_id
+        self.current = current
+        self.requested = requested
+        super().__init__(f"Order {order_id} cannot go from '{current}' to '{requested}'")
+
+class OrderBatchRejectedError(Exception):
+    def __init__(self, errors: dict):
+        # Batch position -> ProductNotFoundError / InsufficientStockError
+        self.errors = errors
+        super().__init__(f"{len(errors)} order(s) in the batch failed; no orders were created")
+
+class IdempotencyKeyInProgressError(Exception):
+    def __init__(self, retry_after: int):
+        self.retry_after = retry_after
+        super().__init__("A request with this Idempotency-Key is still in progress, retry later")
+
+class IdempotencyKeyReusedError(Exception):
+    def __init__(self):
+        super().__init__("This Idempotency-Key was already used for a different request")
         
 class AuthException(Exception):
     """Base authentication exception"""
@@ -46,4 +73,9 @@ class TokenExpiredError(TokenInvalidError):
 class InsufficientPermissionsError(AuthException):
     def __init__(self):
         super().__init__("Insufficient permissions")
-        self.status_code = 403
\ No newline at end of file
+        self.status_code = 403
+
+class PasswordHashingBusyError(Exception):
+    def __init__(self, retry_after: int):
+        self.retry_after = retry_after
+        super().__init__("Too many password checks in progress, retry later")
@@ -1,5 +1,5 @@
 import enum
-from sqlalchemy import Column, Enum, Integer, String
+from sqlalchemy import Column, DateTime, Enum, Index, Integer, String
 from sqlalchemy.orm import relationship, Mapped
 from app.database import Base
 from app.core.models.order_association import OrderProductAssociation
@@ -11,11 +11,18 @@ class OrderStatus(str, enum.Enum):
 
 class Order(Base):
     __tablename__ = "orders"
+    __table_args__ = (
+        # Serves the owner/status filters of GET /orders and its keyset pagination on order_id
+        Index("ix_orders_customer_status_id", "customer_name", "order_status", "order_id"),
+        Index("ix_orders_total_price", "total_price"),
+    )
     
     order_id = Column(Integer, primary_key=True, index=True)
     customer_name = Column(String)
     order_status = Column(Enum(OrderStatus), default=OrderStatus.PENDING, nullable=False)
     total_price = Column(Integer)
+    # Set by OrderService; NULL for orders created before the column existed
+    created_at = Column(DateTime(timezone=True), nullable=True)
     
     order_associations: Mapped[list[OrderProductAssociation]] = relationship(
         "OrderProductAssociation",
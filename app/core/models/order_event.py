@@ -0,0 +1,30 @@
+import enum
+from sqlalchemy import BigInteger, Column, DateTime, Enum, Integer, String
+from app.database import Base
+from app.core.models.order import OrderStatus
+
+class OrderEventType(str, enum.Enum):
+    CREATED = "created"
+    UPDATED = "updated"
+    CANCELLED = "cancelled"
+
+class OrderEvent(Base):
+    """Transactional outbox of order status changes.
+
+    Rows are written in the transaction that changes the order and deleted
+    once OutboxDispatcher has added them to the Redis Stream, so an event
+    exists exactly when its change was committed. Delivery is at least
+    once; consumers deduplicate on event_id, which also orders the events.
+    """
+    __tablename__ = "order_outbox"
+
+    # SQLite only autoincrements INTEGER PRIMARY KEY columns
+    event_id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    event_type = Column(Enum(OrderEventType), nullable=False)
+    # No foreign key: events outlive hard-deleted orders until dispatched
+    order_id = Column(Integer, nullable=False)
+    old_status = Column(Enum(OrderStatus), nullable=True)
+    new_status = Column(Enum(OrderStatus), nullable=False)
+    customer_name = Column(String)
+    total_price = Column(Integer)
+    created_at = Column(DateTime(timezone=True), nullable=False)
@@ -0,0 +1,31 @@
+from datetime import date
+from sqlalchemy import BigInteger, Column, Date, Enum, Integer
+from app.database import Base
+from app.core.models.order import OrderStatus
+
+# Key values of the rows that total over every day / every product
+ALL_DAYS = date(1970, 1, 1)
+ALL_PRODUCTS = 0
+
+class OrderStat(Base):
+    """Running order totals per status, maintained by deltas.
+
+    Rows with day=ALL_DAYS and product_id=ALL_PRODUCTS are the per-status
+    totals; other days break them down by the orders' creation day, other
+    product ids by product (with day=ALL_DAYS). The ALL_PRODUCTS rows, which
+    every order touches, are spread over `shard` rows so concurrent writers
+    rarely wait on the same one; readers sum the shards.
+    """
+    __tablename__ = "order_stats"
+
+    # Key order serves all three reads: (ALL_DAYS, ALL_PRODUCTS), day ranges, (ALL_DAYS, products)
+    day = Column(Date, primary_key=True)
+    product_id = Column(Integer, primary_key=True)
+    order_status = Column(Enum(OrderStatus), primary_key=True)
+    shard = Column(Integer, primary_key=True)
+
+    order_count = Column(BigInteger, nullable=False, default=0)
+    # Sum of total_price; only kept on ALL_PRODUCTS rows (line prices are not stored)
+    total_price = Column(BigInteger, nullable=False, default=0)
+    # Units ordered
+    quantity = Column(BigInteger, nullable=False, default=0)
@@ -1,4 +1,7 @@
-from typing import List
+import csv
+import io
+from typing import List, Optional, Sequence, Tuple, Union
+import orjson
 from pydantic import BaseModel
 from app.core.models.order import OrderStatus
 
@@ -22,4 +25,104 @@ class OrderSchema(BaseModel):
     }
 
 class OrderCreateSchema(BaseModel):
-    products: List[OrderProductSchema]
\ No newline at end of file
+    products: List[OrderProductSchema]
+
+class OrderUpdateSchema(BaseModel):
+    # Fields left out (or null) keep their current value
+    order_status: Optional[OrderStatus] = None
+
+class OrderBatchCreateSchema(BaseModel):
+    orders: List[OrderCreateSchema]
+    # True: create every order or none; False: create the orders that can be fulfilled
+    atomic: bool = True
+
+class OrderErrorSchema(BaseModel):
+    error_type: str
+    detail: str
+    product_id: Optional[int] = None
+    available: Optional[int] = None
+
+class OrderBatchItemSchema(BaseModel):
+    index: int
+    status: str
+    order: Optional[OrderSchema] = None
+    error: Optional[OrderErrorSchema] = None
+
+class OrderBatchResultSchema(BaseModel):
+    created: int
+    failed: int
+    results: List[OrderBatchItemSchema]
+
+def encode_order(order) -> bytes:
+    """Serialize an order straight to its OrderSchema JSON body.
+
+    Builds the same document as OrderSchema(...).model_dump_json() without
+    the validation pass; keep the two in step when the schema changes.
+    """
+    return orjson.dumps({
+        "order_id": order.order_id,
+        "customer_name": order.customer_name,
+        "order_status": order.order_status,
+        "total_price": order.total_price,
+        "products": [
+            {"product_id": product.product_id, "quantity": product.quantity}
+            for product in order.products
+        ],
+    })
+
+def encode_order_list(bodies: List[bytes]) -> bytes:
+    """Join already-encoded order bodies into a JSON array."""
+    return b"[" + b",".join(bodies) + b"]"
+
+# Columns of GET /orders/export?format=csv: one row per order line
+EXPORT_CSV_HEADER = ("order_id", "customer_name", "order_status", "total_price", "product_id", "quantity")
+
+def encode_export_ndjson(orders: Sequence[Tuple[object, List[Tuple[int, int]]]]) -> bytes:
+    """NDJSON lines, shaped like OrderSchema, for (order row, [(product_id, quantity)]) pairs.
+
+    Quantities are the ordered quantities of each line.
+    """
+    return b"".join(
+        orjson.dumps({
+            "order_id": order.order_id,
+            "customer_name": order.customer_name,
+            "order_status": order.order_status,
+            "total_price": order.total_price,
+            "products": [{"product_id": product_id, "quantity": quantity} for product_id, quantity in lines],
+        }) + b"\n"
+        for order, lines in orders
+    )
+
+def encode_export_csv(orders: Sequence[Tuple[object, List[Tuple[int, int]]]], header: bool = False) -> bytes:
+    """CSV rows (EXPORT_CSV_HEADER columns) for (order row, [(product_id, quantity)]) pairs."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(EXPORT_CSV_HEADER)
+    for order, lines in orders:
+        fields = (order.order_id, order.customer_name, order.order_status.value, order.total_price)
+        if not lines:
+            writer.writerow(fields + ("", ""))
+        for product_id, quantity in lines:
+            writer.writerow(fields + (product_id, quantity))
+    return buffer.getvalue().encode()
+
+def order_error_detail(exc: Exception) -> dict:
+    """OrderErrorSchema fields for a per-order failure."""
+    detail = {"error_type": exc.__class__.__name__, "detail": str(exc)}
+    for field in ("product_id", "available"):
+        if hasattr(exc, field):
+            detail[field] = getattr(exc, field)
+    return detail
+
+def encode_order_batch(results: List[Union[bytes, Exception]]) -> bytes:
+    """Serialize per-item batch results (order bodies or errors) as OrderBatchResultSchema."""
+    items = []
+    created = 0
+    for index, result in enumerate(results):
+        if isinstance(result, bytes):
+            created += 1
+            items.append(b'{"index":%d,"status":"created","order":%b}' % (index, result))
+        else:
+            items.append(orjson.dumps({"index": index, "status": "failed", "error": order_error_detail(result)}))
+    return b'{"created":%d,"failed":%d,"results":[%b]}' % (created, len(results) - created, b",".join(items))
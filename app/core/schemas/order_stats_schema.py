@@ -0,0 +1,32 @@
+from datetime import date
+from typing import List, Optional
+from pydantic import BaseModel
+from app.core.models.order import OrderStatus
+
+class OrderStatusTotalsSchema(BaseModel):
+    order_status: OrderStatus
+    order_count: int
+    total_price: int
+    quantity: int
+
+    model_config = {
+        "from_attributes": True
+    }
+
+class OrderDayTotalsSchema(OrderStatusTotalsSchema):
+    day: date
+
+class OrderProductTotalsSchema(BaseModel):
+    product_id: int
+    order_status: OrderStatus
+    order_count: int
+    quantity: int
+
+    model_config = {
+        "from_attributes": True
+    }
+
+class OrderStatsSchema(BaseModel):
+    statuses: List[OrderStatusTotalsSchema]
+    days: Optional[List[OrderDayTotalsSchema]] = None
+    products: Optional[List[OrderProductTotalsSchema]] = None
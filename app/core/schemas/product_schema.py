@@ -1,4 +1,5 @@
-from pydantic import BaseModel
+from typing import List, Optional
+from pydantic import BaseModel, Field
 
 class ProductSchema(BaseModel):
     product_id: int
@@ -13,4 +14,23 @@ class ProductSchema(BaseModel):
 class ProductCreateSchema(BaseModel):
     name: str
     price: float
-    quantity: int
\ No newline at end of file
+    quantity: int
+
+class ProductImportRowSchema(BaseModel):
+    # Rows with a product_id update that product (or create it with that id)
+    product_id: Optional[int] = Field(None, ge=1)
+    name: str
+    price: int = Field(ge=0)
+    quantity: int = Field(ge=0)
+
+class ProductImportErrorSchema(BaseModel):
+    line: int
+    error: str
+
+class ProductImportReportSchema(BaseModel):
+    rows: int
+    imported: int
+    failed: int
+    batches: int
+    # The first PRODUCT_IMPORT_MAX_ERRORS failures; `failed` counts all of them
+    errors: List[ProductImportErrorSchema]
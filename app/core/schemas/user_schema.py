@@ -10,6 +10,17 @@ class UserSchema(BaseModel):
         "from_attributes": True
     }
 
+class PrincipalSchema(BaseModel):
+    """The authenticated caller: identity and admin flag, without a live ORM row."""
+    user_id: int
+    username: str
+    is_admin: bool
+
+    model_config = {
+        "from_attributes": True,
+        "frozen": True
+    }
+
 class UserCreateSchema(BaseModel):
     username: str
     email: EmailStr
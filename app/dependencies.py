@@ -1,23 +1,70 @@
-from fastapi import Depends, HTTPException, status
+from contextlib import asynccontextmanager
+from typing import Callable, Optional, Union
+from fastapi import Depends, Header, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from jose import JWTError, jwt
-from app.database import SessionLocal
-from app.repositories.user_repository import UserRepository
+from starlette.concurrency import run_in_threadpool
+from jose import JWTError
+from redis import asyncio as aioredis
+from app.database import SessionLocal, AsyncSessionLocal
+from app.repositories.user_repository import UserRepository, AsyncUserRepository
+from app.repositories.threaded_repository import repository_for
+from app.services.idempotency import IdempotencyStore, IdempotentRequest, request_fingerprint
+from app.services.order_cache import OrderCache
+from app.services.password_hasher import PasswordHasher
+from app.services.principal_cache import principal_cache
+from app.services.token_cache import token_cache
+from app.core.schemas.user_schema import PrincipalSchema
 from app.config import settings
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
-def get_db():
+@asynccontextmanager
+async def open_db():
+    """A database session of the configured flavour, closed on exit."""
+    if settings.DB_ASYNC:
+        async with AsyncSessionLocal() as db:
+            yield db
+        return
+
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
+        await run_in_threadpool(db.close)
+
+async def get_db():
+    async with open_db() as db:
+        yield db
+
+async def get_db_opener() -> Callable:
+    """open_db itself, for streaming responses.
+
+    Dependencies with yield are closed before a StreamingResponse body runs,
+    so a streamed body has to open (and close) its own session.
+    """
+    return open_db
+
+async def get_redis(request: Request) -> Optional[aioredis.Redis]:
+    # None when the app runs without its lifespan (e.g. a bare TestClient); caching is then skipped
+    return getattr(request.app.state, "redis", None)
+
+async def get_order_cache(request: Request) -> Optional[OrderCache]:
+    return getattr(request.app.state, "order_cache", None)
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_idempotency_store(request: Request) -> Optional[IdempotencyStore]:
+    return getattr(request.app.state, "idempotency_store", None)
+
+async def get_password_hasher(request: Request) -> Optional[PasswordHasher]:
+    return getattr(request.app.state, "password_hasher", None)
+
+async def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: Union[Session, AsyncSession] = Depends(get_db)
+) -> PrincipalSchema:
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
+        payload = token_cache.decode(token)
         username: str = payload.get("sub")
         if username is None:
             raise HTTPException(
@@ -29,8 +76,15 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
             status_code=status.HTTP_401_UNAUTHORIZED, 
             detail="Invalid token"
         )
-    
-    user = UserRepository(db).get_by_username(username)
+
+    # The session only connects on a cache miss
+    user_repo = repository_for(db, UserRepository, AsyncUserRepository)
+    user_id = payload.get("user_id")
+    if user_id is not None:
+        user = await principal_cache.get_or_load(user_id, lambda: user_repo.get(user_id))
+    else:
+        # Tokens issued before user_id was added
+        user = await principal_cache.get_or_load(username, lambda: user_repo.get_by_username(username))
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, 
@@ -38,10 +92,36 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
         )
     return user
 
-def get_current_admin(current_user = Depends(get_current_user)):
+async def get_current_admin(current_user: PrincipalSchema = Depends(get_current_user)) -> PrincipalSchema:
     if not current_user.is_admin:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, 
             detail="Admin privileges required"
         )
-    return current_user
\ No newline at end of file
+    return current_user
+
+def idempotent(scope: str) -> Callable:
+    """Dependency factory honouring the Idempotency-Key header within `scope`.
+
+    Keys are per user. The dependency yields an IdempotentRequest: the
+    endpoint returns its `replay` when set, and otherwise calls `save()` with
+    its successful response. If the endpoint raises, the key is released so
+    the client can retry.
+    """
+    async def claim_idempotency_key(
+        request: Request,
+        idempotency_key: Optional[str] = Header(None, min_length=1, max_length=255),
+        current_user: PrincipalSchema = Depends(get_current_user),
+        store: Optional[IdempotencyStore] = Depends(get_idempotency_store)
+    ):
+        if idempotency_key is None or store is None:
+            yield IdempotentRequest()
+            return
+        fingerprint = request_fingerprint(request.method, request.url.path, await request.body())
+        claim = await store.begin(f"{scope}:{current_user.user_id}:{idempotency_key}", fingerprint)
+        try:
+            yield claim
+        finally:
+            await claim.release()
+
+    return claim_idempotency_key
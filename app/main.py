@@ -1,40 +1,173 @@
+import asyncio
 import logging
 import bcrypt
+from contextlib import asynccontextmanager, suppress
 from fastapi import FastAPI, Request, status, APIRouter
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 
+from app.config import settings
+from app.database import async_engine
+from app.dependencies import open_db
+from app.redis_client import create_redis_client
+from app.services.catalog_snapshot import product_catalog
+from app.services.catalog_version import catalog_version
+from app.services.idempotency import IdempotencyStore
+from app.services.order_cache import OrderCache
+from app.services.order_events import OutboxDispatcher
+from app.services.password_hasher import PasswordHasher
+from app.services.principal_cache import principal_cache
+from app.services.token_cache import token_cache
+from app.utils.cache_codec import CacheCodec
+from app.utils.auth_utils import calibrate_password_cost, configure_password_context
+from app.utils.logging_setup import configure_logging
+from app.utils.lru_cache import LRUCache
+from app.utils.request_context import RequestIdMiddleware
 from app.routers.api import api_router
+from app.core.schemas.order_schema import order_error_detail
 from app.core.exceptions.custom_exceptions import (
     AuthException,
+    IdempotencyKeyInProgressError,
+    IdempotencyKeyReusedError,
     InsufficientStockError,
+    InvalidOrderStatusTransitionError,
+    OrderBatchRejectedError,
     OrderNotFoundError,
+    OrderStatusChangeForbiddenError,
+    PasswordHashingBusyError,
     ProductNotFoundError,
     UnauthorizedOrderAccessError
 )
-from app.utils.metrics_middleware import MetricsMiddleware
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler('logs/app.log')
-    ]
+from app.utils.metrics_middleware import MetricsMiddleware, MetricsRegistry, render_stats
+from app.utils.shared_metrics import SharedMetricsRegistry, route_series
+
+# Configure logging: handlers run on a background thread behind a bounded queue
+logging_pipeline = configure_logging(
+    level=settings.LOG_LEVEL,
+    log_format=settings.LOG_FORMAT,
+    log_file=settings.LOG_FILE,
+    queue_size=settings.LOG_QUEUE_SIZE,
+    access_sample_rate=settings.LOG_ACCESS_SAMPLE_RATE
 )
 
+logger = logging.getLogger(__name__)
+
 if not hasattr(bcrypt, "__about__"):
     bcrypt.__about__ = type("dummy", (), {"__version__": "4.2.1"})
 
-app = FastAPI()
-metrics_middleware = MetricsMiddleware(app)
-app.middleware("http")(metrics_middleware.dispatch)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Claimed here rather than at import or fork, so only serving processes take a slot
+    if isinstance(metrics_registry, SharedMetricsRegistry):
+        metrics_registry.attach()
+    # One pooled Redis client per worker, shared by every request
+    app.state.redis = create_redis_client()
+    local_cache = None
+    if settings.ORDER_CACHE_LOCAL_MAXSIZE > 0:
+        local_cache = LRUCache(settings.ORDER_CACHE_LOCAL_MAXSIZE, settings.ORDER_CACHE_LOCAL_TTL)
+    app.state.order_cache = OrderCache(
+        app.state.redis,
+        ttl=settings.ORDER_CACHE_TTL,
+        negative_ttl=settings.ORDER_CACHE_NEGATIVE_TTL,
+        key_version=settings.ORDER_CACHE_KEY_VERSION,
+        local=local_cache,
+        codec=CacheCodec(
+            settings.ORDER_CACHE_CODEC,
+            settings.ORDER_CACHE_COMPRESSION,
+            settings.ORDER_CACHE_COMPRESS_MIN_SIZE
+        )
+    )
+    invalidation_listener = asyncio.create_task(app.state.order_cache.listen())
+    app.state.idempotency_store = IdempotencyStore(
+        app.state.redis,
+        ttl=settings.IDEMPOTENCY_TTL,
+        lock_ttl=settings.IDEMPOTENCY_LOCK_TTL,
+        retry_after=settings.IDEMPOTENCY_RETRY_AFTER
+    )
+    # Catalog ETags follow product writes made by any worker
+    catalog_version.attach(app.state.redis)
+    catalog_version_listener = asyncio.create_task(catalog_version.listen())
+    # Order events leave through the outbox, off the request path
+    app.state.outbox_dispatcher = None
+    background_tasks = [invalidation_listener, catalog_version_listener]
+    if settings.OUTBOX_DISPATCH:
+        app.state.outbox_dispatcher = OutboxDispatcher(
+            open_db,
+            app.state.redis,
+            stream=settings.OUTBOX_STREAM,
+            batch_size=settings.OUTBOX_BATCH_SIZE,
+            flush_interval=settings.OUTBOX_FLUSH_INTERVAL,
+            maxlen=settings.OUTBOX_STREAM_MAXLEN,
+            lease_ttl=settings.OUTBOX_LEASE_TTL
+        )
+        background_tasks.append(asyncio.create_task(app.state.outbox_dispatcher.run()))
+    password_cost = None
+    if settings.PASSWORD_HASH_TARGET_MS > 0:
+        password_cost = calibrate_password_cost(
+            settings.PASSWORD_HASH_SCHEME,
+            settings.PASSWORD_HASH_TARGET_MS,
+            settings.PASSWORD_HASH_MIN_COST,
+            settings.PASSWORD_HASH_MAX_COST
+        )
+        logger.info("Password hashing: %s at cost %s", settings.PASSWORD_HASH_SCHEME, password_cost)
+    configure_password_context(settings.PASSWORD_HASH_SCHEME, password_cost)
+    app.state.password_hasher = None
+    if settings.PASSWORD_HASH_WORKERS > 0:
+        app.state.password_hasher = PasswordHasher(
+            workers=settings.PASSWORD_HASH_WORKERS,
+            max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+            retry_after=settings.PASSWORD_HASH_RETRY_AFTER,
+            scheme=settings.PASSWORD_HASH_SCHEME,
+            cost=password_cost
+        )
+    yield
+    if app.state.password_hasher is not None:
+        app.state.password_hasher.shutdown()
+    for task in background_tasks:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+    await app.state.redis.aclose()
+    if async_engine is not None:
+        await async_engine.dispose()
 
+app = FastAPI(lifespan=lifespan)
 app.include_router(api_router)
 
-@app.get("/metrics")
+@app.get("/metrics", response_class=PlainTextResponse)
 async def get_metrics():
-    return metrics_middleware.get_metrics()
+    """Prometheus text exposition format."""
+    body = metrics_registry.render()
+    order_cache = getattr(app.state, "order_cache", None)
+    if order_cache is not None:
+        body += render_stats("order_cache", order_cache.stats)
+    idempotency_store = getattr(app.state, "idempotency_store", None)
+    if idempotency_store is not None:
+        body += render_stats("idempotency", idempotency_store.stats)
+    body += render_stats("principal_cache", principal_cache.stats)
+    body += render_stats("catalog", catalog_version.stats)
+    body += render_stats("catalog_snapshot", product_catalog.stats)
+    body += render_stats("token_cache", token_cache.report())
+    password_hasher = getattr(app.state, "password_hasher", None)
+    if password_hasher is not None:
+        body += render_stats("password_hasher", {**password_hasher.stats, "pending": password_hasher.pending})
+    outbox_dispatcher = getattr(app.state, "outbox_dispatcher", None)
+    if outbox_dispatcher is not None:
+        body += render_stats("outbox", outbox_dispatcher.stats)
+    body += render_stats("logging", logging_pipeline.stats())
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4; charset=utf-8")
+
+# Built after every route is registered: the shared layout has one series per route
+if settings.METRICS_SHARED_PATH:
+    metrics_registry = SharedMetricsRegistry(
+        settings.METRICS_SHARED_PATH,
+        route_series(app.routes),
+        settings.METRICS_MAX_WORKERS
+    )
+else:
+    metrics_registry = MetricsRegistry()
+app.add_middleware(MetricsMiddleware, registry=metrics_registry)
+# Added last so it runs outermost: the access log line already carries the id
+app.add_middleware(RequestIdMiddleware)
 
 @app.exception_handler(AuthException)
 async def auth_exception_handler(request: Request, exc: AuthException):
@@ -47,6 +180,17 @@ async def auth_exception_handler(request: Request, exc: AuthException):
         }
     )
 
+@app.exception_handler(PasswordHashingBusyError)
+async def password_hashing_busy_handler(request: Request, exc: PasswordHashingBusyError):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={
+            "detail": str(exc),
+            "error_type": "PasswordHashingBusyError"
+        },
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
 # Product-related exceptions
 @app.exception_handler(ProductNotFoundError)
 async def product_not_found_handler(request: Request, exc: ProductNotFoundError):
@@ -94,6 +238,63 @@ async def order_not_found_handler(request: Request, exc: OrderNotFoundError):
         }
     )
 
+@app.exception_handler(OrderStatusChangeForbiddenError)
+async def order_status_change_forbidden_handler(request: Request, exc: OrderStatusChangeForbiddenError):
+    return JSONResponse(
+        status_code=status.HTTP_403_FORBIDDEN,
+        content={
+            "detail": str(exc),
+            "order_id": exc.order_id,
+            "error_type": "OrderStatusChangeForbiddenError"
+        }
+    )
+
+@app.exception_handler(InvalidOrderStatusTransitionError)
+async def invalid_order_status_transition_handler(request: Request, exc: InvalidOrderStatusTransitionError):
+    return JSONResponse(
+        status_code=status.HTTP_409_CONFLICT,
+        content={
+            "detail": str(exc),
+            "order_id": exc.order_id,
+            "current_status": exc.current,
+            "requested_status": exc.requested,
+            "error_type": "InvalidOrderStatusTransitionError"
+        }
+    )
+
+@app.exception_handler(OrderBatchRejectedError)
+async def order_batch_rejected_handler(request: Request, exc: OrderBatchRejectedError):
+    return JSONResponse(
+        status_code=status.HTTP_409_CONFLICT,
+        content={
+            "detail": str(exc),
+            "errors": [{"index": index, **order_error_detail(error)} for index, error in sorted(exc.errors.items())],
+            "error_type": "OrderBatchRejectedError"
+        }
+    )
+
+# Idempotency-Key exceptions
+@app.exception_handler(IdempotencyKeyInProgressError)
+async def idempotency_in_progress_handler(request: Request, exc: IdempotencyKeyInProgressError):
+    return JSONResponse(
+        status_code=status.HTTP_409_CONFLICT,
+        content={
+            "detail": str(exc),
+            "error_type": "IdempotencyKeyInProgressError"
+        },
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+@app.exception_handler(IdempotencyKeyReusedError)
+async def idempotency_reused_handler(request: Request, exc: IdempotencyKeyReusedError):
+    return JSONResponse(
+        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        content={
+            "detail": str(exc),
+            "error_type": "IdempotencyKeyReusedError"
+        }
+    )
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
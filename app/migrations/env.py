@@ -10,7 +10,7 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 # Import your Base and settings
 from app.database import Base
 from app.config import settings
-from app.core.models import user, product, order
+from app.core.models import user, product, order, order_stats, order_event
 
 # Set the target metadata for 'autogenerate' support
 target_metadata = Base.metadata
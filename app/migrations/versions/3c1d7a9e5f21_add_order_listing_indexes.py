@@ -0,0 +1,28 @@
+"""add order listing indexes
+
+Revision ID: 3c1d7a9e5f21
+Revises: bf9bbb538bc9
+Create Date: 2026-10-18 09:12:40.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c1d7a9e5f21'
+down_revision: Union[str, None] = 'bf9bbb538bc9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_orders_customer_status_id', 'orders', ['customer_name', 'order_status', 'order_id'], unique=False)
+    op.create_index('ix_orders_total_price', 'orders', ['total_price'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_orders_total_price', table_name='orders')
+    op.drop_index('ix_orders_customer_status_id', table_name='orders')
@@ -0,0 +1,44 @@
+"""add order_outbox
+
+Revision ID: 5d8f0a6c2b47
+Revises: 7e2b4c91d0a3
+Create Date: 2026-10-18 17:41:06.218934
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d8f0a6c2b47'
+down_revision: Union[str, None] = '7e2b4c91d0a3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# The orderstatus type already exists on PostgreSQL
+order_status = sa.Enum('PENDING', 'CONFIRMED', 'CANCELLED', name='orderstatus').with_variant(
+    postgresql.ENUM('PENDING', 'CONFIRMED', 'CANCELLED', name='orderstatus', create_type=False), 'postgresql'
+)
+order_event_type = sa.Enum('CREATED', 'UPDATED', 'CANCELLED', name='ordereventtype')
+
+
+def upgrade() -> None:
+    op.create_table('order_outbox',
+    sa.Column('event_id', sa.BigInteger().with_variant(sa.Integer(), 'sqlite'), autoincrement=True, nullable=False),
+    sa.Column('event_type', order_event_type, nullable=False),
+    sa.Column('order_id', sa.Integer(), nullable=False),
+    sa.Column('old_status', order_status, nullable=True),
+    sa.Column('new_status', order_status, nullable=False),
+    sa.Column('customer_name', sa.String(), nullable=True),
+    sa.Column('total_price', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('event_id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('order_outbox')
+    order_event_type.drop(op.get_bind(), checkfirst=True)
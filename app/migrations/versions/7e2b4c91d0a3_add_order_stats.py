@@ -0,0 +1,44 @@
+"""add order_stats and orders.created_at
+
+Revision ID: 7e2b4c91d0a3
+Revises: 3c1d7a9e5f21
+Create Date: 2026-10-18 14:02:11.530417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7e2b4c91d0a3'
+down_revision: Union[str, None] = '3c1d7a9e5f21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# The orderstatus type already exists on PostgreSQL
+order_status = sa.Enum('PENDING', 'CONFIRMED', 'CANCELLED', name='orderstatus').with_variant(
+    postgresql.ENUM('PENDING', 'CONFIRMED', 'CANCELLED', name='orderstatus', create_type=False), 'postgresql'
+)
+
+
+def upgrade() -> None:
+    op.add_column('orders', sa.Column('created_at', sa.DateTime(timezone=True), nullable=True))
+    op.create_table('order_stats',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('order_status', order_status, nullable=False),
+    sa.Column('shard', sa.Integer(), nullable=False),
+    sa.Column('order_count', sa.BigInteger(), nullable=False),
+    sa.Column('total_price', sa.BigInteger(), nullable=False),
+    sa.Column('quantity', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'product_id', 'order_status', 'shard')
+    )
+    # Populate with: python -m app.commands.rebuild_order_stats
+
+
+def downgrade() -> None:
+    op.drop_table('order_stats')
+    op.drop_column('orders', 'created_at')
@@ -0,0 +1,20 @@
+from redis import asyncio as aioredis
+
+from app.config import settings
+
+def create_redis_client() -> aioredis.Redis:
+    """Build the process-wide Redis client over a bounded connection pool.
+
+    Called once from the application lifespan; requests borrow connections
+    from the pool and wait up to REDIS_POOL_TIMEOUT when it is exhausted.
+    Responses are raw bytes; the order cache stores binary-encoded values.
+    """
+    pool = aioredis.BlockingConnectionPool(
+        host=settings.REDIS_HOST,
+        port=settings.REDIS_PORT,
+        max_connections=settings.REDIS_MAX_CONNECTIONS,
+        timeout=settings.REDIS_POOL_TIMEOUT,
+        socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=settings.REDIS_SOCKET_CONNECT_TIMEOUT
+    )
+    return aioredis.Redis(connection_pool=pool)
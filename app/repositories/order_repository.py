@@ -1,29 +1,261 @@
-from sqlalchemy.orm import Session
-from app.core.models.order import Order
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Sequence
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+from app.core.models.order import Order, OrderStatus
+from app.core.models.order_association import OrderProductAssociation
+from app.core.models.order_event import OrderEvent
+
+def order_load_options() -> tuple:
+    """Loader options for every order read.
+
+    OrderSchema reads each association and its product. Loading them up front
+    keeps a read at two SELECTs (orders, then associations joined to products)
+    however many orders and lines it returns.
+    """
+    return (selectinload(Order.order_associations).joinedload(OrderProductAssociation.product),)
+
+def _insert_orders_statement():
+    # Ids must come back in input order; PostgreSQL batches this with a sentinel
+    # column, SQLite cannot and falls back to one INSERT per order
+    return insert(Order).returning(Order.order_id, sort_by_parameter_order=True)
+
+def _order_filters(
+    customer_name: Optional[str],
+    status: Optional[OrderStatus],
+    min_price: Optional[float],
+    max_price: Optional[float]
+) -> list:
+    criteria = []
+    if customer_name is not None:
+        criteria.append(Order.customer_name == customer_name)
+    if status is not None:
+        criteria.append(Order.order_status == status)
+    if min_price is not None:
+        criteria.append(Order.total_price >= min_price)
+    if max_price is not None:
+        criteria.append(Order.total_price <= max_price)
+    return criteria
+
+def _export_statement(criteria: list, batch_size: int):
+    """One row per order line (or per order without lines), in order_id order.
+
+    Plain columns, not entities: nothing enters the identity map, and with
+    yield_per the driver streams through a server-side cursor where it can.
+    """
+    return (
+        select(
+            Order.order_id,
+            Order.customer_name,
+            Order.order_status,
+            Order.total_price,
+            OrderProductAssociation.product_id,
+            OrderProductAssociation.ordered_quantity
+        )
+        .outerjoin(Order.order_associations)
+        .filter(*criteria)
+        .order_by(Order.order_id, OrderProductAssociation.product_id)
+        .execution_options(yield_per=batch_size)
+    )
+
+def _in_input_order(orders: List[Order], order_ids: List[int]) -> List[Order]:
+    by_id = {order.order_id: order for order in orders}
+    return [by_id[order_id] for order_id in order_ids]
+
+def _association_rows(order_ids: List[int], lines: List[Dict[int, int]]) -> List[dict]:
+    return [
+        {"order_id": order_id, "product_id": product_id, "ordered_quantity": quantity}
+        for order_id, order_lines in zip(order_ids, lines)
+        for product_id, quantity in order_lines.items()
+    ]
+
+def _event_rows(order_ids: Sequence[int], events: Sequence[Optional[dict]]) -> List[dict]:
+    # Events are built before the orders have ids; pair them up here
+    return [{**event, "order_id": order_id} for order_id, event in zip(order_ids, events) if event is not None]
 
 class OrderRepository:
     def __init__(self, session: Session):
         self.session = session
 
-    def create(self, order: Order) -> Order:
+    def _query(self):
+        return self.session.query(Order).options(*order_load_options())
+
+    def _reload(self, order_id: int) -> Order:
+        return self._query().filter(Order.order_id == order_id).populate_existing().first()
+
+    def create(self, order: Order, events: Sequence[dict] = ()) -> Order:
+        """Insert the order and commit; `events` go to the outbox in the same transaction."""
         self.session.add(order)
+        if events:
+            self.session.flush()
+            self.session.execute(insert(OrderEvent), _event_rows([order.order_id] * len(events), events))
+        self.session.commit()
+        return self._reload(order.order_id)
+
+    def create_many(
+        self,
+        orders: List[dict],
+        lines: List[Dict[int, int]],
+        events: Sequence[Optional[dict]] = ()
+    ) -> List[Order]:
+        """Insert orders and their product lines with two bulk INSERTs, then commit.
+
+        `orders` holds Order column values and `lines` the matching
+        {product_id: quantity} maps; `events` (one per order, if given) go to
+        the outbox with one more. Returns the created orders in input order.
+        """
+        order_ids = list(self.session.execute(_insert_orders_statement(), orders).scalars())
+        rows = _association_rows(order_ids, lines)
+        if rows:
+            self.session.execute(insert(OrderProductAssociation), rows)
+        event_rows = _event_rows(order_ids, events)
+        if event_rows:
+            self.session.execute(insert(OrderEvent), event_rows)
         self.session.commit()
-        self.session.refresh(order)
-        return order
+        return _in_input_order(self._query().filter(Order.order_id.in_(order_ids)).all(), order_ids)
 
     def get(self, order_id: int) -> Order:
-        return self.session.query(Order).filter(Order.order_id == order_id).first()
+        return self._query().filter(Order.order_id == order_id).first()
 
     def list_all(self) -> list[Order]:
-        return self.session.query(Order).all()
+        return self._query().all()
 
-    def update(self, order: Order, data: dict) -> Order:
+    def list_filtered(
+        self,
+        customer_name: Optional[str] = None,
+        status: Optional[OrderStatus] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        after: Optional[int] = None,
+        limit: int = 100
+    ) -> list[Order]:
+        """Return one keyset page of orders, ordered by order_id.
+
+        `after` is the last order_id of the previous page; the next page
+        starts strictly after it, so the cost of a page does not depend on
+        how deep into the result set it is.
+        """
+        query = self._query().filter(*_order_filters(customer_name, status, min_price, max_price))
+        if after is not None:
+            query = query.filter(Order.order_id > after)
+        return query.order_by(Order.order_id).limit(limit).all()
+
+    def stream_export_rows(
+        self,
+        customer_name: Optional[str] = None,
+        status: Optional[OrderStatus] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        batch_size: int = 1000
+    ) -> Iterator[list]:
+        """Yield the export rows of all matching orders, `batch_size` rows at a time."""
+        statement = _export_statement(_order_filters(customer_name, status, min_price, max_price), batch_size)
+        yield from self.session.execute(statement).partitions()
+
+    def update(self, order: Order, data: dict, events: Sequence[dict] = ()) -> Order:
         for key, value in data.items():
             setattr(order, key, value)
+        if events:
+            self.session.execute(insert(OrderEvent), _event_rows([order.order_id] * len(events), events))
         self.session.commit()
-        self.session.refresh(order)
-        return order
+        return self._reload(order.order_id)
 
     def delete(self, order: Order) -> None:
         self.session.delete(order)
-        self.session.commit()
\ No newline at end of file
+        self.session.commit()
+
+
+class AsyncOrderRepository:
+    """AsyncSession counterpart of OrderRepository.
+
+    Lazy loading cannot run outside the event loop's greenlet, so the eager
+    order_load_options() are required here, not just an optimisation.
+    """
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    def _select(self):
+        return select(Order).options(*order_load_options())
+
+    async def _reload(self, order_id: int) -> Order:
+        result = await self.session.execute(
+            self._select()
+            .filter(Order.order_id == order_id)
+            .execution_options(populate_existing=True)
+        )
+        return result.scalars().first()
+
+    async def create(self, order: Order, events: Sequence[dict] = ()) -> Order:
+        self.session.add(order)
+        if events:
+            await self.session.flush()
+            await self.session.execute(insert(OrderEvent), _event_rows([order.order_id] * len(events), events))
+        await self.session.commit()
+        return await self._reload(order.order_id)
+
+    async def create_many(
+        self,
+        orders: List[dict],
+        lines: List[Dict[int, int]],
+        events: Sequence[Optional[dict]] = ()
+    ) -> List[Order]:
+        result = await self.session.execute(_insert_orders_statement(), orders)
+        order_ids = list(result.scalars())
+        rows = _association_rows(order_ids, lines)
+        if rows:
+            await self.session.execute(insert(OrderProductAssociation), rows)
+        event_rows = _event_rows(order_ids, events)
+        if event_rows:
+            await self.session.execute(insert(OrderEvent), event_rows)
+        await self.session.commit()
+        result = await self.session.execute(self._select().filter(Order.order_id.in_(order_ids)))
+        return _in_input_order(list(result.scalars().all()), order_ids)
+
+    async def get(self, order_id: int) -> Order:
+        result = await self.session.execute(self._select().filter(Order.order_id == order_id))
+        return result.scalars().first()
+
+    async def list_all(self) -> list[Order]:
+        result = await self.session.execute(self._select())
+        return list(result.scalars().all())
+
+    async def list_filtered(
+        self,
+        customer_name: Optional[str] = None,
+        status: Optional[OrderStatus] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        after: Optional[int] = None,
+        limit: int = 100
+    ) -> list[Order]:
+        query = self._select().filter(*_order_filters(customer_name, status, min_price, max_price))
+        if after is not None:
+            query = query.filter(Order.order_id > after)
+        result = await self.session.execute(query.order_by(Order.order_id).limit(limit))
+        return list(result.scalars().all())
+
+    async def stream_export_rows(
+        self,
+        customer_name: Optional[str] = None,
+        status: Optional[OrderStatus] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        batch_size: int = 1000
+    ) -> AsyncIterator[list]:
+        statement = _export_statement(_order_filters(customer_name, status, min_price, max_price), batch_size)
+        result = await self.session.stream(statement)
+        async for partition in result.partitions():
+            yield partition
+
+    async def update(self, order: Order, data: dict, events: Sequence[dict] = ()) -> Order:
+        for key, value in data.items():
+            setattr(order, key, value)
+        if events:
+            await self.session.execute(insert(OrderEvent), _event_rows([order.order_id] * len(events), events))
+        await self.session.commit()
+        return await self._reload(order.order_id)
+
+    async def delete(self, order: Order) -> None:
+        await self.session.delete(order)
+        await self.session.commit()
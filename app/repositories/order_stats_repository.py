@@ -0,0 +1,215 @@
+import random
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import Date, delete, func, insert, literal, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.core.models.order import Order, OrderStatus
+from app.core.models.order_association import OrderProductAssociation
+from app.core.models.order_stats import ALL_DAYS, ALL_PRODUCTS, OrderStat
+from app.repositories.upserts import upsert_insert
+
+# (day, product_id, order_status) -> [order_count, total_price, quantity]
+StatKey = Tuple[date, int, OrderStatus]
+StatDeltas = Dict[StatKey, List[int]]
+
+COUNTERS = ("order_count", "total_price", "quantity")
+
+def _apply_statement(dialect_name: str):
+    table = OrderStat.__table__
+    upsert = upsert_insert(dialect_name, table)
+    return upsert.on_conflict_do_update(
+        index_elements=[table.c.day, table.c.product_id, table.c.order_status, table.c.shard],
+        set_={name: table.c[name] + upsert.excluded[name] for name in COUNTERS}
+    )
+
+def _apply_params(deltas: StatDeltas) -> List[dict]:
+    # One shard per transaction; rows in key order so concurrent writers lock them in the same order
+    shard = random.randrange(settings.ORDER_STATS_SHARDS)
+    return [
+        _row(key, values, shard if key[1] == ALL_PRODUCTS else 0)
+        for key, values in sorted(deltas.items())
+        if any(values)
+    ]
+
+def _row(key: StatKey, values: List[int], shard: int) -> dict:
+    day, product_id, status = key
+    return {"day": day, "product_id": product_id, "order_status": status, "shard": shard, **dict(zip(COUNTERS, values))}
+
+def _sum_counters():
+    return [func.sum(getattr(OrderStat, name)).label(name) for name in COUNTERS]
+
+def _totals_query():
+    return (
+        select(OrderStat.order_status, *_sum_counters())
+        .filter(OrderStat.day == ALL_DAYS, OrderStat.product_id == ALL_PRODUCTS)
+        .group_by(OrderStat.order_status)
+        # Statuses every order has moved away from leave rows summing to zero
+        .having(func.sum(OrderStat.order_count) != 0)
+        .order_by(OrderStat.order_status)
+    )
+
+def _daily_query(day_from: Optional[date], day_to: Optional[date]):
+    query = select(OrderStat.day, OrderStat.order_status, *_sum_counters()).filter(
+        OrderStat.day > ALL_DAYS, OrderStat.product_id == ALL_PRODUCTS
+    )
+    if day_from is not None:
+        query = query.filter(OrderStat.day >= day_from)
+    if day_to is not None:
+        query = query.filter(OrderStat.day <= day_to)
+    return (
+        query.group_by(OrderStat.day, OrderStat.order_status)
+        .having(func.sum(OrderStat.order_count) != 0)
+        .order_by(OrderStat.day, OrderStat.order_status)
+    )
+
+def _products_query(top: int):
+    quantity = func.sum(OrderStat.quantity)
+    return (
+        select(OrderStat.product_id, OrderStat.order_status, func.sum(OrderStat.order_count).label("order_count"), quantity.label("quantity"))
+        .filter(OrderStat.day == ALL_DAYS, OrderStat.product_id > ALL_PRODUCTS)
+        .group_by(OrderStat.product_id, OrderStat.order_status)
+        .having(func.sum(OrderStat.order_count) != 0)
+        .order_by(quantity.desc(), OrderStat.product_id)
+        .limit(top)
+    )
+
+def _current_query():
+    return select(OrderStat.day, OrderStat.product_id, OrderStat.order_status, *_sum_counters()).group_by(
+        OrderStat.day, OrderStat.product_id, OrderStat.order_status
+    )
+
+def _recompute_queries(dialect_name: str) -> list:
+    """Aggregates over the orders table, shaped like _current_query() rows."""
+    lines = (
+        select(OrderProductAssociation.order_id, func.sum(OrderProductAssociation.ordered_quantity).label("quantity"))
+        .group_by(OrderProductAssociation.order_id)
+        .subquery()
+    )
+    order_totals = (
+        func.count(),
+        func.coalesce(func.sum(Order.total_price), 0),
+        func.coalesce(func.sum(lines.c.quantity), 0)
+    )
+    orders = select(Order).outerjoin(lines, lines.c.order_id == Order.order_id)
+    queries = [
+        orders.with_only_columns(
+            literal(ALL_DAYS, Date), literal(ALL_PRODUCTS), Order.order_status, *order_totals
+        ).group_by(Order.order_status)
+    ]
+    if settings.ORDER_STATS_DAILY:
+        # Days are UTC whatever the session time zone
+        created_at = func.timezone("UTC", Order.created_at) if dialect_name == "postgresql" else Order.created_at
+        day = func.date(created_at, type_=Date)
+        queries.append(
+            orders.with_only_columns(day, literal(ALL_PRODUCTS), Order.order_status, *order_totals)
+            .filter(Order.created_at.is_not(None))
+            .group_by(day, Order.order_status)
+        )
+    if settings.ORDER_STATS_PER_PRODUCT:
+        queries.append(
+            select(
+                literal(ALL_DAYS, Date),
+                OrderProductAssociation.product_id,
+                Order.order_status,
+                func.count(),
+                literal(0),
+                func.sum(OrderProductAssociation.ordered_quantity)
+            )
+            .join(Order, Order.order_id == OrderProductAssociation.order_id)
+            .group_by(OrderProductAssociation.product_id, Order.order_status)
+        )
+    return queries
+
+def _to_deltas(rows) -> StatDeltas:
+    return {(day, product_id, status): [int(value) for value in values] for day, product_id, status, *values in rows}
+
+def _drift(current: StatDeltas, expected: StatDeltas) -> Dict[StatKey, Tuple[List[int], List[int]]]:
+    """Keys whose (current, expected) counters differ."""
+    zero = [0] * len(COUNTERS)
+    return {
+        key: (current.get(key, zero), expected.get(key, zero))
+        for key in current.keys() | expected.keys()
+        if current.get(key, zero) != expected.get(key, zero)
+    }
+
+# Blocks delta writers (which take ROW EXCLUSIVE) but not readers, until commit
+_LOCK_STATS = text("LOCK TABLE order_stats IN EXCLUSIVE MODE")
+
+class OrderStatsRepository:
+    def __init__(self, session: Session):
+        self.session = session
+
+    def apply(self, deltas: StatDeltas) -> None:
+        """Add `deltas` to the running totals, in the session's transaction (no commit)."""
+        params = _apply_params(deltas)
+        if params:
+            self.session.execute(_apply_statement(self.session.get_bind().dialect.name), params)
+
+    def totals(self) -> list:
+        return self.session.execute(_totals_query()).all()
+
+    def daily(self, day_from: Optional[date] = None, day_to: Optional[date] = None) -> list:
+        return self.session.execute(_daily_query(day_from, day_to)).all()
+
+    def products(self, top: int = 100) -> list:
+        return self.session.execute(_products_query(top)).all()
+
+    def rebuild(self, dry_run: bool = False) -> Dict[StatKey, Tuple[List[int], List[int]]]:
+        """Recompute every row from the orders table; returns the rows that had drifted.
+
+        Delta writers are locked out while the totals are compared and
+        replaced. With `dry_run` the table is left untouched.
+        """
+        dialect_name = self.session.get_bind().dialect.name
+        if dialect_name == "postgresql":
+            self.session.execute(_LOCK_STATS)
+        current = _to_deltas(self.session.execute(_current_query()))
+        expected: StatDeltas = {}
+        for query in _recompute_queries(dialect_name):
+            expected.update(_to_deltas(self.session.execute(query)))
+        drift = _drift(current, expected)
+        if drift and not dry_run:
+            self.session.execute(delete(OrderStat))
+            if expected:
+                self.session.execute(insert(OrderStat), [_row(key, values, 0) for key, values in expected.items()])
+        self.session.commit()
+        return drift
+
+class AsyncOrderStatsRepository:
+    """AsyncSession counterpart of OrderStatsRepository."""
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def apply(self, deltas: StatDeltas) -> None:
+        params = _apply_params(deltas)
+        if params:
+            await self.session.execute(_apply_statement(self.session.get_bind().dialect.name), params)
+
+    async def totals(self) -> list:
+        return (await self.session.execute(_totals_query())).all()
+
+    async def daily(self, day_from: Optional[date] = None, day_to: Optional[date] = None) -> list:
+        return (await self.session.execute(_daily_query(day_from, day_to))).all()
+
+    async def products(self, top: int = 100) -> list:
+        return (await self.session.execute(_products_query(top))).all()
+
+    async def rebuild(self, dry_run: bool = False) -> Dict[StatKey, Tuple[List[int], List[int]]]:
+        dialect_name = self.session.get_bind().dialect.name
+        if dialect_name == "postgresql":
+            await self.session.execute(_LOCK_STATS)
+        current = _to_deltas(await self.session.execute(_current_query()))
+        expected: StatDeltas = {}
+        for query in _recompute_queries(dialect_name):
+            expected.update(_to_deltas(await self.session.execute(query)))
+        drift = _drift(current, expected)
+        if drift and not dry_run:
+            await self.session.execute(delete(OrderStat))
+            if expected:
+                await self.session.execute(insert(OrderStat), [_row(key, values, 0) for key, values in expected.items()])
+        await self.session.commit()
+        return drift
@@ -0,0 +1,54 @@
+from typing import List, Sequence
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.core.models.order_event import OrderEvent
+
+def _claim_statement(limit: int):
+    # Plain columns. A blocking FOR UPDATE rather than SKIP LOCKED: a dispatcher
+    # whose lease ran out mid-batch makes its successor wait for those rows
+    # instead of letting it send later events first (SQLite ignores it)
+    return (
+        select(
+            OrderEvent.event_id,
+            OrderEvent.event_type,
+            OrderEvent.order_id,
+            OrderEvent.old_status,
+            OrderEvent.new_status,
+            OrderEvent.customer_name,
+            OrderEvent.total_price,
+            OrderEvent.created_at
+        )
+        .order_by(OrderEvent.event_id)
+        .limit(limit)
+        .with_for_update()
+    )
+
+def _delete_statement(event_ids: Sequence[int]):
+    return delete(OrderEvent).where(OrderEvent.event_id.in_(event_ids))
+
+class OutboxRepository:
+    def __init__(self, session: Session):
+        self.session = session
+
+    def claim_batch(self, limit: int) -> List:
+        """Lock and return the oldest `limit` undispatched events, oldest first."""
+        return list(self.session.execute(_claim_statement(limit)))
+
+    def delete_dispatched(self, event_ids: Sequence[int]) -> None:
+        """Drop dispatched events and commit, releasing the claim."""
+        self.session.execute(_delete_statement(event_ids))
+        self.session.commit()
+
+class AsyncOutboxRepository:
+    """AsyncSession counterpart of OutboxRepository."""
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def claim_batch(self, limit: int) -> List:
+        return list(await self.session.execute(_claim_statement(limit)))
+
+    async def delete_dispatched(self, event_ids: Sequence[int]) -> None:
+        await self.session.execute(_delete_statement(event_ids))
+        await self.session.commit()
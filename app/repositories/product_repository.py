@@ -1,5 +1,52 @@
+from typing import Dict, Iterable, List, Tuple
+from sqlalchemy import bindparam, insert, select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.core.models.product import Product
+from app.repositories.upserts import upsert_insert
+from app.services.catalog_version import mark_catalog_changed
+
+def _take_stock_statement():
+    # Core table, not the entity, so a parameter list runs as one executemany
+    products = Product.__table__
+    return (
+        update(products)
+        .where(products.c.product_id == bindparam("taken_product_id"))
+        .values(quantity=products.c.quantity - bindparam("taken_quantity"))
+    )
+
+def _take_stock_params(quantities: Dict[int, int]) -> list:
+    return [
+        {"taken_product_id": product_id, "taken_quantity": quantity}
+        for product_id, quantity in sorted(quantities.items())
+    ]
+
+def _upsert_statements(dialect_name: str, rows: List[dict]) -> list:
+    """(statement, parameters) pairs writing `rows`, inserted or updated by product_id."""
+    products = Product.__table__
+    statements = []
+    new_rows = [row for row in rows if row.get("product_id") is None]
+    if new_rows:
+        statements.append((insert(products), new_rows))
+    # Last occurrence wins; one statement may not touch a row twice
+    by_id = {row["product_id"]: row for row in rows if row.get("product_id") is not None}
+    if by_id:
+        upsert = upsert_insert(dialect_name, products)
+        upsert = upsert.on_conflict_do_update(
+            index_elements=[products.c.product_id],
+            set_={name: upsert.excluded[name] for name in ("name", "price", "quantity")}
+        )
+        statements.append((upsert, list(by_id.values())))
+    return statements
+
+# Plain column reads for the catalog snapshot: no entities are built
+_CATALOG_ROWS = select(Product.product_id, Product.name, Product.price, Product.quantity).order_by(Product.product_id)
+_STOCK_ROWS = select(Product.product_id, Product.quantity).order_by(Product.product_id)
+
+# Explicit ids bypass the serial sequence; move it past them
+_SYNC_ID_SEQUENCE = text(
+    "SELECT setval(pg_get_serial_sequence('products', 'product_id'), COALESCE(MAX(product_id), 1)) FROM products"
+)
 
 class ProductRepository:
     def __init__(self, session: Session):
@@ -14,9 +61,73 @@ class ProductRepository:
     def get(self, product_id: int) -> Product:
         return self.session.query(Product).filter(Product.product_id == product_id).first()
 
+    def get_many_for_update(self, product_ids: Iterable[int]) -> dict[int, Product]:
+        """Fetch and row-lock all given products in one query, keyed by product_id.
+
+        Rows are locked in ascending product_id order so that concurrent
+        transactions touching overlapping products cannot deadlock. Products
+        already in the session are refreshed from the locked rows, since
+        stock is taken with UPDATEs that bypass the identity map.
+        """
+        rows = (
+            self.session.query(Product)
+            .filter(Product.product_id.in_(set(product_ids)))
+            .order_by(Product.product_id)
+            .with_for_update()
+            .populate_existing()
+            .all()
+        )
+        return {product.product_id: product for product in rows}
+
+    def reserve_stock(self, product_id: int, quantity: int) -> bool:
+        """Atomically take `quantity` units of stock if at least that many are left.
+
+        The check and the decrement are one conditional UPDATE, so concurrent
+        checkouts cannot both pass the check and oversell. Returns False when
+        the product is missing or short on stock. In-session Product instances
+        are not synchronized and keep their previous quantity until expired.
+        """
+        updated = (
+            self.session.query(Product)
+            .filter(Product.product_id == product_id, Product.quantity >= quantity)
+            .update({Product.quantity: Product.quantity - quantity}, synchronize_session=False)
+        )
+        mark_catalog_changed(self.session, stock_only=True)
+        return updated == 1
+
+    def take_stock_many(self, quantities: Dict[int, int]) -> None:
+        """Decrement the stock of many products in one executemany UPDATE.
+
+        Unconditional: the caller must hold the row locks from
+        get_many_for_update() and have checked the quantities against them.
+        """
+        if quantities:
+            self.session.execute(_take_stock_statement(), _take_stock_params(quantities))
+            mark_catalog_changed(self.session, stock_only=True)
+
+    def upsert_many(self, rows: List[dict]) -> None:
+        """Insert or update (by product_id, when given) a batch of products and commit."""
+        for statement, params in _upsert_statements(self.session.get_bind().dialect.name, rows):
+            self.session.execute(statement, params)
+        mark_catalog_changed(self.session)
+        self.session.commit()
+
+    def sync_id_sequence(self) -> None:
+        if self.session.get_bind().dialect.name == "postgresql":
+            self.session.execute(_SYNC_ID_SEQUENCE)
+            self.session.commit()
+
     def list_all(self) -> list[Product]:
         return self.session.query(Product).all()
 
+    def catalog_rows(self) -> List[Tuple[int, str, int, int]]:
+        """(product_id, name, price, quantity) of every product, by product_id."""
+        return [tuple(row) for row in self.session.execute(_CATALOG_ROWS)]
+
+    def stock_rows(self) -> List[Tuple[int, int]]:
+        """(product_id, quantity) of every product, by product_id."""
+        return [tuple(row) for row in self.session.execute(_STOCK_ROWS)]
+
     def update(self, product: Product, data: dict) -> Product:
         for key, value in data.items():
             setattr(product, key, value)
@@ -26,4 +137,83 @@ class ProductRepository:
 
     def delete(self, product: Product) -> None:
         self.session.delete(product)
-        self.session.commit()
\ No newline at end of file
+        self.session.commit()
+
+    def rollback(self) -> None:
+        self.session.rollback()
+
+class AsyncProductRepository:
+    """AsyncSession counterpart of ProductRepository."""
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def create(self, product: Product) -> Product:
+        self.session.add(product)
+        await self.session.commit()
+        await self.session.refresh(product)
+        return product
+
+    async def get(self, product_id: int) -> Product:
+        result = await self.session.execute(select(Product).filter(Product.product_id == product_id))
+        return result.scalars().first()
+
+    async def get_many_for_update(self, product_ids: Iterable[int]) -> dict[int, Product]:
+        result = await self.session.execute(
+            select(Product)
+            .filter(Product.product_id.in_(set(product_ids)))
+            .order_by(Product.product_id)
+            .with_for_update()
+            .execution_options(populate_existing=True)
+        )
+        return {product.product_id: product for product in result.scalars()}
+
+    async def reserve_stock(self, product_id: int, quantity: int) -> bool:
+        result = await self.session.execute(
+            update(Product)
+            .filter(Product.product_id == product_id, Product.quantity >= quantity)
+            .values(quantity=Product.quantity - quantity)
+            .execution_options(synchronize_session=False)
+        )
+        mark_catalog_changed(self.session, stock_only=True)
+        return result.rowcount == 1
+
+    async def take_stock_many(self, quantities: Dict[int, int]) -> None:
+        if quantities:
+            await self.session.execute(_take_stock_statement(), _take_stock_params(quantities))
+            mark_catalog_changed(self.session, stock_only=True)
+
+    async def upsert_many(self, rows: List[dict]) -> None:
+        for statement, params in _upsert_statements(self.session.get_bind().dialect.name, rows):
+            await self.session.execute(statement, params)
+        mark_catalog_changed(self.session)
+        await self.session.commit()
+
+    async def sync_id_sequence(self) -> None:
+        if self.session.get_bind().dialect.name == "postgresql":
+            await self.session.execute(_SYNC_ID_SEQUENCE)
+            await self.session.commit()
+
+    async def list_all(self) -> list[Product]:
+        result = await self.session.execute(select(Product))
+        return list(result.scalars().all())
+
+    async def catalog_rows(self) -> List[Tuple[int, str, int, int]]:
+        return [tuple(row) for row in await self.session.execute(_CATALOG_ROWS)]
+
+    async def stock_rows(self) -> List[Tuple[int, int]]:
+        return [tuple(row) for row in await self.session.execute(_STOCK_ROWS)]
+
+    async def update(self, product: Product, data: dict) -> Product:
+        for key, value in data.items():
+            setattr(product, key, value)
+        await self.session.commit()
+        await self.session.refresh(product)
+        return product
+
+    async def delete(self, product: Product) -> None:
+        await self.session.delete(product)
+        await self.session.commit()
+
+    async def rollback(self) -> None:
+        await self.session.rollback()
@@ -0,0 +1,34 @@
+import inspect
+from typing import Any, Callable, Union
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+
+class ThreadedRepository:
+    """Awaitable facade over a blocking repository.
+
+    Each method call runs in the threadpool, so a service written against the
+    async repositories can also be driven by a plain Session (DB_ASYNC=False).
+    Generator methods become async iterators that advance in the threadpool.
+    """
+
+    def __init__(self, repository: Any):
+        self._repository = repository
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._repository, name)
+        if not callable(attr):
+            return attr
+        if inspect.isgeneratorfunction(attr):
+            return lambda *args, **kwargs: iterate_in_threadpool(attr(*args, **kwargs))
+
+        async def call(*args, **kwargs):
+            return await run_in_threadpool(attr, *args, **kwargs)
+
+        return call
+
+def repository_for(session: Union[Session, AsyncSession], sync_cls: Callable, async_cls: Callable) -> Any:
+    """Build the repository flavour that matches the session type."""
+    if isinstance(session, AsyncSession):
+        return async_cls(session)
+    return ThreadedRepository(sync_cls(session))
@@ -0,0 +1,11 @@
+from sqlalchemy import Table
+from sqlalchemy.dialects import postgresql, sqlite
+
+# INSERT ... ON CONFLICT constructs of the backends this service runs on
+_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+def upsert_insert(dialect_name: str, table: Table):
+    """An INSERT supporting on_conflict_do_update() for the given backend."""
+    if dialect_name not in _INSERTS:
+        raise NotImplementedError(f"Upserts are not supported on {dialect_name}")
+    return _INSERTS[dialect_name](table)
@@ -1,3 +1,5 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.core.models.user import User
 
@@ -29,4 +31,39 @@ class UserRepository:
 
     def delete(self, user: User) -> None:
         self.session.delete(user)
-        self.session.commit()
\ No newline at end of file
+        self.session.commit()
+
+class AsyncUserRepository:
+    """AsyncSession counterpart of UserRepository."""
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def create(self, user: User) -> User:
+        self.session.add(user)
+        await self.session.commit()
+        await self.session.refresh(user)
+        return user
+
+    async def get(self, user_id: int) -> User:
+        result = await self.session.execute(select(User).filter(User.user_id == user_id))
+        return result.scalars().first()
+
+    async def get_by_username(self, username: str) -> User:
+        result = await self.session.execute(select(User).filter(User.username == username))
+        return result.scalars().first()
+
+    async def list_all(self) -> list[User]:
+        result = await self.session.execute(select(User))
+        return list(result.scalars().all())
+
+    async def update(self, user: User, data: dict) -> User:
+        for key, value in data.items():
+            setattr(user, key, value)
+        await self.session.commit()
+        await self.session.refresh(user)
+        return user
+
+    async def delete(self, user: User) -> None:
+        await self.session.delete(user)
+        await self.session.commit()
@@ -1,7 +1,9 @@
 from fastapi import APIRouter
 from app.routers.auth import router as auth_router
 from app.routers.orders import router as orders_router
+from app.routers.products import router as products_router
 
 api_router = APIRouter()
 api_router.include_router(auth_router)
-api_router.include_router(orders_router)
\ No newline at end of file
+api_router.include_router(orders_router)
+api_router.include_router(products_router)
\ No newline at end of file
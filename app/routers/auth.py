@@ -1,27 +1,33 @@
+from typing import Optional, Union
 from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 
-from app.dependencies import get_db
+from app.dependencies import get_db, get_password_hasher
 from app.services.auth_service import AuthService
+from app.services.password_hasher import PasswordHasher
 from app.core.schemas.user_schema import UserCreateSchema, LoginSchema, Token, UserSchema
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
-def get_auth_service(db: Session = Depends(get_db)) -> AuthService:
-    return AuthService(db)
+async def get_auth_service(
+    db: Union[Session, AsyncSession] = Depends(get_db),
+    password_hasher: Optional[PasswordHasher] = Depends(get_password_hasher)
+) -> AuthService:
+    return AuthService(db, password_hasher=password_hasher)
 
 @router.post("/register", response_model=UserSchema)
-def register(user_data: UserCreateSchema, service: AuthService = Depends(get_auth_service)):
-    return service.register(user_data)
+async def register(user_data: UserCreateSchema, service: AuthService = Depends(get_auth_service)):
+    return await service.register(user_data)
 
 @router.post("/login", response_model=Token)
-def login(login_data: LoginSchema, service: AuthService = Depends(get_auth_service)):
-    return service.login(login_data)
+async def login(login_data: LoginSchema, service: AuthService = Depends(get_auth_service)):
+    return await service.login(login_data)
 
 class RefreshSchema(BaseModel):
     token: str
 
 @router.post("/refresh", response_model=Token)
-def refresh(refresh_data: RefreshSchema, service: AuthService = Depends(get_auth_service)):
-    return service.refresh(refresh_data.token)
\ No newline at end of file
+async def refresh(refresh_data: RefreshSchema, service: AuthService = Depends(get_auth_service)):
+    return await service.refresh(refresh_data.token)
\ No newline at end of file
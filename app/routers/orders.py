@@ -1,65 +1,177 @@
-from typing import List, Optional
-from fastapi import APIRouter, Depends
+from datetime import date
+from typing import List, Optional, Union
+from fastapi import APIRouter, Depends, HTTPException, Query, status as http_status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.dependencies import get_db, get_current_user
-from app.core.schemas.order_schema import OrderCreateSchema, OrderSchema
+from app.dependencies import get_db, get_db_opener, get_current_admin, get_current_user, get_order_cache, idempotent
+from app.config import settings
+from app.core.schemas.order_schema import (
+    OrderBatchCreateSchema,
+    OrderBatchResultSchema,
+    OrderCreateSchema,
+    OrderUpdateSchema,
+    OrderSchema,
+    encode_order_batch,
+    encode_order_list
+)
 from app.core.models.order import OrderStatus
-from app.repositories.order_repository import OrderRepository
+from app.core.schemas.order_stats_schema import OrderStatsSchema
+from app.repositories.order_repository import OrderRepository, AsyncOrderRepository
+from app.repositories.threaded_repository import repository_for
+from app.services.idempotency import IdempotentRequest
+from app.services.order_cache import OrderCache
 from app.services.order_service import OrderService
-from app.core.models.user import User
+from app.core.schemas.user_schema import PrincipalSchema
+from app.utils.responses import JSONBytesResponse
 
 router = APIRouter(prefix="/orders", tags=["orders"])
 
 
-def get_order_service(db: Session = Depends(get_db)) -> OrderService:
-    repository = OrderRepository(db)
-    return OrderService(repository=repository, db=db)
+async def get_order_service(
+    db: Union[Session, AsyncSession] = Depends(get_db),
+    order_cache: Optional[OrderCache] = Depends(get_order_cache)
+) -> OrderService:
+    repository = repository_for(db, OrderRepository, AsyncOrderRepository)
+    return OrderService(repository=repository, db=db, order_cache=order_cache)
 
 
 @router.post("", response_model=OrderSchema)
-def create_order(
+async def create_order(
     order_data: OrderCreateSchema, 
-    current_user: User = Depends(get_current_user),
+    current_user: PrincipalSchema = Depends(get_current_user),
+    idempotency: IdempotentRequest = Depends(idempotent("orders:create")),
     service: OrderService = Depends(get_order_service)
 ):
-    return service.create_order(order_data, current_user)
+    """Create an order; retries with the same Idempotency-Key get the first response back."""
+    if idempotency.replay is not None:
+        status_code, body = idempotency.replay
+        return JSONBytesResponse(body, status_code=status_code, headers={"Idempotent-Replayed": "true"})
+    order = await service.create_order(order_data, current_user)
+    body = service.encode(order)
+    await idempotency.save(http_status.HTTP_200_OK, body)
+    return JSONBytesResponse(body)
+
+
+@router.post("/batch", response_model=OrderBatchResultSchema)
+async def create_orders_batch(
+    batch: OrderBatchCreateSchema,
+    current_user: PrincipalSchema = Depends(get_current_user),
+    service: OrderService = Depends(get_order_service)
+):
+    if len(batch.orders) > settings.ORDER_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=http_status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"A batch holds at most {settings.ORDER_BATCH_MAX_SIZE} orders"
+        )
+    results = await service.create_orders_bulk(batch.orders, current_user, atomic=batch.atomic)
+    return JSONBytesResponse(encode_order_batch([
+        result if isinstance(result, Exception) else service.encode(result)
+        for result in results
+    ]))
 
 
 @router.put("/{order_id}", response_model=OrderSchema)
-def update_order(
+async def update_order(
     order_id: int, 
-    order_data: OrderCreateSchema, 
-    current_user: User = Depends(get_current_user),
+    order_data: OrderUpdateSchema, 
+    current_user: PrincipalSchema = Depends(get_current_user),
     service: OrderService = Depends(get_order_service)
 ):
-    return service.update_order(order_id, order_data, current_user)
+    order = await service.update_order(order_id, order_data, current_user)
+    return JSONBytesResponse(service.encode(order))
 
 
 @router.get("", response_model=List[OrderSchema])
-def list_orders(
+async def list_orders(
+    status: Optional[OrderStatus] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    after: Optional[int] = Query(None, description="Return orders with order_id greater than this cursor"),
+    current_user: PrincipalSchema = Depends(get_current_user),
+    service: OrderService = Depends(get_order_service)
+):
+    orders = await service.get_orders(
+        current_user,
+        status_filter=status,
+        min_price=min_price,
+        max_price=max_price,
+        after=after,
+        limit=limit
+    )
+    return JSONBytesResponse(encode_order_list([service.encode(order) for order in orders]))
+
+
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+# Declared before /{order_id}, which would otherwise capture "export"
+@router.get("/export")
+async def export_orders(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
     status: Optional[OrderStatus] = None,
     min_price: Optional[float] = None,
     max_price: Optional[float] = None,
-    current_user: User = Depends(get_current_user),
+    current_user: PrincipalSchema = Depends(get_current_user),
+    open_db = Depends(get_db_opener)
+):
+    """Stream all matching orders: NDJSON shaped like OrderSchema, or CSV with one row per order line."""
+    async def body():
+        # The request's own session is already closed once the body streams
+        async with open_db() as db:
+            service = OrderService(repository=repository_for(db, OrderRepository, AsyncOrderRepository), db=db)
+            async for chunk in service.export_orders(
+                current_user,
+                fmt=format,
+                status_filter=status,
+                min_price=min_price,
+                max_price=max_price
+            ):
+                yield chunk
+
+    return StreamingResponse(
+        body(),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="orders.{format}"'}
+    )
+
+
+@router.get("/stats", response_model=OrderStatsSchema)
+async def order_stats(
+    by_day: bool = False,
+    by_product: bool = False,
+    day_from: Optional[date] = None,
+    day_to: Optional[date] = None,
+    top_products: int = Query(100, ge=1, le=1000),
+    current_user: PrincipalSchema = Depends(get_current_admin),
     service: OrderService = Depends(get_order_service)
 ):
-    return service.get_orders(current_user, status_filter=status, min_price=min_price, max_price=max_price)
+    """Order count, revenue and units per status, optionally per creation day (UTC) and per product."""
+    return await service.get_stats(
+        by_day=by_day,
+        by_product=by_product,
+        day_from=day_from,
+        day_to=day_to,
+        top_products=top_products
+    )
 
 
 @router.get("/{order_id}", response_model=OrderSchema)
-def get_order(
+async def get_order(
     order_id: int, 
-    current_user: User = Depends(get_current_user),
+    current_user: PrincipalSchema = Depends(get_current_user),
     service: OrderService = Depends(get_order_service)
 ):
-    return service.get_order(order_id, current_user)
+    return JSONBytesResponse(await service.get_order(order_id, current_user))
 
 
 @router.delete("/{order_id}", response_model=OrderSchema)
-def soft_delete_order(
+async def soft_delete_order(
     order_id: int, 
-    current_user: User = Depends(get_current_user),
+    current_user: PrincipalSchema = Depends(get_current_user),
     service: OrderService = Depends(get_order_service)
 ):
-    return service.soft_delete_order(order_id, current_user)
\ No newline at end of file
+    order = await service.soft_delete_order(order_id, current_user)
+    return JSONBytesResponse(service.encode(order))
\ No newline at end of file
@@ -0,0 +1,79 @@
+from typing import Callable, List, Union
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.dependencies import get_db, get_db_opener, get_current_admin
+from app.core.schemas.product_schema import ProductImportReportSchema, ProductSchema
+from app.core.schemas.user_schema import PrincipalSchema
+from app.repositories.product_repository import ProductRepository, AsyncProductRepository
+from app.repositories.threaded_repository import repository_for
+from app.services.catalog_version import catalog_version
+from app.services.product_import import ProductImportFormatError
+from app.services.product_service import ProductService
+from app.utils.responses import JSONBytesResponse, etag_matches
+
+router = APIRouter(prefix="/products", tags=["products"])
+
+
+def product_service(db: Union[Session, AsyncSession]) -> ProductService:
+    repository = repository_for(db, ProductRepository, AsyncProductRepository)
+    return ProductService(repository=repository, db=db)
+
+
+async def get_product_service(db: Union[Session, AsyncSession] = Depends(get_db)) -> ProductService:
+    return product_service(db)
+
+
+def catalog_headers(*etag_parts: object) -> dict:
+    # Taken before the read: a write committed meanwhile bumps the version, so
+    # a response can only be tagged older than its content, never newer
+    return {
+        "ETag": catalog_version.etag(*etag_parts),
+        "Cache-Control": f"public, max-age={settings.PRODUCT_CACHE_MAX_AGE}, must-revalidate"
+    }
+
+
+def not_modified(request: Request, headers: dict) -> bool:
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        catalog_version.stats["not_modified"] += 1
+        return True
+    return False
+
+
+@router.get("", response_model=List[ProductSchema])
+async def list_products(request: Request, open_db: Callable = Depends(get_db_opener)):
+    """The whole catalog; revalidate with If-None-Match to get a 304 while it is unchanged."""
+    headers = catalog_headers()
+    # Answered from the version alone: no session is opened and nothing is serialized
+    if not_modified(request, headers):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    async with open_db() as db:
+        body = await product_service(db).list_products()
+    return JSONBytesResponse(body, headers=headers)
+
+
+@router.get("/{product_id}", response_model=ProductSchema)
+async def get_product(product_id: int, request: Request, open_db: Callable = Depends(get_db_opener)):
+    headers = catalog_headers(product_id)
+    if not_modified(request, headers):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    async with open_db() as db:
+        body = await product_service(db).get_product(product_id)
+    return JSONBytesResponse(body, headers=headers)
+
+
+@router.post("/import", response_model=ProductImportReportSchema)
+async def import_products(
+    request: Request,
+    format: str = Query("csv", pattern="^(csv|ndjson)$", description="Body format: CSV with a header row, or NDJSON"),
+    batch_size: int = Query(settings.PRODUCT_IMPORT_BATCH_SIZE, ge=1, le=50000),
+    current_user: PrincipalSchema = Depends(get_current_admin),
+    service: ProductService = Depends(get_product_service)
+):
+    """Upsert products from the raw request body, read as it streams in."""
+    try:
+        return await service.import_products(request.stream(), format, batch_size=batch_size)
+    except ProductImportFormatError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
@@ -1,17 +1,21 @@
 import logging
 from datetime import timedelta
+from typing import Optional, Tuple, Union
 from jose import jwt, JWTError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
-from app.repositories.user_repository import UserRepository
+from app.repositories.user_repository import UserRepository, AsyncUserRepository
+from app.repositories.threaded_repository import repository_for
+from app.services.password_hasher import PasswordHasher
+from app.services.token_cache import token_cache
 from app.core.models.user import User
 from app.core.schemas.user_schema import UserCreateSchema, LoginSchema
 from app.utils.auth_utils import (
-    verify_password,
+    verify_and_update_password,
     get_password_hash,
     create_access_token,
-    SECRET_KEY,
-    ALGORITHM,
     ACCESS_TOKEN_EXPIRE_MINUTES,
 )
 from app.core.exceptions.custom_exceptions import DuplicateUsernameError, InvalidCredentialsError, TokenExpiredError, TokenInvalidError
@@ -19,30 +23,50 @@ from app.core.exceptions.custom_exceptions import DuplicateUsernameError, Invali
 logger = logging.getLogger(__name__)
 
 class AuthService:
-    def __init__(self, db: Session) -> None:
+    def __init__(self, db: Union[Session, AsyncSession], password_hasher: Optional[PasswordHasher] = None) -> None:
         self.db = db
-        self.user_repo = UserRepository(db)
+        self.user_repo = repository_for(db, UserRepository, AsyncUserRepository)
+        # Worker-wide process pool; None falls back to the threadpool
+        self.password_hasher = password_hasher
 
-    def register(self, user_data: UserCreateSchema) -> User:
-        if self.user_repo.get_by_username(user_data.username):
+    async def _hash_password(self, password: str) -> str:
+        if self.password_hasher is not None:
+            return await self.password_hasher.hash(password)
+        return await run_in_threadpool(get_password_hash, password)
+
+    async def _verify_and_update_password(self, plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        if self.password_hasher is not None:
+            return await self.password_hasher.verify_and_update(plain_password, hashed_password)
+        return await run_in_threadpool(verify_and_update_password, plain_password, hashed_password)
+
+    async def register(self, user_data: UserCreateSchema) -> User:
+        if await self.user_repo.get_by_username(user_data.username):
             raise DuplicateUsernameError("Username already registered")
-        hashed_password = get_password_hash(user_data.password)
+        # bcrypt is CPU-bound; keep it off the event loop
+        hashed_password = await self._hash_password(user_data.password)
         new_user = User(
             username=user_data.username,
             email=user_data.email,
             hashed_password=hashed_password
         )
-        created_user = self.user_repo.create(new_user)
+        created_user = await self.user_repo.create(new_user)
         
         # Log the registration action
-        logger.info(f"User registered: {created_user.username}")
+        logger.info("User registered: %s", created_user.username)
         
         return created_user
 
-    def login(self, login_data: LoginSchema) -> dict:
-        user = self.user_repo.get_by_username(login_data.username)
-        if not user or not verify_password(login_data.password, user.hashed_password):
+    async def login(self, login_data: LoginSchema) -> dict:
+        user = await self.user_repo.get_by_username(login_data.username)
+        if not user:
+            raise InvalidCredentialsError("Incorrect username or password")
+        verified, new_hash = await self._verify_and_update_password(login_data.password, user.hashed_password)
+        if not verified:
             raise InvalidCredentialsError("Incorrect username or password")
+        if new_hash:
+            # Stored hash predates the current scheme or cost; the plaintext is only available now
+            await self.user_repo.update(user, {"hashed_password": new_hash})
+            logger.info("Password hash upgraded for user: %s", user.username)
         
         access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
         access_token = create_access_token(
@@ -51,13 +75,13 @@ class AuthService:
         )
         
         # Log the login action
-        logger.info(f"User logged in: {user.username}")
+        logger.info("User logged in: %s", user.username)
         
         return {"access_token": access_token, "token_type": "bearer"}
 
-    def refresh(self, token: str) -> dict:
+    async def refresh(self, token: str) -> dict:
         try:
-            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            payload = token_cache.decode(token)
             username: str = payload.get("sub")
             if not username:
                 raise TokenInvalidError()
@@ -67,12 +91,16 @@ class AuthService:
             raise TokenInvalidError(str(e))
         
         access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+        claims = {"sub": username}
+        # Keep the id claim so the refreshed token resolves through the principal cache
+        if payload.get("user_id") is not None:
+            claims["user_id"] = payload["user_id"]
         new_token = create_access_token(
-            data={"sub": username},
+            data=claims,
             expires_delta=access_token_expires
         )
         
         # Log the token refresh action
-        logger.info(f"Token refreshed for user: {username}")
+        logger.info("Token refreshed for user: %s", username)
         
         return {"access_token": new_token, "token_type": "bearer"}
\ No newline at end of file
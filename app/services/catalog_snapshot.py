@@ -0,0 +1,167 @@
+from array import array
+from bisect import bisect_left
+from typing import List, Optional, Sequence, Tuple
+import orjson
+
+from app.repositories.product_repository import AsyncProductRepository
+from app.services.catalog_version import CatalogVersion, catalog_version
+from app.utils.single_flight import SingleFlight
+
+# The one key ProductCatalog's refreshes are coalesced under
+_REFRESH = "snapshot"
+
+def encode_product(product_id: int, name: str, price: int, quantity: int) -> bytes:
+    """Serialize one product straight to its ProductSchema JSON body.
+
+    Builds the same document as ProductSchema(...).model_dump_json() without
+    the validation pass; keep the two in step when the schema changes.
+    """
+    return orjson.dumps({"product_id": product_id, "name": name, "price": price, "quantity": quantity})
+
+class CatalogSnapshot:
+    """Immutable, pre-serialized copy of the whole product catalog.
+
+    Ids, prices and stock are parallel `array('q')` columns sorted by
+    product_id, names a list alongside them, and `body` is the JSON array
+    GET /products serves. Product i's object starts at `offsets[i]` in the
+    body and ends one separator byte before `offsets[i + 1]`, so a product's
+    own body is a slice. A stock refresh builds a new snapshot that shares
+    the unchanged columns and copies the untouched parts of the body.
+    """
+
+    __slots__ = ("version", "structure", "ids", "names", "prices", "stock", "body", "offsets")
+
+    def __init__(
+        self,
+        version: int,
+        structure: int,
+        ids: array,
+        names: List[str],
+        prices: array,
+        stock: array,
+        body: bytes,
+        offsets: array
+    ) -> None:
+        self.version = version
+        self.structure = structure
+        self.ids = ids
+        self.names = names
+        self.prices = prices
+        self.stock = stock
+        self.body = body
+        self.offsets = offsets
+
+    @classmethod
+    def build(cls, version: int, structure: int, rows: Sequence[Tuple[int, str, int, int]]) -> "CatalogSnapshot":
+        """Snapshot of (product_id, name, price, quantity) rows sorted by product_id."""
+        ids, prices, stock, offsets = array("q"), array("q"), array("q"), array("q")
+        names: List[str] = []
+        fragments: List[bytes] = []
+        position = 1
+        for product_id, name, price, quantity in rows:
+            ids.append(product_id)
+            names.append(name)
+            prices.append(price)
+            stock.append(quantity)
+            fragment = encode_product(product_id, name, price, quantity)
+            fragments.append(fragment)
+            offsets.append(position)
+            position += len(fragment) + 1
+        offsets.append(position)
+        return cls(version, structure, ids, names, prices, stock, b"[" + b",".join(fragments) + b"]", offsets)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def product_body(self, product_id: int) -> Optional[bytes]:
+        i = bisect_left(self.ids, product_id)
+        if i == len(self.ids) or self.ids[i] != product_id:
+            return None
+        return self.body[self.offsets[i]:self.offsets[i + 1] - 1]
+
+    def with_stock(self, version: int, stock_rows: Sequence[Tuple[int, int]]) -> Optional["CatalogSnapshot"]:
+        """This snapshot at `version` with the quantities of (product_id, quantity) rows.
+
+        Returns None when the rows are not the same products, which needs a rebuild.
+        """
+        ids = array("q", [row[0] for row in stock_rows])
+        if ids != self.ids:
+            return None
+        stock = array("q", [row[1] for row in stock_rows])
+        changed = [i for i, (old, new) in enumerate(zip(self.stock, stock)) if old != new]
+        if not changed:
+            return CatalogSnapshot(
+                version, self.structure, self.ids, self.names, self.prices, self.stock, self.body, self.offsets
+            )
+
+        body = memoryview(self.body)
+        offsets = array("q", self.offsets)
+        pieces = []
+        copied_to = 0
+        shift = 0
+        for n, i in enumerate(changed):
+            start, end = self.offsets[i], self.offsets[i + 1] - 1
+            fragment = encode_product(self.ids[i], self.names[i], self.prices[i], stock[i])
+            pieces.append(body[copied_to:start])
+            pieces.append(fragment)
+            copied_to = end
+            shift += len(fragment) - (end - start)
+            if shift:
+                # Everything up to and including the next changed product moves by the same amount
+                stop = changed[n + 1] + 1 if n + 1 < len(changed) else len(offsets)
+                for j in range(i + 1, stop):
+                    offsets[j] += shift
+        pieces.append(body[copied_to:])
+        return CatalogSnapshot(
+            version, self.structure, self.ids, self.names, self.prices, stock, b"".join(pieces), offsets
+        )
+
+class ProductCatalog:
+    """The worker's current CatalogSnapshot, renewed lazily as the catalog version moves.
+
+    After a change to anything but stock (see CatalogVersion.structure) the
+    snapshot is rebuilt from one column query; after stock-only changes just
+    (product_id, quantity) is read and the products whose stock moved are
+    re-encoded. Requests that find the snapshot stale while a refresh is
+    running wait for it instead of starting their own.
+    """
+
+    def __init__(self, version: CatalogVersion) -> None:
+        self.version = version
+        self.current: Optional[CatalogSnapshot] = None
+        self._refreshes = SingleFlight()
+        self.stats = {"hits": 0, "rebuilds": 0, "stock_refreshes": 0, "coalesced": 0}
+
+    async def get(self, repository: AsyncProductRepository) -> CatalogSnapshot:
+        """A snapshot at least as new as the catalog version when called."""
+        wanted = self.version.value
+        while True:
+            snapshot = self.current
+            if snapshot is not None and snapshot.version >= wanted:
+                self.stats["hits"] += 1
+                return snapshot
+            if _REFRESH not in self._refreshes:
+                return await self._refreshes.run(_REFRESH, lambda: self._refresh(repository))
+            self.stats["coalesced"] += 1
+            # A refresh started before `wanted` may be too old; check again once it lands
+            await self._refreshes.run(_REFRESH, lambda: self._refresh(repository))
+
+    def clear(self) -> None:
+        self.current = None
+
+    async def _refresh(self, repository: AsyncProductRepository) -> CatalogSnapshot:
+        # Read before the query: a snapshot may be newer than its version, never older
+        version, structure = self.version.value, self.version.structure
+        previous = self.current
+        snapshot = None
+        if previous is not None and previous.structure == structure:
+            snapshot = previous.with_stock(version, await repository.stock_rows())
+            if snapshot is not None:
+                self.stats["stock_refreshes"] += 1
+        if snapshot is None:
+            snapshot = CatalogSnapshot.build(version, structure, await repository.catalog_rows())
+            self.stats["rebuilds"] += 1
+        self.current = snapshot
+        return snapshot
+
+product_catalog = ProductCatalog(catalog_version)
@@ -0,0 +1,203 @@
+import asyncio
+import logging
+import time
+from typing import Optional, Set, Tuple
+from redis import RedisError
+from redis import asyncio as aioredis
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from app.core.models.product import Product
+from app.utils.peer_channel import PeerChannel
+
+logger = logging.getLogger(__name__)
+
+# Workers publish the version they minted after a catalog write here
+VERSION_CHANNEL = "catalog:version"
+# The newest version any worker has minted, as "<value>:<structure>"
+VERSION_KEY = "catalog:version:current"
+
+# Stores ARGV[1]:ARGV[2] unless the stored version is at least as new, and
+# publishes it; returns the stored version when that one wins. Values are
+# nanosecond counts, compared as decimal strings to stay exact in Lua.
+_STORE_SCRIPT = """
+local current = redis.call("GET", KEYS[1])
+local value = ARGV[1]
+if current then
+    local stored = string.match(current, "^(%d+):")
+    if stored and (#stored > #value or (#stored == #value and stored >= value)) then
+        return current
+    end
+end
+redis.call("SET", KEYS[1], value .. ":" .. ARGV[2])
+redis.call("PUBLISH", ARGV[3], ARGV[4] .. ":" .. value .. ":" .. ARGV[2])
+return false
+"""
+
+# session.info key marking a transaction that wrote products: True while it
+# only changed stock, False once it changed anything else
+_CHANGED_KEY = "catalog_changed"
+
+class CatalogVersion:
+    """Per-process copy of the product catalog version, behind its ETags.
+
+    Versions are minted from the wall clock (nanoseconds, and always above
+    the previous one) when a transaction that wrote products commits, so a
+    version is never reused. Each minted version is stored in VERSION_KEY,
+    which only ever moves forward, and published on VERSION_CHANNEL so the
+    other workers adopt it and hand out the same ETags. Whenever the
+    subscription is (re)established the worker takes the stored version,
+    so workers started or reconnected since the last write agree with the
+    rest. A worker that receives a version not newer than its own mints and
+    stores a fresh one instead, which only costs clients one full response.
+
+    `structure` is the version of the last change to anything but stock
+    (names, prices, products added or removed), so the catalog snapshot can
+    tell a stock refresh from a rebuild. Unsure cases count as structural.
+    """
+
+    def __init__(self) -> None:
+        self.value = time.time_ns()
+        self.structure = self.value
+        self.redis: Optional[aioredis.Redis] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._publishing: Set[asyncio.Task] = set()
+        # True while a version minted here has not reached VERSION_KEY
+        self._unstored = False
+        self.stats = {"bumps": 0, "received": 0, "not_modified": 0, "errors": 0}
+        self._peers = PeerChannel(VERSION_CHANNEL, "catalog version", self.stats)
+
+    def etag(self, *parts: object) -> str:
+        """Strong ETag for a catalog representation at the current version."""
+        return '"' + "-".join(["catalog", format(self.value, "x"), *map(str, parts)]) + '"'
+
+    def bump(self, stock_only: bool = False) -> int:
+        """Mint a new version and publish it; safe to call from any thread."""
+        value = self._mint(stock_only)
+        self.stats["bumps"] += 1
+        if self.redis is not None and self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._schedule_publish, self.redis, value, self.structure)
+        return value
+
+    def adopt(self, value: int, structure: int) -> None:
+        self.stats["received"] += 1
+        if value > self.value:
+            self.value = value
+            self.structure = max(self.structure, structure)
+        else:
+            value = self._mint(stock_only=False)
+            if self.redis is not None:
+                self._schedule_publish(self.redis, value, self.structure)
+
+    def attach(self, redis: aioredis.Redis) -> None:
+        """Publish bumps through `redis`; call from the event loop at startup."""
+        self.redis = redis
+        self._loop = asyncio.get_running_loop()
+
+    async def publish(
+        self,
+        redis: aioredis.Redis,
+        value: Optional[int] = None,
+        structure: Optional[int] = None
+    ) -> None:
+        """Store and announce a version (the current one by default).
+
+        When VERSION_KEY already holds a newer version, that one is adopted
+        instead.
+        """
+        if value is None:
+            value, structure = self.value, self.structure
+        try:
+            current = await redis.eval(
+                _STORE_SCRIPT, 1, VERSION_KEY, value, structure, VERSION_CHANNEL, self._peers.origin
+            )
+        except RedisError as e:
+            self.stats["errors"] += 1
+            logger.warning("Catalog version publish failed: %s", e)
+            return
+        if value == self.value:
+            self._unstored = False
+        if current is not None:
+            stored, stored_structure = _parse_version(current)
+            if stored > self.value:
+                self.value, self.structure = stored, max(self.structure, stored_structure)
+
+    async def load(self, redis: aioredis.Redis) -> None:
+        """Take the stored version, or store this worker's if it has news.
+
+        The stored version replaces the current one even when it is older:
+        without unstored local changes, the current one only stands for a
+        startup or for versions that VERSION_KEY has since overtaken.
+        """
+        if self._unstored:
+            await self.publish(redis)
+            return
+        current = await redis.get(VERSION_KEY)
+        if current is None:
+            await self.publish(redis)
+        else:
+            self.value, self.structure = _parse_version(current)
+
+    async def listen(self, retry_delay: float = 1.0) -> None:
+        """Adopt versions published by other workers; runs until cancelled."""
+        await self._peers.listen(self.redis, self._receive, lambda: self.load(self.redis), retry_delay)
+
+    def _receive(self, payload: str) -> None:
+        self.adopt(*_parse_version(payload))
+
+    def _mint(self, stock_only: bool) -> int:
+        value = max(self.value + 1, time.time_ns())
+        if not stock_only:
+            self.structure = value
+        self.value = value
+        self._unstored = True
+        return value
+
+    def _schedule_publish(self, redis: aioredis.Redis, value: int, structure: int) -> None:
+        task = asyncio.create_task(self.publish(redis, value, structure))
+        # Keep a reference until done; the loop only holds weak ones
+        self._publishing.add(task)
+        task.add_done_callback(self._publishing.discard)
+
+def _parse_version(data) -> Tuple[int, int]:
+    if isinstance(data, bytes):
+        data = data.decode()
+    value, structure = data.split(":")
+    return int(value), int(structure)
+
+catalog_version = CatalogVersion()
+
+def mark_catalog_changed(session: Session, stock_only: bool = False) -> None:
+    """Bump the catalog version once the current transaction commits.
+
+    Repositories call this for bulk statements, which bypass the mapper
+    events below.
+    """
+    session.info[_CHANGED_KEY] = stock_only and session.info.get(_CHANGED_KEY, True)
+
+def _track_product_change(mapper, connection, product: Product) -> None:
+    session = Session.object_session(product)
+    if session is not None:
+        mark_catalog_changed(session)
+
+def _track_product_update(mapper, connection, product: Product) -> None:
+    session = Session.object_session(product)
+    if session is None:
+        return
+    state = inspect(product)
+    changed = {attr.key for attr in mapper.column_attrs if state.attrs[attr.key].history.has_changes()}
+    mark_catalog_changed(session, stock_only=changed <= {"quantity"})
+
+def _bump_committed(session: Session) -> None:
+    stock_only = session.info.pop(_CHANGED_KEY, None)
+    if stock_only is not None:
+        catalog_version.bump(stock_only)
+
+def _discard_changed(session: Session) -> None:
+    session.info.pop(_CHANGED_KEY, None)
+
+event.listen(Product, "after_insert", _track_product_change)
+event.listen(Product, "after_update", _track_product_update)
+event.listen(Product, "after_delete", _track_product_change)
+event.listen(Session, "after_commit", _bump_committed)
+event.listen(Session, "after_rollback", _discard_changed)
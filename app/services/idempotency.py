@@ -0,0 +1,156 @@
+import hashlib
+import logging
+import uuid
+from typing import Optional, Tuple
+from redis import RedisError
+from redis import asyncio as aioredis
+
+from app.core.exceptions.custom_exceptions import IdempotencyKeyInProgressError, IdempotencyKeyReusedError
+
+logger = logging.getLogger(__name__)
+
+FINGERPRINT_SIZE = 32
+_STATUS_SIZE = 2
+
+# Returns the record (KEYS[1]) if there is one, else takes the lock (KEYS[2])
+# for token ARGV[1] and ARGV[2] ms; returns 1 when taken, 0 when already held
+_BEGIN_SCRIPT = """
+local record = redis.call("GET", KEYS[1])
+if record then
+    return record
+end
+if redis.call("SET", KEYS[2], ARGV[1], "NX", "PX", ARGV[2]) then
+    return 1
+end
+return 0
+"""
+
+# Stores record ARGV[2] (KEYS[1]) for ARGV[3] seconds, then drops the lock
+# (KEYS[2]) if token ARGV[1] still holds it
+_SAVE_SCRIPT = """
+redis.call("SET", KEYS[1], ARGV[2], "EX", ARGV[3])
+if redis.call("GET", KEYS[2]) == ARGV[1] then
+    redis.call("DEL", KEYS[2])
+end
+return 0
+"""
+
+# Drops the lock (KEYS[1]) if token ARGV[1] still holds it
+_RELEASE_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    redis.call("DEL", KEYS[1])
+end
+return 0
+"""
+
+def request_fingerprint(method: str, path: str, body: bytes) -> bytes:
+    """SHA-256 of what makes two requests the same request."""
+    digest = hashlib.sha256(f"{method} {path}\n".encode())
+    digest.update(body)
+    return digest.digest()
+
+class IdempotentRequest:
+    """One request's claim on an Idempotency-Key.
+
+    `replay` holds the stored (status code, body) when the key was already
+    used for the same request; otherwise the request runs and `save()`
+    stores its response. A claim without a store (no key sent, no Redis)
+    does nothing.
+    """
+
+    def __init__(
+        self,
+        store: Optional["IdempotencyStore"] = None,
+        key: str = "",
+        fingerprint: bytes = b"",
+        replay: Optional[Tuple[int, bytes]] = None,
+        token: str = ""
+    ) -> None:
+        self.store = store
+        self.key = key
+        self.fingerprint = fingerprint
+        self.replay = replay
+        # Value of the lock this request holds; only it may drop the lock
+        self.token = token
+        self.locked = store is not None and replay is None
+
+    async def save(self, status_code: int, body: bytes) -> None:
+        if self.locked:
+            self.locked = False
+            await self.store.save(self.key, self.fingerprint, self.token, status_code, body)
+
+    async def release(self) -> None:
+        """Give the key up without a response, so a retry runs the request again."""
+        if self.locked:
+            self.locked = False
+            await self.store.release(self.key, self.token)
+
+class IdempotencyStore:
+    """Responses of idempotent requests, kept in Redis for `ttl` seconds.
+
+    A record is the request fingerprint, the status code and the response
+    body in one value. Looking the record up and otherwise taking the lock
+    is one script, so a retry costs a single round trip and a request can
+    never claim a key whose response was stored after its lookup. The lock
+    holds a random token and expires after `lock_ttl` seconds in case the
+    worker dies; concurrent duplicates are refused while it is held, and a
+    request whose lock expired cannot drop the next holder's. Only
+    successful responses are stored: a request that fails releases the lock
+    and may be retried. Redis errors are logged and the
+    request runs unprotected, as with the order cache.
+    """
+
+    def __init__(self, redis: aioredis.Redis, ttl: int, lock_ttl: float, retry_after: int) -> None:
+        self.redis = redis
+        self.ttl = ttl
+        self.lock_ttl = lock_ttl
+        self.retry_after = retry_after
+        self.stats = {"claims": 0, "replays": 0, "in_progress": 0, "reused": 0, "errors": 0}
+
+    def record_key(self, key: str) -> str:
+        return f"idempotency:{key}"
+
+    def lock_key(self, key: str) -> str:
+        return f"idempotency-lock:{key}"
+
+    async def begin(self, key: str, fingerprint: bytes) -> IdempotentRequest:
+        """Replay the stored response for `key`, or claim it for this request."""
+        token = uuid.uuid4().hex
+        try:
+            record = await self.redis.eval(
+                _BEGIN_SCRIPT, 2, self.record_key(key), self.lock_key(key), token, int(self.lock_ttl * 1000)
+            )
+        except RedisError as e:
+            self.stats["errors"] += 1
+            logger.warning("Idempotency lookup failed for %s: %s", key, e)
+            return IdempotentRequest()
+
+        if isinstance(record, bytes):
+            if record[:FINGERPRINT_SIZE] != fingerprint:
+                self.stats["reused"] += 1
+                raise IdempotencyKeyReusedError()
+            self.stats["replays"] += 1
+            status_code = int.from_bytes(record[FINGERPRINT_SIZE:FINGERPRINT_SIZE + _STATUS_SIZE], "big")
+            return IdempotentRequest(replay=(status_code, record[FINGERPRINT_SIZE + _STATUS_SIZE:]))
+        if not record:
+            self.stats["in_progress"] += 1
+            raise IdempotencyKeyInProgressError(self.retry_after)
+        self.stats["claims"] += 1
+        return IdempotentRequest(self, key, fingerprint, token=token)
+
+    async def save(self, key: str, fingerprint: bytes, token: str, status_code: int, body: bytes) -> None:
+        record = fingerprint + status_code.to_bytes(_STATUS_SIZE, "big") + body
+        try:
+            await self.redis.eval(_SAVE_SCRIPT, 2, self.record_key(key), self.lock_key(key), token, record, self.ttl)
+        except RedisError as e:
+            # The request succeeded; only its replay is lost
+            self.stats["errors"] += 1
+            logger.warning("Idempotency record write failed for %s: %s", key, e)
+
+    async def release(self, key: str, token: str) -> None:
+        try:
+            await self.redis.eval(_RELEASE_SCRIPT, 1, self.lock_key(key), token)
+        except RedisError as e:
+            # The lock expires on its own after lock_ttl
+            self.stats["errors"] += 1
+            logger.warning("Idempotency lock release failed for %s: %s", key, e)
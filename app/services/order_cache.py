@@ -0,0 +1,153 @@
+import logging
+from typing import Awaitable, Callable, Dict, Optional, Set
+from redis import RedisError
+from redis import asyncio as aioredis
+
+from app.utils.cache_codec import MISSING, CacheCodec
+from app.utils.lru_cache import LRUCache
+from app.utils.peer_channel import PeerChannel
+from app.utils.single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Workers publish changed order ids here so every worker drops its local copy
+INVALIDATION_CHANNEL = "order-cache:invalidate"
+
+class OrderCache:
+    """Two-tier read-through cache of orders as their JSON response bodies.
+
+    L1 is an optional per-process LRU holding the immutable JSON bytes, so a
+    hot read needs neither a Redis round trip nor a database query and the
+    bytes go out as the response unchanged. Redis (L2) stores them through
+    `codec` (see CacheCodec), which reads whatever codec wrote an entry.
+    Redis entries expire after `ttl` seconds, unknown ids are cached for
+    `negative_ttl` (as MISSING), and keys carry `key_version` so a schema
+    change can be rolled out by bumping it. Concurrent misses for the same
+    id within this process share a single load (single-flight). Changes
+    (invalidations and `set_many(..., publish=True)` for new orders) are
+    published on INVALIDATION_CHANNEL and `listen()` evicts them from L1 so the
+    workers stay coherent; filling the cache from a read publishes nothing, as
+    it cannot make another worker's copy stale. Redis errors are logged and
+    treated as misses.
+    """
+
+    def __init__(
+        self,
+        redis: aioredis.Redis,
+        ttl: int,
+        negative_ttl: int,
+        key_version: int = 1,
+        local: Optional[LRUCache] = None,
+        codec: Optional[CacheCodec] = None
+    ) -> None:
+        self.redis = redis
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.key_version = key_version
+        self.local = local
+        self.codec = codec or CacheCodec()
+        self._loads = SingleFlight()
+        # Ids invalidated while a load was in flight; that load must not be written back
+        self._stale: Set[int] = set()
+        self.stats = {"local_hits": 0, "hits": 0, "misses": 0, "coalesced": 0, "errors": 0}
+        self._peers = PeerChannel(INVALIDATION_CHANNEL, "order cache invalidation", self.stats)
+
+    def key(self, order_id: int) -> str:
+        return f"order:v{self.key_version}:{order_id}"
+
+    async def get_or_load(self, order_id: int, loader: Callable[[], Awaitable[Optional[bytes]]]) -> Optional[bytes]:
+        """Return the cached order body, or load, cache and return it. None means not found."""
+        if self.local is not None:
+            body = self.local.get(order_id)
+            if body is not None:
+                self.stats["local_hits"] += 1
+                return None if body == MISSING else body
+
+        try:
+            snapshot = await self.redis.get(self.key(order_id))
+        except RedisError as e:
+            self.stats["errors"] += 1
+            logger.warning("Order cache read failed: %s", e)
+            snapshot = None
+        if snapshot is not None:
+            try:
+                body = self.codec.decode_json(snapshot)
+            except Exception as e:
+                # e.g. written by a codec this worker lacks; load it instead
+                self.stats["errors"] += 1
+                logger.warning("Order cache entry %s could not be decoded: %s", order_id, e)
+            else:
+                self.stats["hits"] += 1
+                self._store_local(order_id, body)
+                return body
+
+        if order_id in self._loads:
+            self.stats["coalesced"] += 1
+            return await self._loads.run(order_id, loader)
+
+        self.stats["misses"] += 1
+        body = await self._loads.run(order_id, loader)
+        if order_id in self._stale:
+            self._stale.discard(order_id)
+        else:
+            await self._write({order_id: body}, self.negative_ttl if body is None else self.ttl)
+        return body
+
+    async def set_many(self, bodies: Dict[int, bytes], publish: bool = False) -> None:
+        """Write order bodies through to the cache in one round trip.
+
+        Pass publish=True when the orders changed (e.g. were just created) so
+        other workers drop their local copy, such as a cached MISSING.
+        """
+        await self._write(bodies, self.ttl, publish)
+
+    async def invalidate(self, order_id: int) -> None:
+        if order_id in self._loads:
+            self._stale.add(order_id)
+        if self.local is not None:
+            self.local.pop(order_id)
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.delete(self.key(order_id))
+        pipe.publish(INVALIDATION_CHANNEL, self._peers.message(order_id))
+        try:
+            await pipe.execute()
+        except RedisError as e:
+            self.stats["errors"] += 1
+            logger.warning("Order cache invalidation failed for %s: %s", order_id, e)
+
+    async def listen(self, retry_delay: float = 1.0) -> None:
+        """Evict local entries changed by any worker; runs until cancelled."""
+        await self._peers.listen(self.redis, self._apply_invalidation, self._clear_local, retry_delay)
+
+    def _apply_invalidation(self, payload: str) -> None:
+        order_id = int(payload)
+        if self.local is not None:
+            self.local.pop(order_id)
+
+    async def _clear_local(self) -> None:
+        if self.local is not None:
+            self.local.clear()
+
+    def _store_local(self, order_id: int, body: Optional[bytes]) -> None:
+        if self.local is None:
+            return
+        if body is None:
+            self.local.set(order_id, MISSING, ttl=min(self.negative_ttl, self.local.ttl))
+        else:
+            self.local.set(order_id, body)
+
+    async def _write(self, bodies: Dict[int, Optional[bytes]], ttl: int, publish: bool = False) -> None:
+        if not bodies:
+            return
+        pipe = self.redis.pipeline(transaction=False)
+        for order_id, body in bodies.items():
+            self._store_local(order_id, body)
+            pipe.set(self.key(order_id), self.codec.encode_json(body), ex=ttl)
+            if publish:
+                pipe.publish(INVALIDATION_CHANNEL, self._peers.message(order_id))
+        try:
+            await pipe.execute()
+        except RedisError as e:
+            # The cache is an optimisation; a Redis outage must not fail the request
+            self.stats["errors"] += 1
+            logger.warning("Order cache write failed: %s", e)
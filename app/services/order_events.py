@@ -0,0 +1,170 @@
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional, Union
+from redis import RedisError
+from redis import asyncio as aioredis
+
+from app.core.models.order import Order, OrderStatus
+from app.core.models.order_event import OrderEventType
+from app.repositories.outbox_repository import OutboxRepository, AsyncOutboxRepository
+from app.repositories.threaded_repository import repository_for
+
+logger = logging.getLogger(__name__)
+
+# Takes or extends the lease (KEYS[1]) for owner ARGV[1], for ARGV[2] ms,
+# unless another owner holds it; returns 1 when the caller holds it
+_ACQUIRE_LEASE_SCRIPT = """
+local owner = redis.call("GET", KEYS[1])
+if owner and owner ~= ARGV[1] then
+    return 0
+end
+redis.call("SET", KEYS[1], ARGV[1], "PX", ARGV[2])
+return 1
+"""
+
+# Drops the lease if ARGV[1] still owns it
+_RELEASE_LEASE_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    redis.call("DEL", KEYS[1])
+end
+return 0
+"""
+
+def order_event(
+    event_type: OrderEventType,
+    new_status: OrderStatus,
+    customer_name: str,
+    total_price: int,
+    old_status: Optional[OrderStatus] = None
+) -> dict:
+    """Outbox row values of one event; the repository adds the order_id."""
+    return {
+        "event_type": event_type,
+        "old_status": old_status,
+        "new_status": new_status,
+        "customer_name": customer_name,
+        "total_price": total_price,
+        "created_at": datetime.now(timezone.utc),
+    }
+
+def status_change_event(order: Order, new_status: OrderStatus) -> Optional[dict]:
+    """The event for moving `order` to `new_status`, or None when the status stays."""
+    if new_status == order.order_status:
+        return None
+    event_type = OrderEventType.CANCELLED if new_status == OrderStatus.CANCELLED else OrderEventType.UPDATED
+    return order_event(event_type, new_status, order.customer_name, order.total_price, old_status=order.order_status)
+
+def _utc(moment: datetime) -> datetime:
+    # SQLite hands timestamps back without their zone
+    return moment if moment.tzinfo is not None else moment.replace(tzinfo=timezone.utc)
+
+def stream_fields(event) -> Dict[str, Union[str, int]]:
+    """The Redis Stream entry of an outbox row; absent values are empty strings."""
+    return {
+        "event_id": event.event_id,
+        "event_type": event.event_type.value,
+        "order_id": event.order_id,
+        "old_status": event.old_status.value if event.old_status is not None else "",
+        "new_status": event.new_status.value,
+        "customer_name": event.customer_name or "",
+        "total_price": event.total_price if event.total_price is not None else "",
+        "occurred_at": _utc(event.created_at).isoformat(),
+    }
+
+class OutboxDispatcher:
+    """Moves order events from the outbox table to a Redis Stream.
+
+    Each round claims the oldest `batch_size` events, adds them to `stream`
+    in one pipelined round trip and deletes them in the transaction that
+    claimed them. When Redis or the database fails part-way, the events stay
+    in the outbox and go out again next round: delivery is at least once,
+    and consumers deduplicate on event_id. Full batches are followed by the
+    next one straight away; otherwise the dispatcher sleeps
+    `flush_interval` seconds. `stats["lag_seconds"]` is the age of the
+    oldest event at the last claim.
+
+    Every worker runs one, but `run()` only sends while holding a Redis
+    lease of `lease_ttl` seconds, renewed each round, so batches go out one
+    after another and the stream follows event_id order. A batch that
+    outlasts the lease may overlap its successor's; the successor then
+    waits on the claimed rows (PostgreSQL) or sends them again (SQLite).
+    """
+
+    def __init__(
+        self,
+        open_db: Callable,
+        redis: aioredis.Redis,
+        stream: str,
+        batch_size: int,
+        flush_interval: float,
+        maxlen: Optional[int] = None,
+        lease_ttl: float = 10.0
+    ) -> None:
+        self.open_db = open_db
+        self.redis = redis
+        self.stream = stream
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.maxlen = maxlen
+        self.lease_ttl = lease_ttl
+        self.lease_key = f"{stream}:dispatcher"
+        self._token = uuid.uuid4().hex
+        self.stats = {
+            "dispatched": 0, "batches": 0, "errors": 0, "last_batch_size": 0, "lag_seconds": 0.0, "leader": 0
+        }
+
+    async def dispatch_once(self) -> int:
+        """Dispatch one batch; returns the number of events sent."""
+        async with self.open_db() as db:
+            outbox = repository_for(db, OutboxRepository, AsyncOutboxRepository)
+            events = await outbox.claim_batch(self.batch_size)
+            now = datetime.now(timezone.utc)
+            self.stats["lag_seconds"] = (now - _utc(events[0].created_at)).total_seconds() if events else 0.0
+            self.stats["last_batch_size"] = len(events)
+            if not events:
+                return 0
+            pipe = self.redis.pipeline(transaction=False)
+            for event in events:
+                pipe.xadd(self.stream, stream_fields(event), maxlen=self.maxlen, approximate=True)
+            # Closing the session without a commit releases the claim on failure
+            await pipe.execute()
+            await outbox.delete_dispatched([event.event_id for event in events])
+        self.stats["dispatched"] += len(events)
+        self.stats["batches"] += 1
+        return len(events)
+
+    async def dispatch_if_leader(self) -> int:
+        """Take or renew the lease, then dispatch one batch; 0 while another worker leads."""
+        leader = await self.redis.eval(
+            _ACQUIRE_LEASE_SCRIPT, 1, self.lease_key, self._token, int(self.lease_ttl * 1000)
+        )
+        self.stats["leader"] = int(leader)
+        if not leader:
+            return 0
+        return await self.dispatch_once()
+
+    async def run(self) -> None:
+        """Dispatch until cancelled, then hand the lease back."""
+        try:
+            while True:
+                try:
+                    sent = await self.dispatch_if_leader()
+                except Exception as e:
+                    # Undelivered events stay in the outbox for the next round
+                    self.stats["errors"] += 1
+                    logger.warning("Outbox dispatch failed: %s", e)
+                    sent = 0
+                if sent < self.batch_size:
+                    await asyncio.sleep(self.flush_interval)
+        finally:
+            await self.release()
+
+    async def release(self) -> None:
+        """Give up the lease, so another worker takes over without waiting it out."""
+        try:
+            await self.redis.eval(_RELEASE_LEASE_SCRIPT, 1, self.lease_key, self._token)
+        except RedisError as e:
+            logger.warning("Outbox lease release failed: %s", e)
+        self.stats["leader"] = 0
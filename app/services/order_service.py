@@ -1,101 +1,251 @@
-import json
-import redis
 import logging
-from typing import List, Optional, Dict
+import orjson
+from datetime import date, datetime, timezone
+from typing import AsyncIterator, List, Optional, Dict, Union
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.config import settings
 from app.core.models.order import Order, OrderStatus
-from app.core.schemas.order_schema import OrderCreateSchema, OrderSchema
-from app.repositories.order_repository import OrderRepository
-from app.repositories.product_repository import ProductRepository
+from app.core.models.order_event import OrderEventType
+from app.config import settings
+from app.core.schemas.order_stats_schema import OrderStatsSchema
+from app.core.schemas.order_schema import OrderCreateSchema, OrderUpdateSchema, encode_export_csv, encode_export_ndjson, encode_order
+from app.repositories.order_repository import AsyncOrderRepository
+from app.repositories.order_stats_repository import OrderStatsRepository, AsyncOrderStatsRepository, StatDeltas
+from app.repositories.product_repository import ProductRepository, AsyncProductRepository
+from app.repositories.threaded_repository import repository_for
+from app.services.order_cache import OrderCache
+from app.services.order_events import order_event, status_change_event
+from app.services.order_stats import add_order_deltas, status_change_deltas
 from app.core.models.user import User
 from app.core.models.order_association import OrderProductAssociation
 from app.core.exceptions import (
     ProductNotFoundError,
     InsufficientStockError,
     UnauthorizedOrderAccessError,
-    OrderNotFoundError
+    OrderNotFoundError,
+    OrderStatusChangeForbiddenError,
+    InvalidOrderStatusTransitionError,
+    OrderBatchRejectedError
 )
 
 logger = logging.getLogger(__name__)
 
+# Status changes an administrator may make through update_order; a cancelled
+# order is final. Customers cancel through soft_delete_order instead.
+STATUS_TRANSITIONS: Dict[OrderStatus, frozenset] = {
+    OrderStatus.PENDING: frozenset({OrderStatus.CONFIRMED, OrderStatus.CANCELLED}),
+    OrderStatus.CONFIRMED: frozenset({OrderStatus.CANCELLED}),
+    OrderStatus.CANCELLED: frozenset(),
+}
+
 class OrderService:
-    def __init__(self, repository: OrderRepository, db: Session) -> None:
+    def __init__(
+        self,
+        repository: AsyncOrderRepository,
+        db: Union[Session, AsyncSession],
+        order_cache: Optional[OrderCache] = None
+    ) -> None:
         self.repository = repository
         self.db = db
-        # In-memory cache fallback (if needed)
-        self.cache: Dict[int, Order] = {}
-        # Redis client for caching orders
-        self.redis = redis.Redis(
-            host=settings.REDIS_HOST,
-            port=settings.REDIS_PORT,
-            decode_responses=True
-        )
+        # Process-wide two-tier order cache; None disables caching
+        self.order_cache = order_cache
+        # JSON bodies encoded during this request, shared by the cache and the response
+        self._bodies: Dict[int, bytes] = {}
 
-    def _cache_order(self, order: Order) -> None:
-        key = f"order:{order.order_id}"
-        order_data = OrderSchema.model_validate(order).model_dump()
-        self.redis.set(key, json.dumps(order_data))
-        
-    def _get_cached_order(self, order_id: int) -> Optional[dict]:
-        key = f"order:{order_id}"
-        cached = self.redis.get(key)
-        return json.loads(cached) if cached else None
+    def encode(self, order: Order) -> bytes:
+        """Return the order's JSON body, serializing it at most once per service instance."""
+        body = self._bodies.get(order.order_id)
+        if body is None:
+            body = self._bodies[order.order_id] = encode_order(order)
+        return body
+
+    async def _cache_orders(self, *orders: Order, created: bool = False) -> None:
+        if self.order_cache is None or not orders:
+            return
+        await self.order_cache.set_many({order.order_id: self.encode(order) for order in orders}, publish=created)
+
+    async def _invalidate_cached_order(self, order_id: int) -> None:
+        self._bodies.pop(order_id, None)
+        if self.order_cache is not None:
+            await self.order_cache.invalidate(order_id)
+
+    async def _load_order(self, order_id: int) -> Optional[bytes]:
+        order = await self.repository.get(order_id)
+        return self.encode(order) if order else None
+
+    async def _apply_stats(self, deltas: StatDeltas) -> None:
+        # Runs in the transaction the following repository call commits
+        await repository_for(self.db, OrderStatsRepository, AsyncOrderStatsRepository).apply(deltas)
 
     def _log_status_change(self, order_id: int, old_status: OrderStatus, new_status: OrderStatus) -> None:
-        logger.info(f"Order status changed: order_id={order_id}, old_status={old_status}, new_status={new_status}")
+        logger.info("Order status changed: order_id=%s, old_status=%s, new_status=%s", order_id, old_status, new_status)
 
-    def create_order(self, order_data: OrderCreateSchema, current_user: User) -> Order:
+    async def create_order(self, order_data: OrderCreateSchema, current_user: User) -> Order:
         total_price = 0
-        product_repo = ProductRepository(self.db)
+        product_repo = repository_for(self.db, ProductRepository, AsyncProductRepository)
         new_order = Order(
             customer_name=current_user.username,  # always taken from token
             order_status=OrderStatus.PENDING,
-            total_price=0  # will be updated below
+            total_price=0,  # will be updated below
+            created_at=datetime.now(timezone.utc)
         )
 
+        # Merge repeated lines for the same product before touching the database
+        requested: Dict[int, int] = {}
         for prod_data in order_data.products:
-            product = product_repo.get(prod_data.product_id)
+            requested[prod_data.product_id] = requested.get(prod_data.product_id, 0) + prod_data.quantity
+
+        # The rows stay locked until commit, so checking them here is final;
+        # the stock of every line is then taken in one executemany UPDATE
+        products = await product_repo.get_many_for_update(requested)
+        for product_id, quantity in sorted(requested.items()):
+            product = products.get(product_id)
             if not product:
-                raise ProductNotFoundError(prod_data.product_id)
-            if product.quantity < prod_data.quantity:
-                raise InsufficientStockError(prod_data.product_id, product.quantity)
+                await product_repo.rollback()
+                raise ProductNotFoundError(product_id)
+            available = product.quantity
+            if available < quantity:
+                await product_repo.rollback()
+                raise InsufficientStockError(product_id, available)
+        await product_repo.take_stock_many(requested)
 
-            product.quantity -= prod_data.quantity
-            subtotal = product.price * prod_data.quantity
+        for product_id, quantity in sorted(requested.items()):
+            product = products[product_id]
+            subtotal = product.price * quantity
             total_price += subtotal
 
             association = OrderProductAssociation(
                 product_id=product.product_id,
-                ordered_quantity=prod_data.quantity
+                ordered_quantity=quantity
             )
             new_order.order_associations.append(association)
         new_order.total_price = total_price
-        created_order = self.repository.create(new_order)
-        self.cache[created_order.order_id] = created_order
-        self._cache_order(created_order)
+        await self._apply_stats(add_order_deltas({}, new_order.order_status, new_order.created_at, total_price, requested))
+        # The outbox row commits with the order
+        created = order_event(OrderEventType.CREATED, new_order.order_status, new_order.customer_name, total_price)
+        created_order = await self.repository.create(new_order, events=[created])
+        await self._cache_orders(created_order, created=True)
         
         # Log the creation action
-        logger.info(f"Order created: {created_order.order_id} by user: {current_user.username}")
+        logger.info("Order created: %s by user: %s", created_order.order_id, current_user.username)
         
         return created_order
 
-    def update_order(self, order_id: int, order_data: OrderCreateSchema, current_user: User) -> Order:
-        order = self.repository.get(order_id)
+    async def create_orders_bulk(
+        self,
+        batch: List[OrderCreateSchema],
+        current_user: User,
+        atomic: bool = True
+    ) -> List[Union[Order, Exception]]:
+        """Create many orders in one transaction.
+
+        Stock for the whole batch is checked against one locking read of every
+        product involved, then taken with one executemany UPDATE; orders and
+        their lines go in with two bulk INSERTs and the cache is written in one
+        pipeline. Orders are served in batch order, so an earlier order wins
+        contested stock. Returns, per position, the created order or the
+        ProductNotFoundError / InsufficientStockError it failed with. With
+        `atomic`, any failure creates nothing and raises OrderBatchRejectedError.
+        """
+        product_repo = repository_for(self.db, ProductRepository, AsyncProductRepository)
+        requested_by_order: List[Dict[int, int]] = []
+        for order_data in batch:
+            requested: Dict[int, int] = {}
+            for prod_data in order_data.products:
+                requested[prod_data.product_id] = requested.get(prod_data.product_id, 0) + prod_data.quantity
+            requested_by_order.append(requested)
+
+        product_ids = {product_id for requested in requested_by_order for product_id in requested}
+        products = await product_repo.get_many_for_update(product_ids) if product_ids else {}
+        remaining = {product_id: product.quantity for product_id, product in products.items()}
+
+        errors: Dict[int, Exception] = {}
+        accepted: List[int] = []
+        for index, requested in enumerate(requested_by_order):
+            for product_id, quantity in sorted(requested.items()):
+                if product_id not in products:
+                    errors[index] = ProductNotFoundError(product_id)
+                    break
+                if remaining[product_id] < quantity:
+                    errors[index] = InsufficientStockError(product_id, remaining[product_id])
+                    break
+            else:
+                for product_id, quantity in requested.items():
+                    remaining[product_id] -= quantity
+                accepted.append(index)
+
+        if errors and atomic:
+            await product_repo.rollback()
+            raise OrderBatchRejectedError(errors)
+        if not accepted:
+            await product_repo.rollback()
+            return [errors[index] for index in range(len(batch))]
+
+        taken = {
+            product_id: products[product_id].quantity - left
+            for product_id, left in remaining.items()
+            if left != products[product_id].quantity
+        }
+        await product_repo.take_stock_many(taken)
+        created_at = datetime.now(timezone.utc)
+        rows = [
+            {
+                "customer_name": current_user.username,  # always taken from token
+                "order_status": OrderStatus.PENDING,
+                "total_price": sum(
+                    products[product_id].price * quantity
+                    for product_id, quantity in requested_by_order[index].items()
+                ),
+                "created_at": created_at
+            }
+            for index in accepted
+        ]
+        deltas: StatDeltas = {}
+        for row, index in zip(rows, accepted):
+            add_order_deltas(deltas, OrderStatus.PENDING, created_at, row["total_price"], requested_by_order[index])
+        await self._apply_stats(deltas)
+        events = [
+            order_event(OrderEventType.CREATED, row["order_status"], row["customer_name"], row["total_price"])
+            for row in rows
+        ]
+        created_orders = await self.repository.create_many(
+            rows, [requested_by_order[index] for index in accepted], events=events
+        )
+        await self._cache_orders(*created_orders, created=True)
+
+        logger.info(
+            "Orders created in bulk: %s of %s by user: %s",
+            len(created_orders), len(batch), current_user.username
+        )
+
+        results: List[Union[Order, Exception]] = [errors.get(index) for index in range(len(batch))]
+        for index, order in zip(accepted, created_orders):
+            results[index] = order
+        return results
+
+    async def update_order(self, order_id: int, order_data: OrderUpdateSchema, current_user: User) -> Order:
+        order = await self.repository.get(order_id)
         if not order:
             raise OrderNotFoundError(order_id)
         if not current_user.is_admin and order.customer_name != current_user.username:
             raise UnauthorizedOrderAccessError(order_id)
         
         old_status = order.order_status
-        update_data = order_data.dict()
-        updated_order = self.repository.update(order, update_data)
-        self.cache[updated_order.order_id] = updated_order
-        self._cache_order(updated_order)
+        update_data = order_data.model_dump(exclude_none=True)
+        new_status = update_data.get("order_status", old_status)
+        if new_status != old_status:
+            if not current_user.is_admin:
+                raise OrderStatusChangeForbiddenError(order_id)
+            if new_status not in STATUS_TRANSITIONS[old_status]:
+                raise InvalidOrderStatusTransitionError(order_id, old_status.value, new_status.value)
+        await self._apply_stats(status_change_deltas(order, new_status))
+        event = status_change_event(order, new_status)
+        updated_order = await self.repository.update(order, update_data, events=[event] if event else [])
+        await self._invalidate_cached_order(updated_order.order_id)
         
         # Log the update action
-        logger.info(f"Order updated: {updated_order.order_id} by user: {current_user.username}")
+        logger.info("Order updated: %s by user: %s", updated_order.order_id, current_user.username)
         
         # Log the status change if it occurred
         if old_status != updated_order.order_status:
@@ -103,55 +253,121 @@ class OrderService:
         
         return updated_order
 
-    def get_orders(
+    async def get_orders(
         self, 
         current_user: User, 
         status_filter: Optional[OrderStatus] = None, 
         min_price: Optional[float] = None, 
-        max_price: Optional[float] = None
+        max_price: Optional[float] = None,
+        after: Optional[int] = None,
+        limit: int = 100
     ) -> List[Order]:
-        orders = self.repository.list_all()
-
-        for order in orders:
-            self.cache[order.order_id] = order
-        if not current_user.is_admin:
-            orders = [o for o in orders if o.customer_name == current_user.username]
-        if status_filter:
-            orders = [o for o in orders if o.order_status == status_filter]
-        if min_price is not None:
-            orders = [o for o in orders if o.total_price is not None and o.total_price >= min_price]
-        if max_price is not None:
-            orders = [o for o in orders if o.total_price is not None and o.total_price <= max_price]
+        orders = await self.repository.list_filtered(
+            customer_name=None if current_user.is_admin else current_user.username,
+            status=status_filter,
+            min_price=min_price,
+            max_price=max_price,
+            after=after,
+            limit=limit
+        )
+        await self._cache_orders(*orders)
         return orders
 
-    def get_order(self, order_id: int, current_user: User) -> Order:
-        cached = self._get_cached_order(order_id)
-        if cached:
-            return cached
-        
-        order = self.repository.get(order_id)
-        if not order:
+    async def export_orders(
+        self,
+        current_user: User,
+        fmt: str = "ndjson",
+        status_filter: Optional[OrderStatus] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        batch_size: int = settings.ORDER_EXPORT_BATCH_SIZE
+    ) -> AsyncIterator[bytes]:
+        """Yield every matching order encoded as NDJSON or CSV, one chunk per fetched batch.
+
+        Same filters and visibility as get_orders, without paging. Rows come
+        from a streaming cursor and are encoded as they arrive, so memory is
+        bounded by `batch_size` rows, not by the number of orders. Bypasses
+        the order cache.
+        """
+        partitions = self.repository.stream_export_rows(
+            customer_name=None if current_user.is_admin else current_user.username,
+            status=status_filter,
+            min_price=min_price,
+            max_price=max_price,
+            batch_size=batch_size
+        )
+        encode = encode_export_csv if fmt == "csv" else encode_export_ndjson
+        if fmt == "csv":
+            yield encode_export_csv([], header=True)
+
+        # Rows of one order are adjacent and may straddle two batches
+        current, lines = None, []
+        async for rows in partitions:
+            complete = []
+            for row in rows:
+                if current is None or row.order_id != current.order_id:
+                    if current is not None:
+                        complete.append((current, lines))
+                    current, lines = row, []
+                if row.product_id is not None:
+                    lines.append((row.product_id, row.ordered_quantity))
+            if complete:
+                yield encode(complete)
+        if current is not None:
+            yield encode([(current, lines)])
+
+    async def get_stats(
+        self,
+        by_day: bool = False,
+        by_product: bool = False,
+        day_from: Optional[date] = None,
+        day_to: Optional[date] = None,
+        top_products: int = 100
+    ) -> OrderStatsSchema:
+        """Order totals per status, read from order_stats instead of scanning orders.
+
+        The per-status totals cost the same whatever the number of orders;
+        the breakdowns grow with the days in range and are capped at
+        `top_products` products (by quantity).
+        """
+        stats_repo = repository_for(self.db, OrderStatsRepository, AsyncOrderStatsRepository)
+        return OrderStatsSchema(
+            statuses=await stats_repo.totals(),
+            days=await stats_repo.daily(day_from, day_to) if by_day else None,
+            products=await stats_repo.products(top_products) if by_product else None
+        )
+
+    async def get_order(self, order_id: int, current_user: User) -> bytes:
+        """Return the order's JSON body, from the cache when possible."""
+        if self.order_cache is None:
+            body = await self._load_order(order_id)
+        else:
+            body = await self.order_cache.get_or_load(order_id, lambda: self._load_order(order_id))
+
+        if not body:
             raise OrderNotFoundError(order_id)
-        if not current_user.is_admin and order.customer_name != current_user.username:
+        # Checked on every read, cached or not; admins skip the parse
+        if not current_user.is_admin and orjson.loads(body)["customer_name"] != current_user.username:
             raise UnauthorizedOrderAccessError(order_id)
-        self.cache[order.order_id] = order
-        self._cache_order(order)
-        return order
+        return body
 
-    def soft_delete_order(self, order_id: int, current_user: User) -> Order:
-        order = self.repository.get(order_id)
+    async def soft_delete_order(self, order_id: int, current_user: User) -> Order:
+        order = await self.repository.get(order_id)
         if not order:
             raise OrderNotFoundError(order_id)
         if not current_user.is_admin and order.customer_name != current_user.username:
             raise UnauthorizedOrderAccessError(order_id)
         
         old_status = order.order_status
-        updated_order = self.repository.update(order, {"order_status": OrderStatus.CANCELLED})
-        self.cache[order_id] = updated_order
-        self._cache_order(updated_order)
+        await self._apply_stats(status_change_deltas(order, OrderStatus.CANCELLED))
+        event = status_change_event(order, OrderStatus.CANCELLED)
+        updated_order = await self.repository.update(
+            order, {"order_status": OrderStatus.CANCELLED}, events=[event] if event else []
+        )
+        await self._invalidate_cached_order(order_id)
         
         # Log the deletion action
-        logger.info(f"Order soft-deleted: {updated_order.order_id} by user: {current_user.username}")
+        logger.info("Order soft-deleted: %s by user: %s", updated_order.order_id, current_user.username)
         
         # Log the status change
         self._log_status_change(updated_order.order_id, old_status, updated_order.order_status)
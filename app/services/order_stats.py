@@ -0,0 +1,43 @@
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from app.config import settings
+from app.core.models.order import Order, OrderStatus
+from app.core.models.order_stats import ALL_DAYS, ALL_PRODUCTS
+from app.repositories.order_stats_repository import StatDeltas
+
+def add_order_deltas(
+    deltas: StatDeltas,
+    status: OrderStatus,
+    created_at: Optional[datetime],
+    total_price: int,
+    lines: Dict[int, int],
+    sign: int = 1
+) -> StatDeltas:
+    """Add (sign=1) or remove (sign=-1) one order's contribution to `deltas`."""
+    quantity = sum(lines.values())
+    keys = [((ALL_DAYS, ALL_PRODUCTS, status), total_price, quantity)]
+    if settings.ORDER_STATS_DAILY and created_at is not None:
+        if created_at.tzinfo is not None:
+            created_at = created_at.astimezone(timezone.utc)
+        keys.append(((created_at.date(), ALL_PRODUCTS, status), total_price, quantity))
+    if settings.ORDER_STATS_PER_PRODUCT:
+        keys.extend(((ALL_DAYS, product_id, status), 0, line_quantity) for product_id, line_quantity in lines.items())
+    for key, price, units in keys:
+        values = deltas.setdefault(key, [0, 0, 0])
+        values[0] += sign
+        values[1] += sign * (price or 0)
+        values[2] += sign * units
+    return deltas
+
+def order_lines(order: Order) -> Dict[int, int]:
+    return {association.product_id: association.ordered_quantity for association in order.order_associations}
+
+def status_change_deltas(order: Order, new_status: OrderStatus) -> StatDeltas:
+    """Move a persisted order's contribution from its current status to `new_status`."""
+    deltas: StatDeltas = {}
+    if new_status != order.order_status:
+        lines = order_lines(order)
+        add_order_deltas(deltas, order.order_status, order.created_at, order.total_price, lines, sign=-1)
+        add_order_deltas(deltas, new_status, order.created_at, order.total_price, lines)
+    return deltas
@@ -0,0 +1,81 @@
+from typing import Awaitable, Callable, Optional, Union
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.core.models.user import User
+from app.core.schemas.user_schema import PrincipalSchema
+from app.utils.lru_cache import LRUCache
+
+# session.info key collecting users changed in the current transaction
+_PENDING_KEY = "principal_cache_pending"
+
+class PrincipalCache:
+    """Per-process cache of authenticated principals.
+
+    Entries are keyed by the token's `user_id` claim, or by its `sub`
+    (username) for older tokens that carry no id, so both kinds of token
+    resolve without a users query once warm. Users changed or deleted through
+    the ORM are evicted when their transaction commits; changes made by other
+    processes show up after at most `ttl` seconds.
+    """
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.local = LRUCache(maxsize, ttl) if maxsize > 0 else None
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    async def get_or_load(
+        self,
+        key: Union[int, str],
+        loader: Callable[[], Awaitable[Optional[User]]]
+    ) -> Optional[PrincipalSchema]:
+        """Return the principal for a user id (int) or username (str); None if the user is gone."""
+        if self.local is not None:
+            principal = self.local.get(key)
+            if principal is not None:
+                self.stats["hits"] += 1
+                return principal
+
+        self.stats["misses"] += 1
+        user = await loader()
+        if user is None:
+            return None
+        principal = PrincipalSchema.model_validate(user)
+        if self.local is not None:
+            self.local.set(key, principal)
+        return principal
+
+    def invalidate(self, user_id: int, username: str) -> None:
+        self.stats["invalidations"] += 1
+        if self.local is not None:
+            # Single C-level dict operations; safe from threadpool commits as well
+            self.local.pop(user_id)
+            self.local.pop(username)
+
+    def clear(self) -> None:
+        if self.local is not None:
+            self.local.clear()
+
+principal_cache = PrincipalCache(settings.PRINCIPAL_CACHE_MAXSIZE, settings.PRINCIPAL_CACHE_TTL)
+
+def _track_user_change(mapper, connection, user: User) -> None:
+    session = Session.object_session(user)
+    if session is None:
+        return
+    pending = session.info.setdefault(_PENDING_KEY, set())
+    pending.add((user.user_id, user.username))
+    # A renamed user is also cached under the old username
+    for old_username in inspect(user).attrs.username.history.deleted:
+        pending.add((user.user_id, old_username))
+
+def _evict_committed(session: Session) -> None:
+    for user_id, username in session.info.pop(_PENDING_KEY, ()):
+        principal_cache.invalidate(user_id, username)
+
+def _discard_pending(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+event.listen(User, "after_update", _track_user_change)
+event.listen(User, "after_delete", _track_user_change)
+event.listen(Session, "after_commit", _evict_committed)
+event.listen(Session, "after_rollback", _discard_pending)
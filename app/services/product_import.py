@@ -0,0 +1,89 @@
+import codecs
+import csv
+import json
+from typing import AsyncIterable, AsyncIterator, Dict, Tuple, Union
+from pydantic import ValidationError
+
+from app.core.schemas.product_schema import ProductImportRowSchema
+
+IMPORT_FORMATS = ("csv", "ndjson")
+
+class ProductImportFormatError(ValueError):
+    """The input cannot be read at all (as opposed to a single bad row)."""
+
+async def iter_lines(chunks: AsyncIterable[bytes], max_line_bytes: int) -> AsyncIterator[str]:
+    """Split a UTF-8 byte stream into lines (ends kept) without buffering more than one line."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        start = 0
+        while True:
+            end = pending.find("\n", start)
+            if end < 0:
+                break
+            yield pending[start:end + 1]
+            start = end + 1
+        pending = pending[start:]
+        if len(pending) > max_line_bytes:
+            raise ProductImportFormatError(f"Line longer than {max_line_bytes} characters")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+async def iter_records(
+    lines: AsyncIterable[str],
+    fmt: str,
+    max_line_bytes: int
+) -> AsyncIterator[Tuple[int, Union[Dict[str, object], str]]]:
+    """Yield (line number, raw fields) per record, or (line number, error message).
+
+    A CSV record ends at the first line end where its quotes are balanced,
+    so quoted fields may span lines; the first record is the header.
+    """
+    header = None
+    record, first_line, line_number = "", 0, 0
+    async for line in lines:
+        line_number += 1
+        if fmt == "ndjson":
+            if not line.strip():
+                continue
+            try:
+                fields = json.loads(line)
+            except ValueError as e:
+                yield line_number, f"Invalid JSON: {e}"
+                continue
+            yield line_number, fields if isinstance(fields, dict) else "Expected a JSON object"
+            continue
+
+        if not record:
+            first_line = line_number
+        record += line
+        # Escaped quotes come in pairs, so an odd count means a quoted field is still open
+        if record.count('"') % 2:
+            if len(record) > max_line_bytes:
+                raise ProductImportFormatError(f"Unterminated quoted field starting on line {first_line}")
+            continue
+        text, record = record, ""
+        if not text.strip():
+            continue
+        values = next(csv.reader([text]))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        if len(values) != len(header):
+            yield first_line, f"Expected {len(header)} columns, got {len(values)}"
+            continue
+        yield first_line, dict(zip(header, values))
+
+    if record.strip():
+        yield first_line, "Unterminated quoted field"
+
+def validate_row(fields: Dict[str, object]) -> Union[ProductImportRowSchema, str]:
+    """Parse one record's fields; returns the row or an error message."""
+    # Empty CSV cells mean "not given", e.g. no product_id for a new product
+    fields = {name: value for name, value in fields.items() if value != ""}
+    try:
+        return ProductImportRowSchema.model_validate(fields)
+    except ValidationError as e:
+        return "; ".join(f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in e.errors())
@@ -1,26 +1,93 @@
-from typing import List
+import logging
+from typing import AsyncIterable, Callable, List, Optional, Union
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from app.config import settings
 from app.core.exceptions.custom_exceptions import ProductNotFoundError, InsufficientPermissionsError
 from app.core.models.product import Product
-from app.repositories.product_repository import ProductRepository
+from app.core.schemas.product_schema import ProductImportErrorSchema, ProductImportReportSchema
+from app.repositories.product_repository import AsyncProductRepository
+from app.services.catalog_snapshot import ProductCatalog, product_catalog
+from app.services.product_import import IMPORT_FORMATS, iter_lines, iter_records, validate_row
 from app.core.models.user import User
 
+logger = logging.getLogger(__name__)
+
 class ProductService:
-    def __init__(self, repository: ProductRepository, db: Session) -> None:
+    def __init__(
+        self,
+        repository: AsyncProductRepository,
+        db: Union[Session, AsyncSession],
+        catalog: Optional[ProductCatalog] = None
+    ) -> None:
         self.repository = repository
         self.db = db
+        # The worker's shared snapshot unless a test brings its own
+        self.catalog = catalog or product_catalog
 
-    def create_product(self, name: str, price: int, quantity: int, current_user: User) -> Product:
+    async def create_product(self, name: str, price: int, quantity: int, current_user: User) -> Product:
         if not current_user.is_admin:
             raise InsufficientPermissionsError("Only admins can create products")
         product = Product(name=name, price=price, quantity=quantity)
-        return self.repository.create(product)
+        return await self.repository.create(product)
 
-    def get_product(self, product_id: int) -> Product:
-        product = self.repository.get(product_id)
-        if not product:
+    async def get_product(self, product_id: int) -> bytes:
+        """The product's ProductSchema JSON body, served from the catalog snapshot."""
+        body = (await self.catalog.get(self.repository)).product_body(product_id)
+        if body is None:
             raise ProductNotFoundError(product_id)
-        return product
+        return body
+
+    async def list_products(self) -> bytes:
+        """The whole catalog as a JSON array, served from the catalog snapshot."""
+        return (await self.catalog.get(self.repository)).body
+
+    async def import_products(
+        self,
+        chunks: AsyncIterable[bytes],
+        fmt: str,
+        batch_size: int = settings.PRODUCT_IMPORT_BATCH_SIZE,
+        on_progress: Optional[Callable[[ProductImportReportSchema], None]] = None
+    ) -> ProductImportReportSchema:
+        """Stream a CSV or NDJSON catalog into the products table.
+
+        Records are parsed as the bytes arrive and upserted `batch_size` at a
+        time, each batch in its own transaction, so memory stays bounded by
+        one batch whatever the input size. Invalid rows are skipped and
+        reported by line; `on_progress` is called after every batch.
+        Callers are responsible for restricting this to admins.
+        """
+        if fmt not in IMPORT_FORMATS:
+            raise ValueError(f"Unsupported import format {fmt!r}; expected one of {IMPORT_FORMATS}")
+        report = ProductImportReportSchema(rows=0, imported=0, failed=0, batches=0, errors=[])
+        batch: List[dict] = []
+        explicit_ids = False
+
+        async def flush() -> None:
+            await self.repository.upsert_many(batch)
+            report.imported += len(batch)
+            report.batches += 1
+            batch.clear()
+            logger.info("Product import: %s rows read, %s imported, %s failed", report.rows, report.imported, report.failed)
+            if on_progress is not None:
+                on_progress(report)
 
-    def list_products(self) -> List[Product]:
-        return self.repository.list_all()
\ No newline at end of file
+        max_line = settings.PRODUCT_IMPORT_MAX_LINE_BYTES
+        async for line, fields in iter_records(iter_lines(chunks, max_line), fmt, max_line):
+            report.rows += 1
+            row = validate_row(fields) if isinstance(fields, dict) else fields
+            if isinstance(row, str):
+                report.failed += 1
+                if len(report.errors) < settings.PRODUCT_IMPORT_MAX_ERRORS:
+                    report.errors.append(ProductImportErrorSchema(line=line, error=row))
+                continue
+            explicit_ids = explicit_ids or row.product_id is not None
+            # New products leave product_id out and get one from the database
+            batch.append(row.model_dump(exclude_none=True))
+            if len(batch) >= batch_size:
+                await flush()
+        if batch:
+            await flush()
+        if explicit_ids:
+            await self.repository.sync_id_sequence()
+        return report
\ No newline at end of file
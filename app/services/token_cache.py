@@ -0,0 +1,89 @@
+import hashlib
+import heapq
+import math
+import time
+from typing import Any, Dict, List, Tuple
+from jose import JWTError, jwt
+
+from app.config import settings
+from app.utils.auth_utils import ALGORITHM, SECRET_KEY
+from app.utils.lru_cache import LRUCache
+
+class TokenRevokedError(JWTError):
+    pass
+
+class TokenCache:
+    """Per-process memo of verified JWT claims.
+
+    Entries are keyed by the SHA-256 digest of the token (the token itself is
+    not kept) and live until the token's `exp`, so a client polling with one
+    token pays for signature verification once. Invalid and expired tokens
+    are never cached. `revoke()` evicts a token and refuses it until it
+    would have expired anyway; revocations are not bounded by `maxsize` and
+    are only dropped once their token has expired.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        self.enabled = maxsize > 0
+        self.verified = LRUCache(max(maxsize, 1), ttl=0)
+        # digest -> exp of each revoked token, plus a heap of (exp, digest) to
+        # drop them in expiry order
+        self.revoked: Dict[bytes, float] = {}
+        self._revoked_expiry: List[Tuple[float, bytes]] = []
+        self.stats = {"hits": 0, "misses": 0, "revoked": 0, "decode_seconds": 0.0}
+
+    def decode(self, token: str) -> Dict[str, Any]:
+        """Verify `token` and return its claims; raises JWTError like jwt.decode."""
+        if not self.enabled:
+            return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        digest = hashlib.sha256(token.encode()).digest()
+        self._expire_revocations()
+        if digest in self.revoked:
+            raise TokenRevokedError("Token has been revoked")
+        claims = self.verified.get(digest)
+        if claims is not None:
+            self.stats["hits"] += 1
+            return dict(claims)
+
+        start = time.perf_counter()
+        claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        self.stats["decode_seconds"] += time.perf_counter() - start
+        self.stats["misses"] += 1
+        expires_in = claims.get("exp", 0) - time.time()
+        if expires_in > 0:
+            self.verified.set(digest, claims, ttl=expires_in)
+        return dict(claims)
+
+    def revoke(self, token: str) -> None:
+        """Refuse `token` from now on in this process (e.g. on logout)."""
+        digest = hashlib.sha256(token.encode()).digest()
+        self.verified.pop(digest)
+        try:
+            claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        except JWTError:
+            # Already invalid or expired; nothing left to refuse
+            return
+        self.stats["revoked"] += 1
+        expires_at = claims.get("exp", math.inf)
+        if digest not in self.revoked:
+            heapq.heappush(self._revoked_expiry, (expires_at, digest))
+        self.revoked[digest] = expires_at
+        self._expire_revocations()
+
+    def _expire_revocations(self) -> None:
+        now = time.time()
+        while self._revoked_expiry and self._revoked_expiry[0][0] <= now:
+            _, digest = heapq.heappop(self._revoked_expiry)
+            self.revoked.pop(digest, None)
+
+    def report(self) -> Dict[str, Any]:
+        """Stats plus the hit rate and the verification time hits avoided."""
+        lookups = self.stats["hits"] + self.stats["misses"]
+        mean_decode = self.stats["decode_seconds"] / self.stats["misses"] if self.stats["misses"] else 0.0
+        return {
+            **self.stats,
+            "hit_rate": self.stats["hits"] / lookups if lookups else 0.0,
+            "decode_seconds_saved": self.stats["hits"] * mean_decode,
+        }
+
+token_cache = TokenCache(settings.TOKEN_CACHE_MAXSIZE)
@@ -0,0 +1,82 @@
+from contextlib import asynccontextmanager, contextmanager
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app.main import app
+from app.database import Base
+from app.dependencies import get_db, get_db_opener
+from app.core.models.user import User
+from app.services.catalog_snapshot import product_catalog
+from app.services.principal_cache import principal_cache
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+@pytest.fixture(autouse=True)
+def clear_principal_cache():
+    # Process-wide; tests build fresh databases that reuse user ids
+    principal_cache.clear()
+    product_catalog.clear()
+
+@pytest.fixture
+def assert_max_queries():
+    """Fail the test when a block runs more SQL statements than allowed.
+
+    Usage: `with assert_max_queries(engine, 3): ...`; works with sync and
+    async engines and yields the list of captured statements.
+    """
+    @contextmanager
+    def guard(engine, limit: int):
+        sync_engine = getattr(engine, "sync_engine", engine)
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(sync_engine, "before_cursor_execute", record)
+        try:
+            yield statements
+        finally:
+            event.remove(sync_engine, "before_cursor_execute", record)
+        assert len(statements) <= limit, (
+            f"expected at most {limit} queries, got {len(statements)}:\n" + "\n".join(statements)
+        )
+
+    return guard
+
+@pytest.fixture
+def seed_rows():
+    """Rows the `engine` fixture adds after the admin user; override per module."""
+    return lambda session: None
+
+@pytest.fixture
+def engine(tmp_path, seed_rows):
+    """Async engine on a fresh SQLite file, serving the app's get_db and get_db_opener.
+
+    The database holds an admin user (id 1) plus whatever `seed_rows` adds.
+    """
+    sync_engine = create_engine(f"sqlite:///{tmp_path}/app.db")
+    Base.metadata.create_all(bind=sync_engine)
+    with sessionmaker(bind=sync_engine)() as session:
+        session.add(User(username="admin", email="admin@example.com", hashed_password="x", is_admin=1))
+        seed_rows(session)
+        session.commit()
+    sync_engine.dispose()
+
+    # NullPool: each TestClient request runs on its own event loop
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/app.db", poolclass=NullPool)
+    TestingSessionLocal = async_sessionmaker(bind=async_engine, expire_on_commit=False)
+
+    async def override_get_db():
+        async with TestingSessionLocal() as session:
+            yield session
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_db_opener] = lambda: asynccontextmanager(override_get_db)
+    yield async_engine
+    app.dependency_overrides.pop(get_db)
+    app.dependency_overrides.pop(get_db_opener)
@@ -1,49 +1,83 @@
 import pytest
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.services.auth_service import AuthService
 from app.core.schemas.user_schema import UserCreateSchema, LoginSchema
 from app.core.models.user import User
 from app.core.exceptions.custom_exceptions import DuplicateUsernameError, InvalidCredentialsError
 
+pytestmark = pytest.mark.anyio
+
 @pytest.fixture
-def db_session():
+async def db_session():
     # Setup code for creating a test database session
     # You can use an in-memory SQLite database for testing
-    from sqlalchemy import create_engine
-    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+    from sqlalchemy.pool import StaticPool
     from app.database import Base
 
-    engine = create_engine("sqlite:///:memory:")
-    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-    Base.metadata.create_all(bind=engine)
-    session = TestingSessionLocal()
-    yield session
-    session.close()
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:", poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    TestingSessionLocal = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+    async with TestingSessionLocal() as session:
+        yield session
+    await engine.dispose()
 
 @pytest.fixture
-def auth_service(db_session: Session):
+def auth_service(db_session: AsyncSession):
     return AuthService(db_session)
 
-def test_register_user(auth_service: AuthService):
+async def test_register_user(auth_service: AuthService):
     user_data = UserCreateSchema(username="testuser", email="test@example.com", password="password")
-    user = auth_service.register(user_data)
+    user = await auth_service.register(user_data)
     assert user.username == "testuser"
     assert user.email == "test@example.com"
 
-def test_register_duplicate_user(auth_service: AuthService):
+async def test_register_duplicate_user(auth_service: AuthService):
     user_data = UserCreateSchema(username="testuser", email="test@example.com", password="password")
-    auth_service.register(user_data)
+    await auth_service.register(user_data)
     with pytest.raises(DuplicateUsernameError):
-        auth_service.register(user_data)
+        await auth_service.register(user_data)
 
-def test_login_user(auth_service: AuthService, db_session: Session):
+async def test_login_user(auth_service: AuthService, db_session: AsyncSession):
     user_data = UserCreateSchema(username="testuser", email="test@example.com", password="password")
-    auth_service.register(user_data)
+    await auth_service.register(user_data)
     login_data = LoginSchema(username="testuser", password="password")
-    token = auth_service.login(login_data)
+    token = await auth_service.login(login_data)
     assert "access_token" in token
 
-def test_login_invalid_user(auth_service: AuthService):
+async def test_login_invalid_user(auth_service: AuthService):
     login_data = LoginSchema(username="invaliduser", password="password")
     with pytest.raises(InvalidCredentialsError):
-        auth_service.login(login_data)
\ No newline at end of file
+        await auth_service.login(login_data)
+
+@pytest.fixture
+def restore_password_context():
+    from app.utils.auth_utils import pwd_context
+
+    saved = pwd_context.to_dict()
+    yield pwd_context
+    pwd_context.load(saved)
+
+async def test_login_rehashes_outdated_hash(auth_service: AuthService, restore_password_context):
+    from app.utils.auth_utils import configure_password_context
+
+    configure_password_context("bcrypt", 4)
+    user = await auth_service.register(UserCreateSchema(username="testuser", email="test@example.com", password="password"))
+    assert user.hashed_password.startswith("$2b$04$")
+
+    configure_password_context("bcrypt", 5)
+    await auth_service.login(LoginSchema(username="testuser", password="password"))
+    assert user.hashed_password.startswith("$2b$05$")
+
+    # Stronger hashes are kept as they are
+    configure_password_context("bcrypt", 4)
+    await auth_service.login(LoginSchema(username="testuser", password="password"))
+    assert user.hashed_password.startswith("$2b$05$")
+
+def test_calibrated_cost_respects_budget_and_bounds():
+    from app.utils.auth_utils import calibrate_password_cost
+
+    assert calibrate_password_cost("bcrypt", target_ms=0.001, min_cost=4, max_cost=6) == 4
+    assert calibrate_password_cost("bcrypt", target_ms=10**6, min_cost=4, max_cost=6) == 6
+    assert 4 <= calibrate_password_cost("bcrypt", target_ms=50, min_cost=4, max_cost=31) <= 12
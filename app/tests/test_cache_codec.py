@@ -0,0 +1,47 @@
+import json
+import pytest
+from app.utils.cache_codec import MISSING, CacheCodec
+
+ORDER = {
+    "order_id": 7,
+    "customer_name": "testuser",
+    "order_status": "pending",
+    "total_price": 30.0,
+    "products": [{"product_id": i, "name": f"Product {i}", "price": 10.0, "quantity": 3} for i in range(3)],
+}
+
+@pytest.mark.parametrize("format", ["json", "orjson", "msgpack"])
+@pytest.mark.parametrize("compression", ["none", "zlib", "zstd"])
+def test_round_trip(format: str, compression: str):
+    codec = CacheCodec(format, compression, compress_min_size=0)
+    assert codec.decode(codec.encode(ORDER)) == ORDER
+
+def test_readers_decode_other_codecs():
+    writer = CacheCodec("msgpack", "zstd", compress_min_size=0)
+    reader = CacheCodec("json")
+    assert reader.decode(writer.encode(ORDER)) == ORDER
+
+def test_small_values_are_not_compressed():
+    codec = CacheCodec("json", "zlib", compress_min_size=10_000)
+    assert codec.encode(ORDER) == CacheCodec("json").encode(ORDER)
+
+def test_missing_and_legacy_entries():
+    codec = CacheCodec("msgpack")
+    assert codec.encode(None) == MISSING
+    assert codec.decode(MISSING) is None
+    # Values written before entries were tagged
+    assert codec.decode(json.dumps(ORDER).encode()) == ORDER
+    assert codec.decode(b"null") is None
+
+def test_unknown_option_is_rejected():
+    with pytest.raises(ValueError):
+        CacheCodec("pickle")
+
+@pytest.mark.parametrize("format", ["json", "orjson", "msgpack"])
+def test_json_bodies_round_trip(format: str):
+    body = json.dumps(ORDER, separators=(",", ":")).encode()
+    codec = CacheCodec(format, "zlib", compress_min_size=0)
+    assert json.loads(codec.decode_json(codec.encode_json(body))) == ORDER
+    # JSON formats store the body itself, so it comes back byte for byte
+    if format != "msgpack":
+        assert CacheCodec(format).decode_json(CacheCodec(format).encode_json(body)) == body
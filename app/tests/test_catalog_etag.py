@@ -0,0 +1,155 @@
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.core.models.product import Product
+from app.services.catalog_version import VERSION_KEY, CatalogVersion
+from app.utils.auth_utils import create_access_token
+from app.utils.responses import etag_matches
+
+@pytest.fixture
+def seed_rows():
+    return lambda session: session.add_all([Product(name=f"p{i}", price=10, quantity=100) for i in range(3)])
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+def test_unchanged_catalog_answers_304_without_queries(engine, client, assert_max_queries):
+    response = client.get("/products")
+    assert response.status_code == 200
+    assert [product["name"] for product in response.json()] == ["p0", "p1", "p2"]
+    assert response.headers["cache-control"].startswith("public, max-age=0")
+    etag = response.headers["etag"]
+
+    with assert_max_queries(engine, 0):
+        revalidated = client.get("/products", headers={"If-None-Match": etag})
+    assert revalidated.status_code == 304
+    assert revalidated.content == b""
+    assert revalidated.headers["etag"] == etag
+
+    detail = client.get("/products/2")
+    assert detail.json()["product_id"] == 2
+    assert detail.headers["etag"] != etag
+    assert client.get("/products/2", headers={"If-None-Match": detail.headers["etag"]}).status_code == 304
+    assert client.get("/products/99").status_code == 404
+
+def test_product_writes_change_the_etag(engine, client):
+    etag = client.get("/products").headers["etag"]
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'admin', 'user_id': 1})}"}
+    # Taking stock is a bulk UPDATE, which the mapper events do not see
+    order = {"products": [{"product_id": 1, "quantity": 5}]}
+    assert client.post("/orders", json=order, headers=headers).status_code == 200
+
+    response = client.get("/products", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()[0]["quantity"] == 95
+    assert response.headers["etag"] != etag
+
+def test_rejected_order_keeps_the_etag(engine, client):
+    etag = client.get("/products").headers["etag"]
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'admin', 'user_id': 1})}"}
+    order = {"products": [{"product_id": 1, "quantity": 1000}]}
+    assert client.post("/orders", json=order, headers=headers).status_code == 400
+    assert client.get("/products", headers={"If-None-Match": etag}).status_code == 304
+
+def test_versions_from_other_workers_never_go_backwards():
+    version = CatalogVersion()
+    newer = version.value + 10
+    version.adopt(newer, version.structure)
+    assert version.value == newer
+    # An older version may predate writes this worker has seen: move on instead
+    version.adopt(newer - 5, newer - 5)
+    assert version.value > newer
+    # ...and rebuild rather than trust a stock-only refresh
+    assert version.structure == version.value
+
+class VersionRedis:
+    """GET, the store script (emulated) and a queue-fed pub/sub connection."""
+
+    def __init__(self) -> None:
+        self.data = {}
+        self.published = []
+        self.messages = asyncio.Queue()
+        self.subscribed = asyncio.Event()
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def eval(self, script, numkeys, key, value, structure, channel, origin):
+        current = self.data.get(key)
+        if current is not None and int(current.split(b":")[0]) >= value:
+            return current
+        self.data[key] = f"{value}:{structure}".encode()
+        self.published.append(f"{origin}:{value}:{structure}".encode())
+        return None
+
+    def pubsub(self, **kwargs):
+        redis = self
+
+        class PubSub:
+            async def subscribe(self, channel):
+                redis.subscribed.set()
+
+            async def listen(self):
+                while True:
+                    yield {"data": await redis.messages.get()}
+
+            async def aclose(self):
+                pass
+
+        return PubSub()
+
+@pytest.mark.anyio
+async def test_workers_share_the_stored_version():
+    redis = VersionRedis()
+    first = CatalogVersion()
+    await first.load(redis)
+    assert redis.data[VERSION_KEY] == f"{first.value}:{first.structure}".encode()
+
+    # Started later, so its own version is newer, yet it takes the stored one
+    second = CatalogVersion()
+    await second.load(redis)
+    assert second.etag() == first.etag()
+
+    # A write in the first worker reaches workers that (re)load afterwards
+    first.bump()
+    await first.publish(redis)
+    await second.load(redis)
+    assert second.value == first.value
+
+    # A write whose publish failed is stored on reconnect, not overwritten
+    second.bump()
+    await second.load(redis)
+    assert redis.data[VERSION_KEY] == f"{second.value}:{second.structure}".encode()
+    # Publishing an overtaken version adopts the stored one
+    await first.publish(redis)
+    assert first.value == second.value
+
+@pytest.mark.anyio
+async def test_listener_skips_malformed_messages():
+    redis = VersionRedis()
+    version = CatalogVersion()
+    version.redis = redis
+    listener = asyncio.create_task(version.listen())
+    await redis.subscribed.wait()
+
+    newer = version.value + 10
+    for data in (b"other", b"other:1:x", f"other:{newer}:{newer}".encode()):
+        redis.messages.put_nowait(data)
+    while not redis.messages.empty():
+        await asyncio.sleep(0)
+    await asyncio.sleep(0)
+
+    assert not listener.done()
+    assert version.stats["errors"] == 2
+    assert version.value == newer
+    listener.cancel()
+    await asyncio.gather(listener, return_exceptions=True)
+
+def test_if_none_match_parsing():
+    assert etag_matches('"a", W/"b"', '"b"')
+    assert etag_matches("*", '"b"')
+    assert not etag_matches(None, '"b"')
+    assert not etag_matches('"a"', '"b"')
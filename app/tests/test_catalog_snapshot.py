@@ -0,0 +1,68 @@
+import orjson
+import pytest
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from app.database import Base
+from app.core.models.order import Order
+from app.core.models.product import Product
+from app.core.schemas.product_schema import ProductSchema
+from app.repositories.product_repository import AsyncProductRepository
+from app.services.catalog_snapshot import CatalogSnapshot, ProductCatalog
+from app.services.catalog_version import CatalogVersion
+
+ROWS = [(1, "tea", 300, 5), (4, 'say "hi"', 120, 0), (9, "cup", 950, 12)]
+
+@pytest.fixture
+async def session(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/snapshot.db")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with async_sessionmaker(bind=engine, expire_on_commit=False)() as session:
+        session.add_all([Product(product_id=i, name=n, price=p, quantity=q) for i, n, p, q in ROWS])
+        await session.commit()
+        yield session
+    await engine.dispose()
+
+def test_snapshot_bodies_match_the_schema():
+    snapshot = CatalogSnapshot.build(1, 1, ROWS)
+    expected = [ProductSchema(product_id=i, name=n, price=p, quantity=q).model_dump() for i, n, p, q in ROWS]
+    assert orjson.loads(snapshot.body) == expected
+    assert [orjson.loads(snapshot.product_body(i)) for i, *_ in ROWS] == expected
+    assert snapshot.product_body(2) is None and snapshot.product_body(10) is None
+    assert CatalogSnapshot.build(1, 1, []).body == b"[]"
+
+def test_stock_refresh_equals_a_rebuild():
+    snapshot = CatalogSnapshot.build(1, 1, ROWS)
+    # Lengths change both ways, so later offsets have to move
+    refreshed = snapshot.with_stock(2, [(1, 1000), (4, 0), (9, 3)])
+    rebuilt = CatalogSnapshot.build(2, 1, [(1, "tea", 300, 1000), (4, 'say "hi"', 120, 0), (9, "cup", 950, 3)])
+    assert refreshed.body == rebuilt.body
+    assert refreshed.offsets == rebuilt.offsets
+    assert refreshed.names is snapshot.names and refreshed.prices is snapshot.prices
+    # The old snapshot is untouched
+    assert orjson.loads(snapshot.product_body(1))["quantity"] == 5
+    assert snapshot.with_stock(3, [(1, 5), (9, 12)]) is None
+
+@pytest.mark.anyio
+async def test_catalog_refreshes_stock_and_rebuilds_on_other_changes(session):
+    version = CatalogVersion()
+    catalog = ProductCatalog(version)
+    repository = AsyncProductRepository(session)
+    first = await catalog.get(repository)
+    assert await catalog.get(repository) is first
+
+    await session.execute(update(Product).where(Product.product_id == 4).values(quantity=7))
+    await session.commit()
+    version.bump(stock_only=True)
+    snapshot = await catalog.get(repository)
+    assert orjson.loads(snapshot.product_body(4))["quantity"] == 7
+    assert snapshot.names is first.names
+
+    product = await session.get(Product, 9)
+    product.price = 1000
+    await session.commit()
+    version.bump()
+    snapshot = await catalog.get(repository)
+    assert orjson.loads(snapshot.product_body(9))["price"] == 1000
+    assert catalog.stats == {"hits": 1, "rebuilds": 2, "stock_refreshes": 1, "coalesced": 0}
@@ -0,0 +1,119 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.dependencies import get_idempotency_store
+from app.core.models.product import Product
+from app.core.exceptions.custom_exceptions import IdempotencyKeyInProgressError
+from app.services.idempotency import _BEGIN_SCRIPT, _RELEASE_SCRIPT, _SAVE_SCRIPT, IdempotencyStore
+from app.utils.auth_utils import create_access_token
+
+class MemoryRedis:
+    """Runs IdempotencyStore's scripts against a dict, without expiry."""
+
+    def __init__(self) -> None:
+        self.data = {}
+        self.round_trips = 0
+
+    async def eval(self, script, numkeys, *args):
+        self.round_trips += 1
+        keys, argv = args[:numkeys], args[numkeys:]
+        if script == _BEGIN_SCRIPT:
+            record_key, lock_key = keys
+            if record_key in self.data:
+                return self.data[record_key]
+            if lock_key in self.data:
+                return 0
+            self.data[lock_key] = argv[0]
+            return 1
+        if script == _SAVE_SCRIPT:
+            self.data[keys[0]] = argv[1]
+            lock_key = keys[1]
+        else:
+            assert script == _RELEASE_SCRIPT
+            lock_key = keys[0]
+        if self.data.get(lock_key) == argv[0]:
+            del self.data[lock_key]
+        return 0
+
+@pytest.fixture
+def redis():
+    return MemoryRedis()
+
+@pytest.fixture
+def seed_rows():
+    return lambda session: session.add(Product(name="tea", price=10, quantity=100))
+
+@pytest.fixture(autouse=True)
+def idempotency_store(redis):
+    app.dependency_overrides[get_idempotency_store] = lambda: IdempotencyStore(redis, ttl=60, lock_ttl=5, retry_after=2)
+    yield
+    app.dependency_overrides.pop(get_idempotency_store)
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+def headers(key: str) -> dict:
+    token = create_access_token({"sub": "admin", "user_id": 1})
+    return {"Authorization": f"Bearer {token}", "Idempotency-Key": key}
+
+ORDER = {"products": [{"product_id": 1, "quantity": 2}]}
+
+def test_retry_replays_the_first_response(engine, client, redis, assert_max_queries):
+    first = client.post("/orders", json=ORDER, headers=headers("k1"))
+    assert first.status_code == 200
+    round_trips = redis.round_trips
+    # Principal cached, response stored: a retry is one Redis round trip and no SQL
+    with assert_max_queries(engine, 0):
+        retry = client.post("/orders", json=ORDER, headers=headers("k1"))
+    assert redis.round_trips == round_trips + 1
+    assert retry.status_code == 200
+    assert retry.content == first.content
+    assert retry.headers["idempotent-replayed"] == "true"
+    # A new key is a new order
+    assert client.post("/orders", json=ORDER, headers=headers("k2")).json()["order_id"] == first.json()["order_id"] + 1
+
+def test_key_reused_for_another_request(engine, client):
+    assert client.post("/orders", json=ORDER, headers=headers("k1")).status_code == 200
+    other = {"products": [{"product_id": 1, "quantity": 3}]}
+    response = client.post("/orders", json=other, headers=headers("k1"))
+    assert response.status_code == 422
+    assert response.json()["error_type"] == "IdempotencyKeyReusedError"
+
+def test_concurrent_duplicate_is_refused(engine, client, redis):
+    redis.data["idempotency-lock:orders:create:1:k1"] = b"1"
+    response = client.post("/orders", json=ORDER, headers=headers("k1"))
+    assert response.status_code == 409
+    assert response.headers["retry-after"] == "2"
+
+def test_failed_request_releases_the_key(engine, client, redis):
+    too_many = {"products": [{"product_id": 1, "quantity": 1000}]}
+    assert client.post("/orders", json=too_many, headers=headers("k1")).status_code == 400
+    assert not redis.data
+    # Retried for real rather than refused as in progress
+    assert client.post("/orders", json=too_many, headers=headers("k1")).status_code == 400
+
+@pytest.mark.anyio
+async def test_key_saved_between_claims_is_replayed(redis):
+    store = IdempotencyStore(redis, ttl=60, lock_ttl=5, retry_after=2)
+    first = await store.begin("k1", b"f" * 32)
+    with pytest.raises(IdempotencyKeyInProgressError):
+        await store.begin("k1", b"f" * 32)
+    await first.save(200, b"{}")
+    # The lock is gone once the response is stored; the next claim must see the record
+    again = await store.begin("k1", b"f" * 32)
+    assert again.replay == (200, b"{}")
+    assert not again.locked
+
+@pytest.mark.anyio
+async def test_expired_claim_keeps_off_the_next_lock(redis):
+    store = IdempotencyStore(redis, ttl=60, lock_ttl=5, retry_after=2)
+    stale = await store.begin("k1", b"f" * 32)
+    # The first lock expired while its request ran; another request took the key
+    del redis.data[store.lock_key("k1")]
+    current = await store.begin("k1", b"f" * 32)
+    await stale.release()
+    assert redis.data[store.lock_key("k1")] == current.token
+    await stale.save(200, b"{}")
+    assert redis.data[store.lock_key("k1")] == current.token
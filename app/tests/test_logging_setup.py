@@ -0,0 +1,90 @@
+import io
+import json
+import logging
+import threading
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.utils.logging_setup import ACCESS_LOGGER, JSONFormatter, LoggingPipeline, SamplingFilter, configure_logging
+from app.utils.request_context import RequestIdMiddleware
+
+class BlockingHandler(logging.Handler):
+    """Holds the writer thread until released, so the queue can fill up."""
+
+    def __init__(self):
+        super().__init__()
+        self.gate = threading.Event()
+        self.records = []
+
+    def emit(self, record):
+        self.gate.wait()
+        self.records.append(record)
+
+def build_logger(name, handler, queue_size=100):
+    pipeline = LoggingPipeline([handler], queue_size)
+    logger = logging.getLogger(name)
+    logger.handlers = [pipeline.handler]
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    return logger, pipeline
+
+def test_records_carry_request_id_as_json():
+    stream = io.StringIO()
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(JSONFormatter())
+    logger, pipeline = build_logger("test.logging.json", handler)
+    pipeline.start()
+
+    app = FastAPI()
+    app.add_middleware(RequestIdMiddleware)
+
+    @app.get("/ping")
+    async def ping():
+        logger.info("pinged %s", 1)
+        return {}
+
+    with TestClient(app) as client:
+        response = client.get("/ping", headers={"X-Request-ID": "abc123"})
+        generated = client.get("/ping").headers["x-request-id"]
+    pipeline.stop()
+
+    assert response.headers["x-request-id"] == "abc123"
+    first, second = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert first["message"] == "pinged 1"
+    assert first["level"] == "INFO"
+    assert first["request_id"] == "abc123"
+    assert second["request_id"] == generated and len(generated) == 32
+
+def test_full_queue_drops_instead_of_blocking():
+    handler = BlockingHandler()
+    logger, pipeline = build_logger("test.logging.full", handler, queue_size=5)
+    pipeline.start()
+    for i in range(50):
+        logger.info("record %s", i)
+    stats = pipeline.stats()
+    handler.gate.set()
+    pipeline.stop()
+
+    # One record may be held by the writer thread, the rest fill the queue
+    assert stats["dropped"] >= 50 - 6
+    assert len(handler.records) + stats["dropped"] == 50
+
+def test_sampling_filter_keeps_a_fraction():
+    keep_all, keep_none, keep_some = SamplingFilter(1.0), SamplingFilter(0.0), SamplingFilter(0.25)
+    record = logging.makeLogRecord({"msg": "x"})
+    assert all(keep_all.filter(record) for _ in range(100))
+    assert not any(keep_none.filter(record) for _ in range(100))
+    kept = sum(keep_some.filter(record) for _ in range(4000))
+    assert 700 < kept < 1300
+
+def test_reconfiguring_replaces_the_sampling_filter():
+    root, access_logger = logging.getLogger(), logging.getLogger(ACCESS_LOGGER)
+    handlers, level, filters = root.handlers[:], root.level, access_logger.filters[:]
+    try:
+        for rate in (0.5, 0.5, 0.25):
+            configure_logging(log_file=None, access_sample_rate=rate).stop()
+        samplers = [f for f in access_logger.filters if isinstance(f, SamplingFilter)]
+        assert [sampler.rate for sampler in samplers] == [0.25]
+    finally:
+        root.handlers[:] = handlers
+        root.setLevel(level)
+        access_logger.filters[:] = filters
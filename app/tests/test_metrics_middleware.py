@@ -0,0 +1,45 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.utils.metrics_middleware import MetricsMiddleware, MetricsRegistry
+
+def build_client():
+    registry = MetricsRegistry()
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware, registry=registry)
+
+    @app.get("/items/{item_id}")
+    async def get_item(item_id: int):
+        assert registry.in_flight == 1
+        return {"item_id": item_id}
+
+    return TestClient(app), registry
+
+def test_series_are_keyed_by_route_template():
+    client, registry = build_client()
+    for item_id in range(5):
+        client.get(f"/items/{item_id}")
+    client.get("/items/not-a-number")
+    client.get("/unknown/1")
+    client.get("/unknown/2")
+
+    assert set(registry.routes) == {("GET", "/items/{item_id}"), ("GET", "<unmatched>")}
+    assert registry.routes[("GET", "/items/{item_id}")].statuses == {200: 5, 422: 1}
+    assert registry.routes[("GET", "<unmatched>")].statuses == {404: 2}
+    assert registry.in_flight == 0
+
+def test_unknown_methods_share_one_label():
+    client, registry = build_client()
+    for method in ("FOO", "BAR", "PROPFIND"):
+        client.request(method, "/unknown/1")
+        client.request(method, "/items/1")
+
+    assert set(registry.routes) == {("OTHER", "<unmatched>"), ("OTHER", "/items/{item_id}")}
+    assert registry.routes[("OTHER", "/items/{item_id}")].statuses == {405: 3}
+
+def test_renders_prometheus_histogram():
+    client, registry = build_client()
+    client.get("/items/1")
+    body = registry.render()
+    assert 'http_requests_total{method="GET",route="/items/{item_id}",status="200"} 1' in body
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/items/{item_id}",le="+Inf"} 1' in body
+    assert 'http_request_duration_seconds_count{method="GET",route="/items/{item_id}"} 1' in body
@@ -0,0 +1,140 @@
+import asyncio
+import pytest
+from redis import asyncio as aioredis
+from app.services.order_cache import OrderCache
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture
+async def order_cache():
+    # Nothing listens on this port: every lookup is a miss and every write fails fast
+    redis = aioredis.Redis(host="localhost", port=1, socket_connect_timeout=0.1)
+    yield OrderCache(redis, ttl=60, negative_ttl=5, key_version=3)
+    await redis.aclose()
+
+async def test_keys_are_versioned(order_cache: OrderCache):
+    assert order_cache.key(42) == "order:v3:42"
+
+async def test_concurrent_misses_share_one_load(order_cache: OrderCache):
+    calls = 0
+
+    async def loader():
+        nonlocal calls
+        calls += 1
+        # Long enough for every caller to fail its Redis read and join the load
+        await asyncio.sleep(0.3)
+        return b'{"order_id":1,"customer_name":"testuser"}'
+
+    results = await asyncio.gather(*(order_cache.get_or_load(1, loader) for _ in range(20)))
+    assert calls == 1
+    assert all(result == b'{"order_id":1,"customer_name":"testuser"}' for result in results)
+    assert order_cache.stats["misses"] == 1
+    assert order_cache.stats["coalesced"] == 19
+
+async def test_load_errors_reach_every_waiter(order_cache: OrderCache):
+    async def loader():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("database down")
+
+    results = await asyncio.gather(*(order_cache.get_or_load(1, loader) for _ in range(3)), return_exceptions=True)
+    assert all(isinstance(result, RuntimeError) for result in results)
+    # The failed load is not remembered; the next caller loads again
+    assert await order_cache.get_or_load(1, lambda: asyncio.sleep(0, result=None)) is None
+
+async def test_local_tier_serves_repeat_reads():
+    from app.utils.lru_cache import LRUCache
+
+    redis = aioredis.Redis(host="localhost", port=1, socket_connect_timeout=0.1)
+    order_cache = OrderCache(redis, ttl=60, negative_ttl=5, local=LRUCache(maxsize=10, ttl=30))
+    calls = 0
+
+    async def loader():
+        nonlocal calls
+        calls += 1
+        return b'{"order_id":1,"customer_name":"testuser"}'
+
+    first = await order_cache.get_or_load(1, loader)
+    second = await order_cache.get_or_load(1, loader)
+    assert calls == 1
+    assert order_cache.stats["local_hits"] == 1
+    # Hits hand out the stored body itself: immutable, no copy or re-encode
+    assert second is first
+
+    await order_cache.invalidate(1)
+    await order_cache.get_or_load(1, loader)
+    assert calls == 2
+    await redis.aclose()
+
+class QueuePubSub:
+    """Pub/sub connection that delivers whatever the test puts on `messages`."""
+
+    def __init__(self, messages: asyncio.Queue, subscribed: asyncio.Event) -> None:
+        self.messages = messages
+        self.subscribed = subscribed
+
+    async def subscribe(self, channel):
+        self.subscribed.set()
+
+    async def listen(self):
+        while True:
+            yield {"data": await self.messages.get()}
+
+    async def aclose(self):
+        pass
+
+async def test_listener_skips_malformed_messages():
+    from app.utils.lru_cache import LRUCache
+
+    messages, subscribed = asyncio.Queue(), asyncio.Event()
+    redis = aioredis.Redis(host="localhost", port=1, socket_connect_timeout=0.1)
+    redis.pubsub = lambda **kwargs: QueuePubSub(messages, subscribed)
+    order_cache = OrderCache(redis, ttl=60, negative_ttl=5, local=LRUCache(maxsize=10, ttl=30))
+    listener = asyncio.create_task(order_cache.listen())
+    await subscribed.wait()
+    order_cache.local.set(1, b"{}")
+    order_cache.local.set(2, b"{}")
+
+    for data in (b"other:not-a-number", b"\xff", b"other:2"):
+        messages.put_nowait(data)
+    while not messages.empty():
+        await asyncio.sleep(0)
+    await asyncio.sleep(0)
+
+    # The bad messages were counted and skipped; the listener kept going
+    assert not listener.done()
+    assert order_cache.stats["errors"] == 2
+    assert order_cache.local.get(1) == b"{}"
+    assert order_cache.local.get(2) is None
+    listener.cancel()
+    await asyncio.gather(listener, return_exceptions=True)
+    await redis.aclose()
+
+class RecordingPipeline:
+    """Pipeline that records the commands queued on it."""
+
+    def __init__(self, commands: list) -> None:
+        self.commands = commands
+
+    def set(self, key, value, ex=None):
+        self.commands.append(("set", key))
+
+    def publish(self, channel, message):
+        self.commands.append(("publish", message))
+
+    async def execute(self):
+        pass
+
+async def test_only_changes_are_published():
+    commands = []
+    redis = aioredis.Redis(host="localhost", port=1, socket_connect_timeout=0.1)
+    redis.pipeline = lambda **kwargs: RecordingPipeline(commands)
+    order_cache = OrderCache(redis, ttl=60, negative_ttl=5, key_version=3)
+
+    # Caching what a read returned leaves other workers' local copies alone
+    await order_cache.set_many({1: b"{}", 2: b"{}"})
+    assert commands == [("set", "order:v3:1"), ("set", "order:v3:2")]
+
+    commands.clear()
+    await order_cache.set_many({3: b"{}"}, publish=True)
+    assert commands == [("set", "order:v3:3"), ("publish", order_cache._peers.message(3))]
+    await redis.aclose()
@@ -0,0 +1,158 @@
+import pytest
+from contextlib import asynccontextmanager
+from redis import RedisError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.exceptions import InsufficientStockError
+from app.core.models.order import OrderStatus
+from app.core.models.order_event import OrderEvent, OrderEventType
+from app.core.models.product import Product
+from app.core.models.user import User
+from app.core.schemas.order_schema import OrderCreateSchema, OrderUpdateSchema
+from app.repositories.order_repository import AsyncOrderRepository
+from app.repositories.product_repository import AsyncProductRepository
+from app.services.order_events import _ACQUIRE_LEASE_SCRIPT, OutboxDispatcher
+from app.services.order_service import OrderService
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture
+async def db_session():
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+    from sqlalchemy.pool import StaticPool
+    from app.database import Base
+
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:", poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)() as session:
+        yield session
+    await engine.dispose()
+
+@pytest.fixture
+async def service(db_session: AsyncSession):
+    await AsyncProductRepository(db_session).create(Product(name="A", price=10, quantity=5))
+    return OrderService(repository=AsyncOrderRepository(db_session), db=db_session)
+
+@pytest.fixture
+def user():
+    return User(username="testuser", email="test@example.com", is_admin=True)
+
+def order(quantity):
+    return OrderCreateSchema(products=[{"product_id": 1, "quantity": quantity}])
+
+async def outbox(db_session):
+    result = await db_session.execute(select(OrderEvent).order_by(OrderEvent.event_id))
+    return [(e.event_type, e.order_id, e.old_status, e.new_status) for e in result.scalars()]
+
+class StreamRedis:
+    """Records XADDs made through pipelines; `fail` makes execute raise.
+
+    Runs the lease scripts against `leases` (no expiry: tests drop keys).
+    """
+
+    def __init__(self) -> None:
+        self.entries = []
+        self.fail = False
+        self.leases = {}
+
+    async def eval(self, script, numkeys, key, token, *args):
+        owner = self.leases.get(key)
+        if script == _ACQUIRE_LEASE_SCRIPT:
+            if owner is not None and owner != token:
+                return 0
+            self.leases[key] = token
+            return 1
+        if owner == token:
+            del self.leases[key]
+        return 0
+
+    def pipeline(self, transaction=True):
+        redis, pending = self, []
+
+        class Pipeline:
+            def xadd(self, name, fields, maxlen=None, approximate=True):
+                pending.append((name, fields))
+
+            async def execute(self):
+                if redis.fail:
+                    raise RedisError("connection lost")
+                redis.entries.extend(pending)
+
+        return Pipeline()
+
+async def test_order_changes_write_outbox_events(service: OrderService, db_session, user):
+    first_id = (await service.create_order(order(1), user)).order_id
+    await service.create_orders_bulk([order(1), order(1)], user)
+    await service.update_order(first_id, OrderUpdateSchema(order_status=OrderStatus.CONFIRMED), user)
+    await service.soft_delete_order(first_id, user)
+    with pytest.raises(InsufficientStockError):
+        await service.create_order(order(100), user)
+
+    assert await outbox(db_session) == [
+        (OrderEventType.CREATED, 1, None, OrderStatus.PENDING),
+        (OrderEventType.CREATED, 2, None, OrderStatus.PENDING),
+        (OrderEventType.CREATED, 3, None, OrderStatus.PENDING),
+        (OrderEventType.UPDATED, 1, OrderStatus.PENDING, OrderStatus.CONFIRMED),
+        (OrderEventType.CANCELLED, 1, OrderStatus.CONFIRMED, OrderStatus.CANCELLED),
+    ]
+    # Neither cancelling again nor an update without a status is a status change
+    await service.soft_delete_order(first_id, user)
+    await service.update_order(first_id, OrderUpdateSchema(), user)
+    assert len(await outbox(db_session)) == 5
+
+async def test_dispatcher_drains_in_batches_at_least_once(service: OrderService, db_session, user):
+    for _ in range(3):
+        await service.create_order(order(1), user)
+    redis = StreamRedis()
+    dispatcher = OutboxDispatcher(
+        asynccontextmanager(lambda: _yield(db_session)), redis, "order-events", batch_size=2, flush_interval=0
+    )
+
+    redis.fail = True
+    with pytest.raises(RedisError):
+        await dispatcher.dispatch_once()
+    # Nothing was acknowledged, so nothing left the outbox
+    assert len(await outbox(db_session)) == 3
+
+    redis.fail = False
+    assert await dispatcher.dispatch_once() == 2
+    assert await dispatcher.dispatch_once() == 1
+    assert await dispatcher.dispatch_once() == 0
+    assert await outbox(db_session) == []
+    assert [fields["order_id"] for _, fields in redis.entries] == [1, 2, 3]
+    assert redis.entries[0][1]["event_type"] == "created" and redis.entries[0][1]["old_status"] == ""
+    assert dispatcher.stats["dispatched"] == 3 and dispatcher.stats["lag_seconds"] == 0.0
+
+async def test_one_dispatcher_sends_at_a_time(service: OrderService, db_session, user):
+    order_ids = []
+    for _ in range(3):
+        order_ids.append((await service.create_order(order(1), user)).order_id)
+        await service.soft_delete_order(order_ids[-1], user)
+    redis = StreamRedis()
+    open_db = asynccontextmanager(lambda: _yield(db_session))
+    # Two workers' dispatchers over the same outbox and stream
+    first, second = (
+        OutboxDispatcher(open_db, redis, "order-events", batch_size=2, flush_interval=0) for _ in range(2)
+    )
+
+    assert await first.dispatch_if_leader() == 2
+    assert await second.dispatch_if_leader() == 0
+    assert (first.stats["leader"], second.stats["leader"]) == (1, 0)
+    # The leader stops; the other worker takes over from where it left off
+    await first.release()
+    assert await second.dispatch_if_leader() == 2
+    assert await first.dispatch_if_leader() == 0
+    assert await second.dispatch_if_leader() == 2
+    assert await second.dispatch_if_leader() == 0
+
+    sent = [(fields["event_id"], fields["order_id"], fields["event_type"]) for _, fields in redis.entries]
+    # Every event once, in event_id order: no order's cancellation before its creation
+    assert [event_id for event_id, _, _ in sent] == list(range(1, 7))
+    assert [(order_id, event_type) for _, order_id, event_type in sent] == [
+        (order_id, event_type) for order_id in order_ids for event_type in ("created", "cancelled")
+    ]
+
+async def _yield(session):
+    yield session
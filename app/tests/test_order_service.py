@@ -1,22 +1,50 @@
+import orjson
 import pytest
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.services.order_service import OrderService
-from app.core.schemas.order_schema import OrderCreateSchema
+from app.core.schemas.order_schema import OrderCreateSchema, OrderSchema, OrderUpdateSchema, encode_order
 from app.core.models.user import User
-from app.core.models.order import OrderStatus
+from app.core.models.order import Order, OrderStatus
 from app.core.models.product import Product
-from app.core.exceptions.custom_exceptions import ProductNotFoundError, InsufficientStockError
-from app.repositories.order_repository import OrderRepository
-from app.repositories.product_repository import ProductRepository
+from app.core.models.order_association import OrderProductAssociation
+from app.core.exceptions.custom_exceptions import (
+    ProductNotFoundError,
+    InsufficientStockError,
+    OrderNotFoundError,
+    OrderStatusChangeForbiddenError,
+    InvalidOrderStatusTransitionError,
+    OrderBatchRejectedError
+)
+from app.repositories.order_repository import OrderRepository, AsyncOrderRepository
+from app.repositories.product_repository import ProductRepository, AsyncProductRepository
+from app.repositories.threaded_repository import ThreadedRepository
+
+pytestmark = pytest.mark.anyio
 
 @pytest.fixture
-def db_session():
-    # Setup code for creating a test database session
+async def db_session():
+    # Setup code for creating an async test database session
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+    from sqlalchemy.pool import StaticPool
+    from app.database import Base
+
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:", poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    TestingSessionLocal = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+    async with TestingSessionLocal() as session:
+        yield session
+    await engine.dispose()
+
+@pytest.fixture
+def sync_session(tmp_path):
+    # Blocking session for the DB_ASYNC=False path, where calls hop between threadpool threads
     from sqlalchemy import create_engine
     from sqlalchemy.orm import sessionmaker
     from app.database import Base
 
-    engine = create_engine("sqlite:///:memory:")
+    engine = create_engine(f"sqlite:///{tmp_path}/sync.db", connect_args={"check_same_thread": False})
     TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
     Base.metadata.create_all(bind=engine)
     session = TestingSessionLocal()
@@ -24,38 +52,290 @@ def db_session():
     session.close()
 
 @pytest.fixture
-def order_service(db_session: Session):
-    repository = OrderRepository(db_session)
+def order_service(db_session: AsyncSession):
+    repository = AsyncOrderRepository(db_session)
     return OrderService(repository=repository, db=db_session)
 
 @pytest.fixture
-def product_repository(db_session: Session):
-    return ProductRepository(db_session)
+def product_repository(db_session: AsyncSession):
+    return AsyncProductRepository(db_session)
 
 @pytest.fixture
 def current_user():
     return User(username="testuser", email="test@example.com", is_admin=True)
 
-def test_create_order(order_service: OrderService, product_repository: ProductRepository, current_user: User):
+async def test_create_order(order_service: OrderService, product_repository: AsyncProductRepository, current_user: User):
     # Create a product in the test database
     product = Product(name="Test Product", price=100, quantity=10)
-    product_repository.create(product)
+    await product_repository.create(product)
 
     order_data = OrderCreateSchema(products=[{"product_id": product.product_id, "quantity": 2}])
-    order = order_service.create_order(order_data, current_user)
+    order = await order_service.create_order(order_data, current_user)
     assert order.customer_name == "testuser"
     assert order.order_status == OrderStatus.PENDING
 
-def test_create_order_product_not_found(order_service: OrderService, current_user: User):
+async def test_create_order_product_not_found(order_service: OrderService, current_user: User):
     order_data = OrderCreateSchema(products=[{"product_id": 999, "quantity": 2}])
     with pytest.raises(ProductNotFoundError):
-        order_service.create_order(order_data, current_user)
+        await order_service.create_order(order_data, current_user)
 
-def test_create_order_insufficient_stock(order_service: OrderService, product_repository: ProductRepository, current_user: User):
+async def test_create_order_insufficient_stock(order_service: OrderService, product_repository: AsyncProductRepository, current_user: User):
     # Create a product in the test database with insufficient stock
     product = Product(name="Test Product", price=100, quantity=1)
-    product_repository.create(product)
+    await product_repository.create(product)
 
     order_data = OrderCreateSchema(products=[{"product_id": product.product_id, "quantity": 1000}])
     with pytest.raises(InsufficientStockError):
-        order_service.create_order(order_data, current_user)
\ No newline at end of file
+        await order_service.create_order(order_data, current_user)
+
+async def test_create_order_insufficient_stock_sync_session(sync_session: Session, current_user: User):
+    ProductRepository(sync_session).create(Product(name="Test Product", price=100, quantity=1))
+    service = OrderService(repository=ThreadedRepository(OrderRepository(sync_session)), db=sync_session)
+
+    order_data = OrderCreateSchema(products=[{"product_id": 1, "quantity": 1000}])
+    with pytest.raises(InsufficientStockError) as exc_info:
+        await service.create_order(order_data, current_user)
+    assert exc_info.value.available == 1
+
+async def test_create_orders_bulk_partial(order_service: OrderService, product_repository: AsyncProductRepository, current_user: User):
+    await product_repository.create(Product(name="A", price=10, quantity=5))
+    await product_repository.create(Product(name="B", price=3, quantity=100))
+    batch = [
+        OrderCreateSchema(products=[{"product_id": 1, "quantity": 3}, {"product_id": 2, "quantity": 1}]),
+        OrderCreateSchema(products=[{"product_id": 1, "quantity": 3}]),  # only 2 left
+        OrderCreateSchema(products=[{"product_id": 999, "quantity": 1}]),
+        OrderCreateSchema(products=[{"product_id": 1, "quantity": 2}, {"product_id": 2, "quantity": 4}]),
+    ]
+    first, short, missing, last = await order_service.create_orders_bulk(batch, current_user, atomic=False)
+
+    assert first.total_price == 33 and last.total_price == 32
+    assert sorted((a.product_id, a.ordered_quantity) for a in last.order_associations) == [(1, 2), (2, 4)]
+    assert isinstance(short, InsufficientStockError) and short.available == 2
+    assert isinstance(missing, ProductNotFoundError)
+    product_repository.session.expire_all()
+    assert (await product_repository.get(1)).quantity == 0
+    assert (await product_repository.get(2)).quantity == 95
+
+async def test_create_orders_bulk_atomic_creates_nothing(order_service: OrderService, product_repository: AsyncProductRepository, current_user: User):
+    await product_repository.create(Product(name="A", price=10, quantity=5))
+    batch = [
+        OrderCreateSchema(products=[{"product_id": 1, "quantity": 1}]),
+        OrderCreateSchema(products=[{"product_id": 1, "quantity": 10}]),
+    ]
+    with pytest.raises(OrderBatchRejectedError) as exc_info:
+        await order_service.create_orders_bulk(batch, current_user)
+    assert list(exc_info.value.errors) == [1]
+    assert await order_service.repository.list_all() == []
+    product_repository.session.expire_all()
+    assert (await product_repository.get(1)).quantity == 5
+
+async def test_create_orders_bulk_sync_session(sync_session: Session, current_user: User):
+    ProductRepository(sync_session).create(Product(name="A", price=10, quantity=5))
+    service = OrderService(repository=ThreadedRepository(OrderRepository(sync_session)), db=sync_session)
+
+    batch = [OrderCreateSchema(products=[{"product_id": 1, "quantity": 1}]) for _ in range(3)]
+    orders = await service.create_orders_bulk(batch, current_user)
+    assert [order.order_id for order in orders] == [1, 2, 3]
+    sync_session.expire_all()
+    assert ProductRepository(sync_session).get(1).quantity == 2
+
+async def seed_export_orders(session, add_all):
+    products = [Product(product_id=i + 1, name=f"p{i}", price=10, quantity=100) for i in range(3)]
+    orders = [
+        Order(order_id=1, customer_name="testuser", order_status=OrderStatus.PENDING, total_price=30),
+        Order(order_id=2, customer_name="other", order_status=OrderStatus.CONFIRMED, total_price=10),
+        Order(order_id=3, customer_name="testuser", order_status=OrderStatus.CANCELLED, total_price=0),
+        Order(order_id=4, customer_name="testuser", order_status=OrderStatus.PENDING, total_price=20),
+    ]
+    orders[0].order_associations = [OrderProductAssociation(product=p, ordered_quantity=i + 1) for i, p in enumerate(products)]
+    orders[1].order_associations = [OrderProductAssociation(product=products[0], ordered_quantity=1)]
+    orders[3].order_associations = [OrderProductAssociation(product=p, ordered_quantity=2) for p in products[1:]]
+    await add_all(products + orders)
+
+async def test_export_orders_groups_lines_across_batches(order_service: OrderService, db_session: AsyncSession, current_user: User):
+    async def add_all(objects):
+        db_session.add_all(objects)
+        await db_session.commit()
+    await seed_export_orders(db_session, add_all)
+
+    # batch_size=2 splits the three lines of the first order over two batches
+    chunks = [chunk async for chunk in order_service.export_orders(current_user, batch_size=2)]
+    exported = [orjson.loads(line) for line in b"".join(chunks).splitlines()]
+    assert [order["order_id"] for order in exported] == [1, 2, 3, 4]
+    assert exported[0]["products"] == [{"product_id": p, "quantity": p} for p in (1, 2, 3)]
+    assert exported[2]["products"] == [] and exported[2]["order_status"] == "cancelled"
+
+    owner = User(username="testuser", email="t@example.com", is_admin=False)
+    csv_body = b"".join([chunk async for chunk in order_service.export_orders(
+        owner, fmt="csv", status_filter=OrderStatus.PENDING, batch_size=2
+    )]).decode()
+    assert csv_body.splitlines() == [
+        "order_id,customer_name,order_status,total_price,product_id,quantity",
+        "1,testuser,pending,30,1,1",
+        "1,testuser,pending,30,2,2",
+        "1,testuser,pending,30,3,3",
+        "4,testuser,pending,20,2,2",
+        "4,testuser,pending,20,3,2",
+    ]
+
+async def test_export_orders_sync_session(sync_session: Session, current_user: User):
+    async def add_all(objects):
+        sync_session.add_all(objects)
+        sync_session.commit()
+    await seed_export_orders(sync_session, add_all)
+    service = OrderService(repository=ThreadedRepository(OrderRepository(sync_session)), db=sync_session)
+
+    chunks = [chunk async for chunk in service.export_orders(current_user, min_price=20, batch_size=1)]
+    assert [orjson.loads(line)["order_id"] for line in b"".join(chunks).splitlines()] == [1, 4]
+
+async def test_get_orders_filters_in_query(order_service: OrderService, db_session: AsyncSession, current_user: User):
+    db_session.add_all([
+        Order(customer_name="testuser", order_status=OrderStatus.PENDING, total_price=50),
+        Order(customer_name="testuser", order_status=OrderStatus.CANCELLED, total_price=150),
+        Order(customer_name="testuser", order_status=OrderStatus.PENDING, total_price=250),
+        Order(customer_name="otheruser", order_status=OrderStatus.PENDING, total_price=150),
+    ])
+    await db_session.commit()
+
+    customer = User(username="testuser", email="test@example.com", is_admin=False)
+    orders = await order_service.get_orders(customer, status_filter=OrderStatus.PENDING, min_price=100)
+    assert [o.total_price for o in orders] == [250]
+
+    orders = await order_service.get_orders(current_user, max_price=150)
+    assert len(orders) == 3
+
+async def test_get_orders_keyset_pagination(order_service: OrderService, db_session: AsyncSession, current_user: User):
+    db_session.add_all([
+        Order(customer_name="testuser", order_status=OrderStatus.PENDING, total_price=i)
+        for i in range(5)
+    ])
+    await db_session.commit()
+
+    first_page = await order_service.get_orders(current_user, limit=2)
+    second_page = await order_service.get_orders(current_user, limit=2, after=first_page[-1].order_id)
+    last_page = await order_service.get_orders(current_user, limit=2, after=second_page[-1].order_id)
+    ids = [o.order_id for o in first_page + second_page + last_page]
+    assert ids == sorted(ids)
+    assert len(set(ids)) == 5
+
+async def test_get_many_for_update_returns_map(product_repository: AsyncProductRepository):
+    first = await product_repository.create(Product(name="First", price=10, quantity=5))
+    second = await product_repository.create(Product(name="Second", price=20, quantity=5))
+
+    products = await product_repository.get_many_for_update([second.product_id, first.product_id, 999])
+    assert list(products) == [first.product_id, second.product_id]
+
+async def test_create_order_merges_duplicate_lines(order_service: OrderService, product_repository: AsyncProductRepository, current_user: User):
+    product = Product(name="Test Product", price=100, quantity=3)
+    await product_repository.create(product)
+
+    # Each line fits on its own, together they exceed the stock
+    order_data = OrderCreateSchema(products=[
+        {"product_id": product.product_id, "quantity": 2},
+        {"product_id": product.product_id, "quantity": 2},
+    ])
+    with pytest.raises(InsufficientStockError) as exc_info:
+        await order_service.create_order(order_data, current_user)
+    assert exc_info.value.available == 3
+
+def test_reserve_stock_under_contention(tmp_path):
+    import threading
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from app.database import Base
+
+    engine = create_engine(
+        f"sqlite:///{tmp_path}/contention.db",
+        connect_args={"check_same_thread": False, "timeout": 30}
+    )
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    with SessionLocal() as session:
+        product = ProductRepository(session).create(Product(name="Hot Product", price=100, quantity=50))
+        product_id = product.product_id
+
+    threads_count, attempts = 8, 20
+    reserved = []
+
+    def checkout():
+        with SessionLocal() as session:
+            repository = ProductRepository(session)
+            for _ in range(attempts):
+                if repository.reserve_stock(product_id, 1):
+                    reserved.append(1)
+                session.commit()
+
+    threads = [threading.Thread(target=checkout) for _ in range(threads_count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    with SessionLocal() as session:
+        remaining = ProductRepository(session).get(product_id).quantity
+    assert len(reserved) == 50
+    assert remaining == 0
+    engine.dispose()
+
+async def test_create_order_survives_redis_outage(db_session: AsyncSession, product_repository: AsyncProductRepository, current_user: User):
+    from redis import asyncio as aioredis
+    from app.services.order_cache import OrderCache
+
+    # Nothing listens on this port, so every cache call fails fast
+    unreachable = aioredis.Redis(host="localhost", port=1, socket_connect_timeout=0.1)
+    order_cache = OrderCache(unreachable, ttl=60, negative_ttl=5)
+    service = OrderService(repository=AsyncOrderRepository(db_session), db=db_session, order_cache=order_cache)
+    product = await product_repository.create(Product(name="Test Product", price=100, quantity=10))
+
+    order_data = OrderCreateSchema(products=[{"product_id": product.product_id, "quantity": 2}])
+    order = await service.create_order(order_data, current_user)
+    assert order.total_price == 200
+    assert orjson.loads(await service.get_order(order.order_id, current_user))["total_price"] == 200
+    assert order_cache.stats["errors"] > 0
+    await unreachable.aclose()
+
+async def test_get_order_checks_owner(order_service: OrderService, db_session: AsyncSession):
+    from app.core.exceptions.custom_exceptions import UnauthorizedOrderAccessError
+
+    db_session.add(Order(customer_name="otheruser", order_status=OrderStatus.PENDING, total_price=10))
+    await db_session.commit()
+
+    customer = User(username="testuser", email="test@example.com", is_admin=False)
+    with pytest.raises(UnauthorizedOrderAccessError):
+        await order_service.get_order(1, customer)
+    with pytest.raises(OrderNotFoundError):
+        await order_service.get_order(2, customer)
+
+async def test_only_admins_change_order_status(order_service: OrderService, db_session: AsyncSession, current_user: User):
+    db_session.add(Order(customer_name="testuser", order_status=OrderStatus.PENDING, total_price=10))
+    await db_session.commit()
+
+    owner = User(username="testuser", email="test@example.com", is_admin=False)
+    with pytest.raises(OrderStatusChangeForbiddenError):
+        await order_service.update_order(1, OrderUpdateSchema(order_status=OrderStatus.CONFIRMED), owner)
+    # An update that leaves the status alone is still the owner's to make
+    assert (await order_service.update_order(1, OrderUpdateSchema(), owner)).order_status == OrderStatus.PENDING
+
+    order = await order_service.update_order(1, OrderUpdateSchema(order_status=OrderStatus.CONFIRMED), current_user)
+    assert order.order_status == OrderStatus.CONFIRMED
+
+async def test_cancelled_orders_stay_cancelled(order_service: OrderService, db_session: AsyncSession, current_user: User):
+    db_session.add(Order(customer_name="testuser", order_status=OrderStatus.PENDING, total_price=10))
+    await db_session.commit()
+    owner = User(username="testuser", email="test@example.com", is_admin=False)
+    await order_service.soft_delete_order(1, owner)
+
+    for status in (OrderStatus.PENDING, OrderStatus.CONFIRMED):
+        with pytest.raises(InvalidOrderStatusTransitionError):
+            await order_service.update_order(1, OrderUpdateSchema(order_status=status), current_user)
+        with pytest.raises(OrderStatusChangeForbiddenError):
+            await order_service.update_order(1, OrderUpdateSchema(order_status=status), owner)
+
+async def test_encoded_body_matches_schema(order_service: OrderService, product_repository: AsyncProductRepository, current_user: User):
+    product = await product_repository.create(Product(name="Test Product", price=100, quantity=10))
+    order_data = OrderCreateSchema(products=[{"product_id": product.product_id, "quantity": 2}])
+    order = await order_service.create_order(order_data, current_user)
+
+    assert orjson.loads(encode_order(order)) == OrderSchema.model_validate(order).model_dump(mode="json")
+    # Served from the per-request memo the second time
+    assert order_service.encode(order) is order_service.encode(order)
@@ -0,0 +1,111 @@
+import pytest
+from datetime import date, datetime, timezone
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.models.order import OrderStatus
+from app.core.models.order_stats import ALL_DAYS, ALL_PRODUCTS, OrderStat
+from app.core.models.product import Product
+from app.core.models.user import User
+from app.core.schemas.order_schema import OrderCreateSchema, OrderUpdateSchema
+from app.repositories.order_repository import AsyncOrderRepository
+from app.repositories.order_stats_repository import AsyncOrderStatsRepository
+from app.repositories.product_repository import AsyncProductRepository
+from app.services.order_service import OrderService
+from app.services.order_stats import add_order_deltas
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture
+async def db_session():
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+    from sqlalchemy.pool import StaticPool
+    from app.database import Base
+
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:", poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)() as session:
+        yield session
+    await engine.dispose()
+
+@pytest.fixture
+async def service(db_session: AsyncSession):
+    products = AsyncProductRepository(db_session)
+    await products.create(Product(name="A", price=10, quantity=100))
+    await products.create(Product(name="B", price=3, quantity=100))
+    return OrderService(repository=AsyncOrderRepository(db_session), db=db_session)
+
+@pytest.fixture
+def user():
+    return User(username="testuser", email="test@example.com", is_admin=True)
+
+def order(*lines):
+    return OrderCreateSchema(products=[{"product_id": p, "quantity": q} for p, q in lines])
+
+def totals(stats):
+    return {row.order_status: (row.order_count, row.total_price, row.quantity) for row in stats.statuses}
+
+def test_deltas_split_by_day_and_product():
+    created_at = datetime(2026, 3, 1, 23, 30, tzinfo=timezone.utc)
+    deltas = add_order_deltas({}, OrderStatus.PENDING, created_at, 50, {1: 2, 2: 3})
+    assert deltas == {
+        (ALL_DAYS, ALL_PRODUCTS, OrderStatus.PENDING): [1, 50, 5],
+        (date(2026, 3, 1), ALL_PRODUCTS, OrderStatus.PENDING): [1, 50, 5],
+        (ALL_DAYS, 1, OrderStatus.PENDING): [1, 0, 2],
+        (ALL_DAYS, 2, OrderStatus.PENDING): [1, 0, 3],
+    }
+    # Removing the same order cancels out
+    add_order_deltas(deltas, OrderStatus.PENDING, created_at, 50, {1: 2, 2: 3}, sign=-1)
+    assert all(values == [0, 0, 0] for values in deltas.values())
+
+async def test_stats_follow_create_cancel_and_bulk(service: OrderService, db_session: AsyncSession, user: User):
+    first = await service.create_order(order((1, 2), (2, 1)), user)
+    await service.create_order(order((2, 4)), user)
+    await service.create_orders_bulk([order((1, 1)), order((1, 1), (2, 1))], user)
+    await service.soft_delete_order(first.order_id, user)
+    # Cancelling twice must not move the totals again
+    await service.soft_delete_order(first.order_id, user)
+
+    stats = await service.get_stats(by_day=True, by_product=True)
+    assert totals(stats) == {
+        OrderStatus.PENDING: (3, 12 + 10 + 13, 4 + 1 + 2),
+        OrderStatus.CANCELLED: (1, 23, 3),
+    }
+    today = datetime.now(timezone.utc).date()
+    assert {(row.day, row.order_status, row.order_count) for row in stats.days} == {
+        (today, OrderStatus.PENDING, 3), (today, OrderStatus.CANCELLED, 1)
+    }
+    assert (stats.products[0].product_id, stats.products[0].quantity) == (2, 5)
+    assert await AsyncOrderStatsRepository(db_session).rebuild(dry_run=True) == {}
+
+async def test_stats_follow_status_updates(service: OrderService, db_session: AsyncSession, user: User):
+    first = await service.create_order(order((1, 2)), user)
+    await service.create_order(order((2, 1)), user)
+    await service.update_order(first.order_id, OrderUpdateSchema(order_status=OrderStatus.CONFIRMED), user)
+    # No status in the update: the totals stay put
+    await service.update_order(first.order_id, OrderUpdateSchema(), user)
+
+    stats = await service.get_stats(by_product=True)
+    assert totals(stats) == {
+        OrderStatus.PENDING: (1, 3, 1),
+        OrderStatus.CONFIRMED: (1, 20, 2),
+    }
+    assert {(row.product_id, row.order_status, row.quantity) for row in stats.products} == {
+        (1, OrderStatus.CONFIRMED, 2), (2, OrderStatus.PENDING, 1)
+    }
+    assert await AsyncOrderStatsRepository(db_session).rebuild(dry_run=True) == {}
+
+async def test_rebuild_repairs_drift(service: OrderService, db_session: AsyncSession, user: User):
+    await service.create_order(order((1, 2)), user)
+    await service.create_order(order((1, 1)), user)
+    await db_session.execute(update(OrderStat).filter(OrderStat.product_id == 1).values(quantity=99))
+    await db_session.commit()
+
+    repository = AsyncOrderStatsRepository(db_session)
+    drift = await repository.rebuild(dry_run=True)
+    # Product rows are not sharded, so the corrupted row is the whole total
+    assert drift == {(ALL_DAYS, 1, OrderStatus.PENDING): ([2, 0, 99], [2, 0, 3])}
+    assert await repository.rebuild() == drift
+    assert await repository.rebuild(dry_run=True) == {}
+    assert totals(await service.get_stats()) == {OrderStatus.PENDING: (2, 30, 3)}
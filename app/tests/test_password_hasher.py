@@ -0,0 +1,26 @@
+import asyncio
+import pytest
+from app.core.exceptions.custom_exceptions import PasswordHashingBusyError
+from app.services.password_hasher import PasswordHasher
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture
+def password_hasher():
+    hasher = PasswordHasher(workers=1, max_pending=2, retry_after=3)
+    yield hasher
+    hasher.shutdown()
+
+async def test_hash_and_verify_in_pool(password_hasher: PasswordHasher):
+    hashed = await password_hasher.hash("password")
+    # Current scheme and cost: verified, nothing to re-hash
+    assert await password_hasher.verify_and_update("password", hashed) == (True, None)
+    assert (await password_hasher.verify_and_update("wrong", hashed))[0] is False
+    assert password_hasher.pending == 0
+
+async def test_rejects_when_backlog_is_full(password_hasher: PasswordHasher):
+    results = await asyncio.gather(*(password_hasher.hash("password") for _ in range(4)), return_exceptions=True)
+    rejected = [result for result in results if isinstance(result, PasswordHashingBusyError)]
+    assert len(rejected) == 2
+    assert rejected[0].retry_after == 3
+    assert password_hasher.stats == {"completed": 2, "rejected": 2}
@@ -0,0 +1,96 @@
+import tracemalloc
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.models.order import Order  # registers the orders table for create_all
+from app.core.models.product import Product
+from app.repositories.product_repository import AsyncProductRepository
+from app.services.product_import import ProductImportFormatError, iter_lines, iter_records
+from app.services.product_service import ProductService
+
+pytestmark = pytest.mark.anyio
+
+async def stream(data: bytes, chunk_size: int = 7):
+    # Small chunks put record and UTF-8 sequence boundaries mid-chunk
+    for start in range(0, len(data), chunk_size):
+        yield data[start:start + chunk_size]
+
+async def records(data: bytes, fmt: str, max_line_bytes: int = 1024):
+    return [record async for record in iter_records(iter_lines(stream(data), max_line_bytes), fmt, max_line_bytes)]
+
+@pytest.fixture
+async def db_session():
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+    from sqlalchemy.pool import StaticPool
+    from app.database import Base
+
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:", poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with async_sessionmaker(bind=engine, expire_on_commit=False)() as session:
+        yield session
+    await engine.dispose()
+
+async def test_csv_records_span_quoted_newlines():
+    data = '﻿name,price,quantity\n"Café, ""large""\nedition",10,5\r\nplain,3\n\nlast,1,2'.encode()
+    assert await records(data, "csv") == [
+        (2, {"name": 'Café, "large"\nedition', "price": "10", "quantity": "5"}),
+        (4, "Expected 3 columns, got 2"),
+        (6, {"name": "last", "price": "1", "quantity": "2"}),
+    ]
+
+async def test_ndjson_records_report_bad_lines():
+    data = b'{"name": "a", "price": 1, "quantity": 2}\nnot json\n[1]\n'
+    result = await records(data, "ndjson")
+    assert result[0] == (1, {"name": "a", "price": 1, "quantity": 2})
+    assert result[1][0] == 2 and result[1][1].startswith("Invalid JSON")
+    assert result[2] == (3, "Expected a JSON object")
+
+async def test_overlong_line_is_rejected():
+    with pytest.raises(ProductImportFormatError):
+        await records(b'name,price,quantity\n"' + b"x" * 5000, "csv", max_line_bytes=1024)
+
+async def test_parser_memory_does_not_grow_with_input():
+    async def catalog(rows: int):
+        yield b"name,price,quantity\n"
+        for start in range(0, rows, 1000):
+            yield "".join(f"product {i},{i % 100},{i % 7}\n" for i in range(start, start + 1000)).encode()
+
+    async def peak(rows: int) -> int:
+        tracemalloc.start()
+        count = 0
+        async for _ in iter_records(iter_lines(catalog(rows), 1024), "csv", 1024):
+            count += 1
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        assert count == rows
+        return peak
+
+    small, large = await peak(2_000), await peak(40_000)
+    assert large < small * 1.5
+
+async def test_import_upserts_in_batches(db_session: AsyncSession):
+    repository = AsyncProductRepository(db_session)
+    await repository.create(Product(name="old", price=1, quantity=1))
+    service = ProductService(repository=repository, db=db_session)
+    data = (
+        "product_id,name,price,quantity\n"
+        "1,renamed,5,50\n"
+        ",new a,2,3\n"
+        ",bad,-1,3\n"
+        "10,explicit,7,8\n"
+        ",new b,4,4\n"
+    ).encode()
+    progress = []
+    report = await service.import_products(
+        stream(data), "csv", batch_size=2, on_progress=lambda r: progress.append(r.imported)
+    )
+
+    assert (report.rows, report.imported, report.failed, report.batches) == (5, 4, 1, 2)
+    assert report.errors[0].line == 4 and "price" in report.errors[0].error
+    assert progress == [2, 4]
+    db_session.expire_all()
+    products = {p.product_id: (p.name, p.price, p.quantity) for p in await repository.list_all()}
+    assert products[1] == ("renamed", 5, 50)
+    assert products[10] == ("explicit", 7, 8)
+    assert sorted(name for name, _, _ in products.values()) == ["explicit", "new a", "new b", "renamed"]
@@ -0,0 +1,119 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.core.models.order import Order, OrderStatus
+from app.core.models.order_association import OrderProductAssociation
+from app.core.models.product import Product
+from app.core.models.user import User
+from app.utils.auth_utils import create_access_token
+
+ORDERS, LINES = 20, 5
+
+@pytest.fixture
+def seed_rows():
+    def seed(session):
+        products = [Product(name=f"p{i}", price=10, quantity=100) for i in range(LINES)]
+        session.add_all(products)
+        session.flush()
+        for _ in range(ORDERS):
+            order = Order(customer_name="admin", order_status=OrderStatus.PENDING, total_price=50)
+            order.order_associations = [
+                OrderProductAssociation(product_id=p.product_id, ordered_quantity=1) for p in products
+            ]
+            session.add(order)
+    return seed
+
+@pytest.fixture
+def client():
+    # No lifespan, hence no order cache: every read reaches the database
+    return TestClient(app)
+
+@pytest.fixture
+def headers():
+    token = create_access_token({"sub": "admin", "user_id": 1})
+    return {"Authorization": f"Bearer {token}"}
+
+def test_list_orders_query_count(engine, client, headers, assert_max_queries):
+    # user lookup + orders + associations joined to products
+    with assert_max_queries(engine, 3):
+        response = client.get("/orders", headers=headers)
+    assert response.status_code == 200
+    assert len(response.json()) == ORDERS
+    assert all(len(order["products"]) == LINES for order in response.json())
+
+def test_get_order_query_count(engine, client, headers, assert_max_queries):
+    with assert_max_queries(engine, 3):
+        response = client.get("/orders/1", headers=headers)
+    assert response.status_code == 200
+    assert len(response.json()["products"]) == LINES
+
+def test_repeat_requests_skip_user_lookup(engine, client, headers, assert_max_queries):
+    client.get("/orders/1", headers=headers)
+    # Principal served from the cache: only the order itself is loaded
+    with assert_max_queries(engine, 2) as statements:
+        response = client.get("/orders/1", headers=headers)
+    assert response.status_code == 200
+    assert not any("FROM users" in statement for statement in statements)
+
+def test_user_update_evicts_principal(engine, client, headers):
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session as SyncSession
+
+    assert client.get("/orders/1", headers=headers).status_code == 200
+    with SyncSession(create_engine(engine.url.set(drivername="sqlite"))) as session:
+        user = session.get(User, 1)
+        user.is_admin = 0
+        user.username = "renamed"
+        session.commit()
+    # The order belongs to "admin"; the demoted, renamed principal may no longer read it
+    assert client.get("/orders/1", headers=headers).status_code == 403
+
+def test_batch_create_query_count(engine, client, headers, assert_max_queries):
+    batch = {"orders": [
+        {"products": [{"product_id": p, "quantity": 1} for p in range(1, LINES + 1)]} for _ in range(50)
+    ]}
+    # user lookup + locking product read + stock UPDATE + order_stats upsert + orders INSERT
+    # + lines INSERT + outbox INSERT + reload (orders, lines joined to products); executemany
+    # counts once. SQLite cannot return ids in input order from one INSERT, so order rows go one by one
+    with assert_max_queries(engine, 9 + 50) as statements:
+        response = client.post("/orders/batch", json=batch, headers=headers)
+    assert response.status_code == 200
+    assert len([s for s in statements if not s.startswith("INSERT INTO orders ")]) <= 8
+    body = response.json()
+    assert body["created"] == 50 and body["failed"] == 0
+    assert [item["order"]["order_id"] for item in body["results"]] == list(range(ORDERS + 1, ORDERS + 51))
+
+def test_batch_create_atomic_rejection(engine, client, headers):
+    batch = {"orders": [
+        {"products": [{"product_id": 1, "quantity": 1}]},
+        {"products": [{"product_id": 1, "quantity": 1000}]},
+    ]}
+    response = client.post("/orders/batch", json=batch, headers=headers)
+    assert response.status_code == 409
+    assert response.json()["errors"] == [{
+        "index": 1,
+        "error_type": "InsufficientStockError",
+        "detail": "Not enough stock for product 1. Available: 99",
+        "product_id": 1,
+        "available": 99,
+    }]
+    partial = client.post("/orders/batch", json={**batch, "atomic": False}, headers=headers).json()
+    assert (partial["created"], partial["failed"]) == (1, 1)
+    assert partial["results"][1]["status"] == "failed"
+
+def test_export_streams_one_query(engine, client, headers, assert_max_queries):
+    # user lookup + one streamed SELECT over orders joined to their lines
+    with assert_max_queries(engine, 2):
+        with client.stream("GET", "/orders/export?format=csv", headers=headers) as response:
+            lines = list(response.iter_lines())
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert len(lines) == 1 + ORDERS * LINES
+
+def test_stats_read_does_not_scan_orders(engine, client, headers, assert_max_queries):
+    # user lookup + one aggregate over the order_stats total rows
+    with assert_max_queries(engine, 2) as statements:
+        response = client.get("/orders/stats", headers=headers)
+    assert response.status_code == 200
+    assert not any("FROM orders" in statement for statement in statements)
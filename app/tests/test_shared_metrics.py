@@ -0,0 +1,75 @@
+import os
+from app.utils.shared_metrics import RETIRED_PID, SharedMetricsRegistry
+
+SERIES = [("ANY", "<unmatched>"), ("GET", "/items/{item_id}")]
+
+def test_workers_aggregate_through_the_shared_file(tmp_path):
+    path = str(tmp_path / "metrics")
+    first = SharedMetricsRegistry(path, SERIES, max_workers=4)
+    second = SharedMetricsRegistry(path, SERIES, max_workers=4)
+    first.attach()
+    second.attach()
+    # Slots are claimed per registry, so two in one process stand in for two workers
+    assert second._base != first._base
+
+    first.observe("GET", "/items/{item_id}", 200, 0.002)
+    second.observe("GET", "/items/{item_id}", 404, 0.003)
+    second.observe("POST", "/nowhere", 404, 0.001)
+    first.in_flight += 1
+
+    body = first.render()
+    assert 'http_requests_total{method="GET",route="/items/{item_id}",status="2xx"} 1' in body
+    assert 'http_requests_total{method="GET",route="/items/{item_id}",status="4xx"} 1' in body
+    assert 'http_request_duration_seconds_count{method="GET",route="/items/{item_id}"} 2' in body
+    assert 'http_request_duration_seconds_count{method="ANY",route="<unmatched>"} 1' in body
+    assert "http_requests_in_flight 1" in body
+
+def test_dead_worker_counts_are_retired_on_restart(tmp_path):
+    path = str(tmp_path / "metrics")
+    registry = SharedMetricsRegistry(path, SERIES, max_workers=1)
+    registry.attach()
+    registry.observe("GET", "/items/{item_id}", 200, 0.002)
+    registry.in_flight = 3
+    # Pretend the owner exited: no live process has this pid
+    registry.words[registry._base] = 2 ** 22 + 12345
+
+    restarted = SharedMetricsRegistry(path, SERIES, max_workers=1)
+    restarted.attach()
+    assert restarted.words[restarted._base] == os.getpid()
+    assert restarted.words[restarted._slot_base(0)] == RETIRED_PID
+    body = restarted.render()
+    assert 'http_request_duration_seconds_count{method="GET",route="/items/{item_id}"} 1' in body
+    assert "http_requests_in_flight 0" in body
+
+def test_layout_change_replaces_the_file(tmp_path):
+    path = str(tmp_path / "metrics")
+    previous = SharedMetricsRegistry(path, SERIES, max_workers=2)
+    previous.attach()
+    previous.observe("GET", "/items/{item_id}", 200, 0.002)
+    registry = SharedMetricsRegistry(path, SERIES + [("GET", "/other")], max_workers=2)
+    registry.attach()
+    assert "http_request_duration_seconds_count" not in registry.render()
+    # The previous deployment keeps its own, untouched mapping
+    previous.observe("GET", "/items/{item_id}", 200, 0.002)
+    assert 'http_request_duration_seconds_count{method="GET",route="/items/{item_id}"} 2' in previous.render()
+    assert not os.path.exists(f"{path}.{os.getpid()}.tmp")
+
+def test_forked_children_take_no_slot(tmp_path):
+    registry = SharedMetricsRegistry(str(tmp_path / "metrics"), SERIES, max_workers=2)
+    registry.attach()
+    # Like a bcrypt pool worker: forked from a serving process, never attached
+    child = os.fork()
+    if child == 0:
+        os._exit(0)
+    os.waitpid(child, 0)
+    owners = [registry.words[registry._slot_base(slot)] for slot in range(registry.slots)]
+    assert owners == [RETIRED_PID, os.getpid(), 0]
+
+def test_unattached_registry_records_nothing(tmp_path):
+    registry = SharedMetricsRegistry(str(tmp_path / "metrics"), SERIES, max_workers=1)
+    # e.g. a request served before the lifespan attached the registry
+    registry.in_flight += 1
+    registry.observe("GET", "/items/{item_id}", 200, 0.002)
+    assert registry.in_flight == 0
+    assert "http_requests_in_flight 0" in registry.render()
+    assert not os.path.exists(tmp_path / "metrics")
@@ -0,0 +1,38 @@
+import asyncio
+import pytest
+from app.utils.single_flight import SingleFlight
+
+pytestmark = pytest.mark.anyio
+
+async def test_concurrent_callers_share_one_load():
+    flight = SingleFlight()
+    calls = 0
+
+    async def load():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return calls
+
+    results = await asyncio.gather(*(flight.run("key", load) for _ in range(5)))
+    assert results == [1] * 5
+    assert "key" not in flight
+    # Nothing is remembered once the load finished
+    assert await flight.run("key", load) == 2
+
+async def test_cancelled_follower_leaves_the_load_running():
+    flight = SingleFlight()
+    release = asyncio.Event()
+
+    async def load():
+        await release.wait()
+        return "done"
+
+    leader = asyncio.create_task(flight.run("key", load))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(flight.run("key", load))
+    await asyncio.sleep(0)
+    follower.cancel()
+    release.set()
+    assert await leader == "done"
+    assert follower.cancelled()
@@ -0,0 +1,50 @@
+from datetime import timedelta
+import time
+import pytest
+from jose import JWTError
+from app.services.token_cache import TokenCache
+from app.utils.auth_utils import create_access_token
+
+def test_repeat_decodes_are_served_from_cache():
+    cache = TokenCache(maxsize=10)
+    token = create_access_token({"sub": "testuser", "user_id": 1})
+    assert cache.decode(token)["sub"] == "testuser"
+    claims = cache.decode(token)
+    claims["sub"] = "mutated"
+    assert cache.decode(token)["sub"] == "testuser"
+    report = cache.report()
+    assert (report["hits"], report["misses"]) == (2, 1)
+    assert report["hit_rate"] == pytest.approx(2 / 3)
+
+def test_invalid_and_expired_tokens_are_not_cached():
+    cache = TokenCache(maxsize=10)
+    expired = create_access_token({"sub": "testuser"}, expires_delta=timedelta(seconds=-1))
+    for token in (expired, "not-a-token"):
+        for _ in range(2):
+            with pytest.raises(JWTError):
+                cache.decode(token)
+    assert len(cache.verified) == 0
+
+def test_revoked_tokens_are_refused():
+    cache = TokenCache(maxsize=10)
+    token = create_access_token({"sub": "testuser"})
+    cache.decode(token)
+    cache.revoke(token)
+    with pytest.raises(JWTError):
+        cache.decode(token)
+
+def test_revocations_outlive_the_cache_size(monkeypatch):
+    cache = TokenCache(maxsize=2)
+    tokens = [create_access_token({"sub": f"user{index}"}) for index in range(5)]
+    for token in tokens:
+        cache.revoke(token)
+    # Revoking more tokens than maxsize must not let the first ones back in
+    for token in tokens:
+        with pytest.raises(JWTError):
+            cache.decode(token)
+
+    # Once the tokens have expired their revocations are dropped
+    expired_at = time.time() + timedelta(days=1).total_seconds()
+    monkeypatch.setattr("app.services.token_cache.time.time", lambda: expired_at)
+    cache.revoke(create_access_token({"sub": "later"}, expires_delta=timedelta(days=2)))
+    assert len(cache.revoked) == 1
@@ -1,6 +1,10 @@
+import math
+import time
 from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
 from jose import jwt
 from passlib.context import CryptContext
+from passlib.hash import argon2
 
 from app.config import settings
 
@@ -10,9 +14,64 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# Per scheme: the passlib cost option, the cost trial hashes are timed at,
+# whether time grows exponentially (bcrypt: 2**rounds) or linearly in it, and
+# the default bounds for a calibrated cost
+_COST_OPTIONS = {
+    "bcrypt": ("rounds", 8, True, (10, 14)),
+    "argon2": ("time_cost", 1, False, (1, 10)),
+}
+
+def configure_password_context(scheme: str, cost: Optional[int] = None) -> None:
+    """Hash new passwords with `scheme` at `cost` (passlib's default when None).
+
+    Hashes of the other scheme, or of this scheme below `cost`, still verify
+    but report needs_update, so logins migrate them. Stronger hashes are left
+    alone: pods calibrated on faster hardware must not be downgraded.
+    """
+    if scheme not in _COST_OPTIONS:
+        raise ValueError(f"Unsupported password hash scheme: {scheme}")
+    if scheme == "argon2" and not argon2.has_backend():
+        raise ValueError("The argon2 password scheme requires the argon2-cffi package")
+    option = _COST_OPTIONS[scheme][0]
+    schemes = [scheme] + [other for other in ("bcrypt", "argon2") if other != scheme]
+    if not argon2.has_backend():
+        schemes.remove("argon2")
+    cost_options = {} if cost is None else {f"{scheme}__default_{option}": cost, f"{scheme}__min_{option}": cost}
+    pwd_context.update(schemes=schemes, default=scheme, deprecated="auto", **cost_options)
+
+def calibrate_password_cost(
+    scheme: str,
+    target_ms: float,
+    min_cost: Optional[int] = None,
+    max_cost: Optional[int] = None,
+    trials: int = 3
+) -> int:
+    """Return the highest cost whose hash time stays within `target_ms` on this machine.
+
+    Times a few cheap trial hashes and extrapolates, clamped to
+    [min_cost, max_cost] (per-scheme defaults when None).
+    """
+    option, trial_cost, exponential, (default_min, default_max) = _COST_OPTIONS[scheme]
+    min_cost = default_min if min_cost is None else min_cost
+    max_cost = default_max if max_cost is None else max_cost
+    context = CryptContext(schemes=[scheme], **{f"{scheme}__{option}": trial_cost})
+    elapsed = math.inf
+    for _ in range(trials):
+        start = time.perf_counter()
+        context.hash("calibration")
+        elapsed = min(elapsed, (time.perf_counter() - start) * 1000)
+    ratio = max(target_ms / elapsed, 1e-9)
+    cost = trial_cost + math.floor(math.log2(ratio)) if exponential else math.floor(trial_cost * ratio)
+    return max(min_cost, min(max_cost, cost))
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verify, and return a fresh hash when the stored one uses an outdated scheme or cost."""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
@@ -0,0 +1,134 @@
+import json
+import zlib
+from typing import Any, Callable, Dict, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speed-up
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional speed-up
+    msgpack = None
+
+try:
+    import zstandard as zstd
+except ImportError:  # pragma: no cover - optional speed-up
+    try:
+        from backports import zstd
+    except ImportError:
+        zstd = None
+
+# Every stored value starts with one tag byte: the low nibble names the
+# serializer, the high nibble the compression. Readers decode any tag they
+# know, whatever codec they write with, so workers running different
+# ORDER_CACHE_CODEC settings can share Redis during a rollout.
+FORMATS = {"json": 1, "orjson": 2, "msgpack": 3}
+COMPRESSIONS = {"none": 0, "zlib": 1, "zstd": 2}
+
+# Tag 0 marks a cached "not found"; it never collides with a serialized value
+MISSING = b"\x00"
+
+def _json_dumps(data: Any) -> bytes:
+    return json.dumps(data, separators=(",", ":")).encode()
+
+def _orjson_dumps(data: Any) -> bytes:
+    return orjson.dumps(data) if orjson is not None else _json_dumps(data)
+
+def _orjson_loads(payload: bytes) -> Any:
+    # orjson writes plain JSON, so readers without it can still decode
+    return orjson.loads(payload) if orjson is not None else json.loads(payload)
+
+def _msgpack_dumps(data: Any) -> bytes:
+    return msgpack.packb(data)
+
+def _msgpack_loads(payload: bytes) -> Any:
+    return msgpack.unpackb(payload)
+
+def _zstd_compress(payload: bytes) -> bytes:
+    return zstd.compress(payload)
+
+def _zstd_decompress(payload: bytes) -> bytes:
+    return zstd.decompress(payload)
+
+_SERIALIZERS: Dict[int, Tuple[Callable[[Any], bytes], Callable[[bytes], Any]]] = {
+    FORMATS["json"]: (_json_dumps, json.loads),
+    FORMATS["orjson"]: (_orjson_dumps, _orjson_loads),
+    FORMATS["msgpack"]: (_msgpack_dumps, _msgpack_loads),
+}
+
+_COMPRESSORS: Dict[int, Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]] = {
+    COMPRESSIONS["zlib"]: (zlib.compress, zlib.decompress),
+    COMPRESSIONS["zstd"]: (_zstd_compress, _zstd_decompress),
+}
+
+_REQUIRES = {"orjson": lambda: orjson, "msgpack": lambda: msgpack, "zstd": lambda: zstd}
+
+class CacheCodec:
+    """Tagged, optionally compressed serializer for cached values.
+
+    Payloads of at least `compress_min_size` bytes are compressed when a
+    compression is configured; smaller ones are stored as-is, since the
+    header and the CPU cost outweigh the saving. Untagged values written
+    before the codec existed are read as plain JSON.
+    """
+
+    def __init__(self, format: str = "json", compression: str = "none", compress_min_size: int = 1024) -> None:
+        for name, known in ((format, FORMATS), (compression, COMPRESSIONS)):
+            if name not in known:
+                raise ValueError(f"Unknown cache codec option: {name}")
+            if name in _REQUIRES and _REQUIRES[name]() is None:
+                raise ValueError(f"Cache codec option {name} requires the {name} package")
+        self.format = format
+        self.compression = compression
+        self.compress_min_size = compress_min_size
+        self._dumps = _SERIALIZERS[FORMATS[format]][0]
+        self._compress = _COMPRESSORS.get(COMPRESSIONS[compression], (None,))[0]
+        self._plain_tag = bytes([FORMATS[format]])
+        self._compressed_tag = bytes([COMPRESSIONS[compression] << 4 | FORMATS[format]])
+
+    def encode(self, data: Optional[Any]) -> bytes:
+        if data is None:
+            return MISSING
+        return self._frame(self._dumps(data))
+
+    def encode_json(self, body: Optional[bytes]) -> bytes:
+        """Encode a value that is already JSON, without re-serializing it for JSON formats."""
+        if body is None:
+            return MISSING
+        if self.format == "msgpack":
+            return self._frame(self._dumps(_orjson_loads(body)))
+        return self._frame(body)
+
+    def decode(self, value: bytes) -> Optional[Any]:
+        tag, payload = self._unframe(value)
+        if tag is None:
+            return None if payload is None else json.loads(payload)
+        return _SERIALIZERS[tag][1](payload)
+
+    def decode_json(self, value: bytes) -> Optional[bytes]:
+        """Return the stored value as JSON bytes; JSON formats are passed through untouched."""
+        tag, payload = self._unframe(value)
+        if tag is None or tag in (FORMATS["json"], FORMATS["orjson"]):
+            return payload
+        return _orjson_dumps(_SERIALIZERS[tag][1](payload))
+
+    def _frame(self, payload: bytes) -> bytes:
+        if self._compress is not None and len(payload) >= self.compress_min_size:
+            return self._compressed_tag + self._compress(payload)
+        return self._plain_tag + payload
+
+    def _unframe(self, value: bytes) -> Tuple[Optional[int], Optional[bytes]]:
+        """Split off the tag and decompress; a None format means untagged JSON."""
+        if value == MISSING:
+            return None, None
+        tag = value[0]
+        format, compression = tag & 0x0F, tag >> 4
+        if format not in _SERIALIZERS or (compression and compression not in _COMPRESSORS):
+            # Untagged entry from before the codec: plain JSON ("null" included)
+            return None, None if value == b"null" else value
+        payload = value[1:]
+        if compression:
+            payload = _COMPRESSORS[compression][1](payload)
+        return format, payload
@@ -9,5 +9,5 @@ class LoggedBaseModel(BaseModel):
         try:
             return super().model_validate(obj)
         except ValidationError as e:
-            logger.error(f"Validation error in {cls.__name__}: {e.errors()}")
+            logger.error("Validation error in %s: %s", cls.__name__, e.errors())
             raise e
\ No newline at end of file
@@ -0,0 +1,127 @@
+import atexit
+import json
+import logging
+import queue
+import random
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, List, Optional
+
+from app.utils.request_context import request_id_var
+
+# Per-request access lines; sampled, see SamplingFilter
+ACCESS_LOGGER = "app.access"
+
+class RequestIdFilter(logging.Filter):
+    """Stamps records with the id of the request they were logged in."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+class SamplingFilter(logging.Filter):
+    """Lets through a `rate` fraction of records (1.0 keeps all, 0 none)."""
+
+    def __init__(self, rate: float) -> None:
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return self.rate >= 1.0 or random.random() < self.rate
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, request id, exception."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+        }
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that never blocks: records are dropped, and counted, when the queue is full."""
+
+    def __init__(self, log_queue: queue.Queue) -> None:
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The queue never leaves the process, so formatting (and the record copy
+        # QueueHandler makes for it) is left to the writer thread
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class DrainingQueueListener(QueueListener):
+    """QueueListener whose stop() waits for room in a full queue instead of raising."""
+
+    def enqueue_sentinel(self) -> None:
+        self.queue.put(self._sentinel)
+
+class LoggingPipeline:
+    """Application handlers behind a bounded queue drained by a writer thread."""
+
+    def __init__(self, handlers: List[logging.Handler], queue_size: int) -> None:
+        self.queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.handler = DroppingQueueHandler(self.queue)
+        self.handler.addFilter(RequestIdFilter())
+        self.listener = DrainingQueueListener(self.queue, *handlers, respect_handler_level=True)
+        self.running = False
+
+    def start(self) -> None:
+        self.listener.start()
+        self.running = True
+
+    def stop(self) -> None:
+        # Drains what is queued before returning
+        if self.running:
+            self.running = False
+            self.listener.stop()
+
+    def stats(self) -> Dict[str, int]:
+        return {"dropped": self.handler.dropped, "queued": self.queue.qsize()}
+
+def configure_logging(
+    level: str = "INFO",
+    log_format: str = "json",
+    log_file: Optional[str] = "logs/app.log",
+    queue_size: int = 10000,
+    access_sample_rate: float = 1.0
+) -> LoggingPipeline:
+    """Route the root logger through a LoggingPipeline and start its writer thread."""
+    if log_format == "json":
+        formatter: logging.Formatter = JSONFormatter()
+    else:
+        formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s")
+    handlers: List[logging.Handler] = [logging.StreamHandler()]
+    if log_file:
+        handlers.append(logging.FileHandler(log_file))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    pipeline = LoggingPipeline(handlers, queue_size)
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(pipeline.handler)
+    root.setLevel(level)
+    access_logger = logging.getLogger(ACCESS_LOGGER)
+    # Replace rather than stack: repeated calls would otherwise multiply the rates
+    for existing in access_logger.filters[:]:
+        if isinstance(existing, SamplingFilter):
+            access_logger.removeFilter(existing)
+    access_logger.addFilter(SamplingFilter(access_sample_rate))
+    pipeline.start()
+    atexit.register(pipeline.stop)
+    return pipeline
@@ -1,36 +1,126 @@
 import time
 import logging
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
-from starlette.responses import Response
-from collections import defaultdict
+from bisect import bisect_left
+from typing import Dict, List, Tuple, Union
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
-logger = logging.getLogger(__name__)
+from app.utils.logging_setup import ACCESS_LOGGER
 
-class MetricsMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app):
-        super().__init__(app)
-        self.metrics = defaultdict(lambda: {"count": 0, "success": 0, "failure": 0})
+# Per-request lines, sampled by LOG_ACCESS_SAMPLE_RATE
+access_logger = logging.getLogger(ACCESS_LOGGER)
 
-    async def dispatch(self, request: Request, call_next):
-        start_time = time.time()
-        response = None
+# Upper bounds in seconds, doubling from 0.5 ms to ~33 s; one more slot counts +Inf
+LATENCY_BUCKETS: Tuple[float, ...] = tuple(0.0005 * 2 ** i for i in range(17))
+
+# Route label for requests no route matched, so unknown paths share one series
+UNMATCHED_ROUTE = "<unmatched>"
+
+# Clients may send any verb; those outside this set share the OTHER_METHOD label
+KNOWN_METHODS = frozenset({"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"})
+OTHER_METHOD = "OTHER"
+
+class RouteMetrics:
+    __slots__ = ("statuses", "buckets", "total_seconds", "count")
+
+    def __init__(self) -> None:
+        self.statuses: Dict[Union[int, str], int] = {}
+        self.buckets: List[int] = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total_seconds = 0.0
+        self.count = 0
+
+class MetricsRegistry:
+    """Request counters, latency histograms and the in-flight gauge of one process.
+
+    Series are keyed by method and route template (`/orders/{order_id}`), so
+    their number is bounded by the routing table, not by the ids in URLs.
+    """
+
+    def __init__(self) -> None:
+        self.routes: Dict[Tuple[str, str], RouteMetrics] = {}
+        self.in_flight = 0
+
+    def observe(self, method: str, route: str, status_code: int, seconds: float) -> None:
+        metrics = self.routes.get((method, route))
+        if metrics is None:
+            metrics = self.routes[(method, route)] = RouteMetrics()
+        metrics.statuses[status_code] = metrics.statuses.get(status_code, 0) + 1
+        metrics.buckets[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        metrics.total_seconds += seconds
+        metrics.count += 1
+
+    def render(self) -> str:
+        return render_routes(self.in_flight, self.routes)
+
+def render_routes(in_flight: int, routes: Dict[Tuple[str, str], RouteMetrics]) -> str:
+    """Prometheus text exposition of the in-flight gauge and per-route series."""
+    lines = [
+        "# HELP http_requests_in_flight Requests currently being served.",
+        "# TYPE http_requests_in_flight gauge",
+        f"http_requests_in_flight {in_flight}",
+        "# HELP http_requests_total Requests served, by route template and status code.",
+        "# TYPE http_requests_total counter",
+    ]
+    for (method, route), metrics in sorted(routes.items()):
+        for status_code, count in sorted(metrics.statuses.items()):
+            lines.append(f'http_requests_total{{method="{method}",route="{route}",status="{status_code}"}} {count}')
+    lines += [
+        "# HELP http_request_duration_seconds Request latency, by route template.",
+        "# TYPE http_request_duration_seconds histogram",
+    ]
+    for (method, route), metrics in sorted(routes.items()):
+        labels = f'method="{method}",route="{route}"'
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS + (float("inf"),), metrics.buckets):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{le}"}} {cumulative}')
+        lines.append(f"http_request_duration_seconds_sum{{{labels}}} {metrics.total_seconds}")
+        lines.append(f"http_request_duration_seconds_count{{{labels}}} {metrics.count}")
+    return "\n".join(lines) + "\n"
+
+def render_stats(prefix: str, stats: Dict[str, float]) -> str:
+    """Expose a flat stats dict (cache counters and the like) as untyped samples."""
+    lines = []
+    for name, value in stats.items():
+        lines.append(f"# TYPE {prefix}_{name} untyped")
+        lines.append(f"{prefix}_{name} {float(value)}")
+    return "\n".join(lines) + "\n" if lines else ""
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording every HTTP request into a MetricsRegistry.
+
+    Unlike BaseHTTPMiddleware it does not wrap the response, so streaming
+    responses pass through untouched; it only watches the start message for
+    the status code. The route template is read from the scope after the
+    router has matched.
+    """
+
+    def __init__(self, app: ASGIApp, registry: MetricsRegistry) -> None:
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        self.registry.in_flight += 1
         try:
-            response = await call_next(request)
-            status_code = response.status_code
-        except Exception as e:
-            status_code = 500
-            raise e
+            await self.app(scope, receive, send_wrapper)
         finally:
-            process_time = time.time() - start_time
-            endpoint = request.url.path
-            self.metrics[endpoint]["count"] += 1
-            if status_code < 400:
-                self.metrics[endpoint]["success"] += 1
-            else:
-                self.metrics[endpoint]["failure"] += 1
-            logger.info(f"Request to {endpoint} took {process_time:.4f} seconds, status code: {status_code}")
-        return response
-
-    def get_metrics(self):
-        return self.metrics
\ No newline at end of file
+            self.registry.in_flight -= 1
+            elapsed = time.perf_counter() - start
+            route = scope.get("route")
+            route = route.path if route is not None else UNMATCHED_ROUTE
+            method = scope["method"] if scope["method"] in KNOWN_METHODS else OTHER_METHOD
+            self.registry.observe(method, route, status_code, elapsed)
+            access_logger.info("Request to %s took %.4f seconds, status code: %s", route, elapsed, status_code)
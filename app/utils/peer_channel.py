@@ -0,0 +1,61 @@
+import asyncio
+import logging
+import uuid
+from typing import Awaitable, Callable, Dict
+from redis import RedisError
+from redis import asyncio as aioredis
+
+logger = logging.getLogger(__name__)
+
+class PeerChannel:
+    """Redis pub/sub channel on which worker processes announce changes.
+
+    Messages are "<origin>:<payload>", where `origin` tags the sending
+    process so `listen()` skips its own. `description` names the channel in
+    log messages; malformed messages are counted in `stats["errors"]`.
+    """
+
+    def __init__(self, channel: str, description: str, stats: Dict[str, int]) -> None:
+        self.channel = channel
+        self.description = description
+        self.stats = stats
+        self.origin = uuid.uuid4().hex
+
+    def message(self, payload: object) -> str:
+        return f"{self.origin}:{payload}"
+
+    async def listen(
+        self,
+        redis: aioredis.Redis,
+        handle: Callable[[str], None],
+        on_subscribe: Callable[[], Awaitable[None]],
+        retry_delay: float = 1.0
+    ) -> None:
+        """Pass other processes' payloads to `handle`; runs until cancelled.
+
+        `on_subscribe` runs whenever the subscription is (re)established,
+        since messages may have been missed while unsubscribed. A payload
+        `handle` rejects with ValueError is logged and skipped.
+        """
+        while True:
+            pubsub = redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(self.channel)
+                await on_subscribe()
+                async for message in pubsub.listen():
+                    self._dispatch(message["data"], handle)
+            except RedisError as e:
+                logger.warning("%s listener failed: %s", self.description.capitalize(), e)
+                await asyncio.sleep(retry_delay)
+            finally:
+                await pubsub.aclose()
+
+    def _dispatch(self, data: bytes, handle: Callable[[str], None]) -> None:
+        try:
+            origin, _, payload = data.decode().partition(":")
+            if origin != self.origin:
+                handle(payload)
+        except ValueError:
+            # A bad message must not stop the listener; later ones still apply
+            self.stats["errors"] += 1
+            logger.warning("Ignoring malformed %s message: %r", self.description, data)
@@ -0,0 +1,19 @@
+from typing import Optional
+from fastapi.responses import Response
+
+class JSONBytesResponse(Response):
+    """Response for a body that is already encoded JSON.
+
+    Endpoints that serialize once (and share the bytes with the cache) return
+    this directly, so FastAPI neither validates against `response_model` nor
+    encodes the body a second time.
+    """
+    media_type = "application/json"
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header covers `etag` (weak comparison, as RFC 9110 asks for it)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(candidate.strip().removeprefix("W/") == etag for candidate in if_none_match.split(","))
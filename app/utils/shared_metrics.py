@@ -0,0 +1,220 @@
+import fcntl
+import mmap
+import os
+import struct
+import zlib
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from starlette.routing import Route
+
+from app.utils.metrics_middleware import LATENCY_BUCKETS, UNMATCHED_ROUTE, RouteMetrics, render_routes
+
+MAGIC = 0x6F72646D65747231  # "ordmetr1"
+HEADER_WORDS = 4            # magic, layout checksum, slots, series
+SLOT_HEADER_WORDS = 2       # owner pid, in-flight requests
+STATUS_CLASSES = ("1xx", "2xx", "3xx", "4xx", "5xx")
+# Per series: status-class counters, histogram buckets (+Inf last), sum in microseconds, count
+SERIES_WORDS = len(STATUS_CLASSES) + len(LATENCY_BUCKETS) + 1 + 2
+_BUCKETS_AT = len(STATUS_CLASSES)
+_SUM_AT = _BUCKETS_AT + len(LATENCY_BUCKETS) + 1
+_COUNT_AT = _SUM_AT + 1
+
+# Slot 0 accumulates the counters of workers that have exited
+RETIRED_SLOT = 0
+RETIRED_PID = -1
+
+def route_series(routes: Iterable) -> List[Tuple[str, str]]:
+    """Every (method, route template) the app can serve, plus the unmatched series."""
+    series = [("ANY", UNMATCHED_ROUTE)]
+    for route in routes:
+        if isinstance(route, Route) and route.methods:
+            series.extend((method, route.path) for method in sorted(route.methods))
+    return series
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+class SharedMetricsRegistry:
+    """MetricsRegistry over a memory-mapped file shared by all workers.
+
+    The file holds a fixed array of int64 words: a header, then one slot per
+    worker, each with the same series layout (known from the routing table
+    at startup). Each serving process calls `attach()` once, from the app
+    lifespan, to map the file and claim a slot; other processes (the bcrypt
+    pool, a preloading manager) never take one. A worker only ever writes
+    its own slot, and within a worker only the event loop thread does, so
+    recording a request takes no lock. A sidecar lock file is held only to
+    claim a slot, to replace the file and while rendering. A slot whose
+    owner has died is folded into the retired slot when a new worker claims
+    it, so aggregated counters never go backwards. Status codes are counted
+    per class (2xx, 4xx, ...) to keep the layout fixed. Until `attach()` the
+    registry records nothing and renders no series.
+    """
+
+    def __init__(self, path: str, series: List[Tuple[str, str]], max_workers: int) -> None:
+        self.path = path
+        self.series = series
+        self.index: Dict[Tuple[str, str], int] = {key: i for i, key in enumerate(series)}
+        self.slots = max_workers + 1
+        self.slot_words = SLOT_HEADER_WORDS + len(series) * SERIES_WORDS
+        self.checksum = zlib.crc32(repr((series, LATENCY_BUCKETS)).encode())
+        self.size = (HEADER_WORDS + self.slots * self.slot_words) * 8
+        self._owner = None
+        # Offset of this process' slot; None until attach() claims one
+        self._base: Optional[int] = None
+
+    def attach(self) -> None:
+        """Map the shared file and claim a slot for the calling process.
+
+        Idempotent within a process; a forked child calling it gets its own
+        lock descriptor and slot instead of sharing the parent's.
+        """
+        if self._owner == os.getpid():
+            return
+        # An inherited descriptor shares the parent's flock; lock through a fresh one
+        self._lock_fd = os.open(f"{self.path}.lock", os.O_RDWR | os.O_CREAT, 0o600)
+        with self._locked():
+            self._mmap = self._map_file()
+            self.words = memoryview(self._mmap).cast("q")
+            self._claim_slot()
+        self._owner = os.getpid()
+
+    @property
+    def in_flight(self) -> int:
+        if self._base is None:
+            return 0
+        return self.words[self._base + 1]
+
+    @in_flight.setter
+    def in_flight(self, value: int) -> None:
+        if self._base is not None:
+            self.words[self._base + 1] = value
+
+    def observe(self, method: str, route: str, status_code: int, seconds: float) -> None:
+        if self._base is None:
+            return
+        index = self.index.get((method, route), 0)
+        base = self._base + SLOT_HEADER_WORDS + index * SERIES_WORDS
+        words = self.words
+        status_class = min(max(status_code // 100, 1), 5) - 1
+        words[base + status_class] += 1
+        words[base + _BUCKETS_AT + bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        words[base + _SUM_AT] += int(seconds * 1_000_000)
+        words[base + _COUNT_AT] += 1
+
+    def render(self) -> str:
+        """Prometheus exposition of the counters summed over every slot."""
+        if self._base is None:
+            return render_routes(0, {})
+        totals = [0] * (len(self.series) * SERIES_WORDS)
+        in_flight = 0
+        with self._locked():
+            for slot in range(self.slots):
+                base = self._slot_base(slot)
+                pid = self.words[base]
+                if pid == 0:
+                    continue
+                if pid != RETIRED_PID and _pid_alive(pid):
+                    in_flight += self.words[base + 1]
+                data = self.words[base + SLOT_HEADER_WORDS:base + self.slot_words]
+                for i, value in enumerate(data):
+                    if value:
+                        totals[i] += value
+
+        routes: Dict[Tuple[str, str], RouteMetrics] = {}
+        for index, key in enumerate(self.series):
+            values = totals[index * SERIES_WORDS:(index + 1) * SERIES_WORDS]
+            if not values[_COUNT_AT]:
+                continue
+            metrics = RouteMetrics()
+            metrics.statuses = {label: count for label, count in zip(STATUS_CLASSES, values) if count}
+            metrics.buckets = values[_BUCKETS_AT:_SUM_AT]
+            metrics.total_seconds = values[_SUM_AT] / 1_000_000
+            metrics.count = values[_COUNT_AT]
+            routes[key] = metrics
+        return render_routes(in_flight, routes)
+
+    def _map_file(self) -> mmap.mmap:
+        """Map the file if it has this layout, else put a zeroed one in its place.
+
+        Must be called with the file lock held. A file with another layout
+        may still be mapped by workers of the previous deployment; it is
+        replaced rather than resized, since shrinking a mapped file would
+        crash them on their next write.
+        """
+        header = (MAGIC, self.checksum, self.slots, len(self.series))
+        try:
+            fd = os.open(self.path, os.O_RDWR)
+        except FileNotFoundError:
+            fd = None
+        if fd is not None:
+            try:
+                if (
+                    os.fstat(fd).st_size == self.size
+                    and struct.unpack(f"{HEADER_WORDS}q", os.pread(fd, HEADER_WORDS * 8, 0)) == header
+                ):
+                    return mmap.mmap(fd, self.size)
+            finally:
+                os.close(fd)
+
+        # New file or a different route table: start from zero
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        fd = os.open(tmp_path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o600)
+        try:
+            os.ftruncate(fd, self.size)
+            mapped = mmap.mmap(fd, self.size)
+        finally:
+            os.close(fd)
+        words = memoryview(mapped).cast("q")
+        for i, value in enumerate(header):
+            words[i] = value
+        words[self._slot_base(RETIRED_SLOT)] = RETIRED_PID
+        words.release()
+        os.replace(tmp_path, self.path)
+        return mapped
+
+    def _slot_base(self, slot: int) -> int:
+        return HEADER_WORDS + slot * self.slot_words
+
+    def _claim_slot(self) -> None:
+        """Take a free slot, or the slot of a dead worker after retiring its counters.
+
+        Must be called with the file lock held.
+        """
+        free = None
+        for slot in range(1, self.slots):
+            base = self._slot_base(slot)
+            pid = self.words[base]
+            if pid != 0 and _pid_alive(pid):
+                continue
+            if pid != 0:
+                self._retire(base)
+            if free is None:
+                free = base
+        if free is None:
+            raise RuntimeError(f"All {self.slots - 1} metrics slots in {self.path} are taken by live workers")
+        self.words[free] = os.getpid()
+        self._base = free
+
+    def _retire(self, base: int) -> None:
+        retired = self._slot_base(RETIRED_SLOT) + SLOT_HEADER_WORDS
+        for offset in range(self.slot_words - SLOT_HEADER_WORDS):
+            value = self.words[base + SLOT_HEADER_WORDS + offset]
+            if value:
+                self.words[retired + offset] += value
+        self._mmap[base * 8:(base + self.slot_words) * 8] = bytes(self.slot_words * 8)
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)